@@ -2,14 +2,79 @@
 
 from __future__ import print_function
 
-from datetime import datetime
-from typing import List
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
 
 import pandas as pd
 
 from gsheets import get_gsheet_data, write_gsheet_output_data
 
 
+def get_club_entry_urls(_league_management_url) -> List[str]:
+    """Return the entry sheet URL of every club listed in the league management sheet.
+
+    :param _league_management_url: URL of the league management sheet
+    :return: List of club entry URLs
+    """
+    _club_entry_management = pd.DataFrame(
+        get_gsheet_data(_league_management_url, "Club Entry Management").get_all_records()
+    )
+    return [url for url in _club_entry_management["Entry URL"] if url]
+
+
+def get_previous_league_position_data(_league_management_url) -> pd.DataFrame:
+    """Download the Previous League organisation sheet from the league management sheet.
+
+    :param _league_management_url: URL of the league management sheet
+    :return: DataFrame of the previous league positions and new divisions
+    """
+    _raw_gsheet = get_gsheet_data(
+        _league_management_url, "Previous League organisation"
+    ).get_all_records()
+    return pd.DataFrame(_raw_gsheet)
+
+
+def get_club_data(_file_location) -> Dict[str, pd.DataFrame]:
+    """Download the sheets of a club's entry spreadsheet.
+
+    :param _file_location: URL of the club's entry sheet
+    :return: Dict of the club information, teams entering and availability sheets by sheet name,
+        and the URL under "Entry URL"
+    """
+    _club_availability = pd.DataFrame(
+        get_gsheet_data(_file_location, "2. Availability").get("C11:K223")
+    )
+    _club_availability.columns = _club_availability.iloc[0]
+    return {
+        "Entry URL": _file_location,
+        "0. Club Information": pd.DataFrame(
+            get_gsheet_data(_file_location, "0. Club Information").get_all_records()
+        ),
+        "1. Teams Entering": pd.DataFrame(
+            get_gsheet_data(_file_location, "1. Teams Entering").get_all_records()
+        ),
+        "2. Availability": _club_availability[1:],
+    }
+
+
+def stream_club_data(_file_locations: List[str], _max_workers: int = 4) -> Iterator[Dict]:
+    """Download club entry spreadsheets concurrently, yielding each club's sheets in order.
+
+    A club is yielded as soon as its sheets and those of every club before it have arrived, so
+    the clubs come in the same order as downloading them one by one.
+
+    :param _file_locations: URLs of the club entry sheets
+    :param _max_workers: maximum number of clubs downloaded at the same time
+    :return: iterator of the club sheets as returned by get_club_data
+    """
+    with ThreadPoolExecutor(max_workers=_max_workers) as executor:
+        _futures = [executor.submit(get_club_data, url) for url in _file_locations]
+        for _future in _futures:
+            yield _future.result()
+
+
 class Team:
     """Represents a team and initializes its instance with the given _team_name and _division."""
 
@@ -32,7 +97,14 @@ class FixtureCourtSlot:
 class League:
     """Represents a league and initializes its instance with the given _league_management_url."""
 
-    def __init__(self, _league_management_url):
+    def __init__(
+        self,
+        _league_management_url,
+        _club_data: Optional[Iterable[Dict[str, pd.DataFrame]]] = None,
+        _previous_league_position_df: Optional[pd.DataFrame] = None,
+        _stream: bool = False,
+        _max_fetch_workers: int = 4,
+    ):
         """Initialize the class the given _league_management_url.
 
         Attributes:
@@ -46,6 +118,15 @@ class League:
         Args:
         ----
         _league_management_url (str): URL of the league management sheet.
+        _club_data (iterable): Club sheets as returned by get_club_data, one per club. Downloaded
+            from the club entry URLs in the league management sheet if None.
+        _previous_league_position_df (DataFrame): Previous League organisation sheet. Downloaded
+            from the league management sheet if None.
+        _stream (bool): Build each club, its teams' divisions and its fixtures as soon as its
+            sheets arrive, while later clubs are still downloading. Clubs are downloaded
+            concurrently when streamed. The league built is the same either way.
+        _max_fetch_workers (int): Maximum number of clubs downloaded at the same time when
+            streamed.
 
         Methods:
         -------
@@ -65,27 +146,82 @@ class League:
         self.dates = Dates()
         self.fixtures = []
 
-        # Club Entry management
-        _club_entry_management = pd.DataFrame(
-            get_gsheet_data(self.league_management_URL, "Club Entry Management").get_all_records()
-        )
-        for club_url in _club_entry_management["Entry URL"]:
-            if club_url:
-                c = Club(self, club_url)
-                self.clubs.append(c)
+        if _stream:
+            self._stream_clubs(_club_data, _previous_league_position_df, _max_fetch_workers)
+            return
 
-        self._get_previous_league_position()
+        if _club_data is None:
+            _club_data = [get_club_data(url) for url in get_club_entry_urls(_league_management_url)]
+        for _data in _club_data:
+            c = Club(self, _data["Entry URL"], _data)
+            self.clubs.append(c)
 
+        if _previous_league_position_df is None:
+            _previous_league_position_df = get_previous_league_position_data(
+                _league_management_url
+            )
+        self._get_previous_league_position(_previous_league_position_df)
+
+        self.dates.finalise()
         self._generate_fixtures()
 
-        # self.dates.calculate_dates_numbers()
+    def __setstate__(self, _state: Dict):
+        """Restore a pickled league, numbering its dates if it was pickled before they were.
+
+        The league is the object pickled, so its dates and everything else it holds have been
+        restored by the time this runs.
+        """
+        self.__dict__.update(_state)
+        if not getattr(self.dates, "is_finalised", False) or any(
+            getattr(d, "week_number", None) is None for d in self.dates.dates
+        ):
+            self.dates.finalise()
+
+    def _stream_clubs(
+        self,
+        _club_data: Optional[Iterable[Dict[str, pd.DataFrame]]],
+        _previous_league_position_df: Optional[pd.DataFrame],
+        _max_fetch_workers: int,
+    ):
+        """Build each club, with its teams' divisions and fixtures, as its sheets arrive.
+
+        A club's fixtures against the clubs already built, home and away, are generated with its
+        own, so once the last club arrives only the ordering of the fixtures is left. The fixtures
+        are then put in the order _generate_fixtures gives them.
+        """
+        if _previous_league_position_df is None:
+            _previous_league_position_df = get_previous_league_position_data(
+                self.league_management_URL
+            )
+        if _club_data is None:
+            _club_data = stream_club_data(
+                get_club_entry_urls(self.league_management_URL), _max_fetch_workers
+            )
+
+        _division_teams = {}
+        for _data in _club_data:
+            c = Club(self, _data["Entry URL"], _data)
+            self.clubs.append(c)
+            self._set_club_divisions(
+                c, _previous_league_position_df[_previous_league_position_df["Club"] == c.name]
+            )
+            self._add_club_fixtures(c, _division_teams)
 
-    def _get_previous_league_position(self):
-        """Retrieve the previous league position data for all the clubs and sets their division.
+        _club_names = {c.name for c in self.clubs}
+        for _club_name in _previous_league_position_df["Club"]:
+            if _club_name not in _club_names:
+                print("Missing Club", _club_name)
+        self._check_team_divisions()
+        self.dates.finalise()
+        self._sort_fixtures()
+
+    def _get_previous_league_position(self, _previous_league_position_df: pd.DataFrame):
+        """Set the division of every team from the previous league position data.
 
         Args:
         ----
         self (League): An instance of the League class.
+        _previous_league_position_df (DataFrame): Previous League organisation sheet.
 
         Returns:
         -------
@@ -99,12 +235,27 @@ class League:
         Example:
         -------
         league = League("https://example.com/league_management")
-        league._get_previous_league_position()
+        league._get_previous_league_position(_previous_league_position_df)
+        """
+        for index, row in _previous_league_position_df.iterrows():
+            _club: Club = self.get_club(row["Club"])
+            if _club:
+                self._set_team_division(_club, row)
+            else:
+                print("Missing Club", row["Club"])
+        self._check_team_divisions()
+
+    def _set_club_divisions(self, _club: "Club", _club_position_df: pd.DataFrame):
+        """Set the division of every team of a club from its rows of the previous league positions.
+
+        :raises ValueError: if a team's New Division is not a number
         """
-        _raw_gsheet = get_gsheet_data(
-            self.league_management_URL, "Previous League organisation"
-        ).get_all_records()
-        _previous_league_position_df = pd.DataFrame(_raw_gsheet)
+        for index, row in _club_position_df.iterrows():
+            self._set_team_division(_club, row)
+
+    @staticmethod
+    def _set_team_division(_club: "Club", row: pd.Series):
+        """Set the division of a club's team from its row of the previous league positions."""
         _headings = [
             "League",
             "Club",
@@ -113,22 +264,19 @@ class League:
             "Teams Entered",
             "New Division",
         ]
-        for index, row in _previous_league_position_df[_headings].iterrows():
-            _club: Club = self.get_club(row["Club"])
-            if _club:
-                _team: Team = _club.get_team(row["League"], row["Team"])
-                if _team:
-                    try:
-                        _team.division = int(row["New Division"])
-                    except ValueError:
-                        print(f"Error Cause by {row.to_markdown()}")
-                        raise ValueError(f"Error Cause by {row}")
-
-                else:
-                    print("Missing Team:", row["Club"], row["League"], row["Team"])
-            else:
-                print("Missing Club", row["Club"])
+        row = row[_headings]
+        _team: Team = _club.get_team(row["League"], row["Team"])
+        if _team:
+            try:
+                _team.division = int(row["New Division"])
+            except ValueError:
+                print(f"Error Cause by {row.to_markdown()}")
+                raise ValueError(f"Error Cause by {row}")
+        else:
+            print("Missing Team:", row["Club"], row["League"], row["Team"])
 
+    def _check_team_divisions(self):
+        """Raise a ValueError if any team has not been given a division."""
         for t in self.get_teams():
             if t.division == 0:
                 raise ValueError(
@@ -199,6 +347,54 @@ class League:
                     fixture_i = Fixture(hm_team, aw_team)
                     self.fixtures.append(fixture_i)
 
+    def regenerate_fixtures(self) -> None:
+        """Generate the fixtures again after the teams, their divisions or court slots change.
+
+        Clears the fixtures of the league, its teams and court slots and the team conflict graph,
+        and numbers any dates added since the league was built.
+        """
+        self.fixtures = []
+        for t in self.get_teams():
+            t.home_fixtures = []
+            t.away_fixtures = []
+        for c in self.clubs:
+            for cs in c.court_slots:
+                cs.fixtures_court_slot = []
+        self._team_conflict_graph = None
+        self.dates.finalise()
+        self._generate_fixtures()
+
+    def _add_club_fixtures(self, _club: "Club", _division_teams: Dict[tuple, List["Team"]]):
+        """Generate a club's fixtures against itself and the clubs added before it.
+
+        :param _club: club just added
+        :param _division_teams: teams added so far by league and division, updated with the club's
+        """
+        for t in _club.teams:
+            _division_teams.setdefault((t.league, t.division), []).append(t)
+        for t in _club.teams:
+            for _other in _division_teams[(t.league, t.division)]:
+                if _other == t:
+                    continue
+                self.fixtures.append(Fixture(t, _other))
+                if _other.club != _club:
+                    self.fixtures.append(Fixture(_other, t))
+
+    def _sort_fixtures(self):
+        """Put the fixtures, and each team's and court slot's, in the _generate_fixtures order."""
+        _positions = {t: i for i, t in enumerate(self.get_teams())}
+
+        def _fixture_key(_fixture: "Fixture"):
+            return _positions[_fixture.home_team], _positions[_fixture.away_team]
+
+        self.fixtures.sort(key=_fixture_key)
+        for t in self.get_teams():
+            t.home_fixtures.sort(key=_fixture_key)
+            t.away_fixtures.sort(key=_fixture_key)
+        for c in self.clubs:
+            for cs in c.court_slots:
+                cs.fixtures_court_slot.sort(key=lambda fs: _fixture_key(fs.fixture))
+
     def get_fixture_court_slots(self) -> List[FixtureCourtSlot]:
         """Return a list of all the fixture court slots in the league.
 
@@ -209,6 +405,46 @@ class League:
             _fixtures_dates.extend(_fixture.fixture_court_slots)
         return _fixtures_dates
 
+    def get_fixture_court_slot_table(self) -> pd.DataFrame:
+        """Return a table of all the fixture court slots in the league.
+
+        Rows are in the same order as get_fixture_court_slots and the columns match
+        FixtureCourtSlot.as_dict. Fixture level columns are built once per fixture and
+        repeated for each of its slots rather than calling as_dict on every slot.
+
+        :return: DataFrame with one row per fixture court slot.
+        """
+        _fixtures = pd.DataFrame(
+            {
+                "Home Team": [f.home_team.name for f in self.fixtures],
+                "Away Team": [f.away_team.name for f in self.fixtures],
+                "league": [f.home_team.league for f in self.fixtures],
+                "Division": [f.home_team.division for f in self.fixtures],
+                "Home Club": [f.home_team.club.name for f in self.fixtures],
+                "Away Club": [f.away_team.club.name for f in self.fixtures],
+            }
+        )
+        _slot_counts = [len(f.fixture_court_slots) for f in self.fixtures]
+        _fixtures = _fixtures.loc[_fixtures.index.repeat(_slot_counts)].reset_index(drop=True)
+
+        _slots = self.get_fixture_court_slots()
+        _table = pd.DataFrame(
+            {
+                "Home Team": _fixtures["Home Team"],
+                "Away Team": _fixtures["Away Team"],
+                "Date": [fcs.court_slot.date.date_str for fcs in _slots],
+                "Court No.": [fcs.court_slot.concurrency_number for fcs in _slots],
+                "is_scheduled": [fcs.is_scheduled for fcs in _slots],
+                "league": _fixtures["league"],
+                "Division": _fixtures["Division"],
+                "Home Club": _fixtures["Home Club"],
+                "Away Club": _fixtures["Away Club"],
+            }
+        )
+        _date_is_mixed = pd.Series([fcs.court_slot.date.league_type == "Mixed" for fcs in _slots])
+        _table["Is Correct Week"] = _date_is_mixed == (_table["league"] == "Mixed")
+        return _table
+
     def get_fixture_court_slots_for_teams_on_date(
         self, _teams: List[Team], _date: Date
     ) -> List[FixtureCourtSlot]:
@@ -281,14 +517,14 @@ class League:
         print()
         print("Date Weeks")
 
-        for d in sorted(self.dates.dates, key=lambda _d: _d.date_delta_from_start):
+        for d in sorted(self.dates.dates, key=lambda _d: _d.ordinal):
             print(
                 "Date:",
                 d.date,
                 "Delta:",
-                d.date_delta_from_start.days,
+                d.day_offset,
                 "Delta Weeks",
-                d.date_delta_from_start.days // 7,
+                d.week_number,
             )
         print()
 
@@ -313,6 +549,15 @@ class League:
         )
         return min(dates_in_second_year)
 
+    def get_team_conflict_graph(self) -> "TeamConflictGraph":
+        """Return the graph of teams that share players, built once per league.
+
+        :return: TeamConflictGraph of all the teams in the league
+        """
+        if getattr(self, "_team_conflict_graph", None) is None:
+            self._team_conflict_graph = TeamConflictGraph(self.get_teams())
+        return self._team_conflict_graph
+
     def __repr__(self):
         """Return a string representation of the League Class."""
         return self.name
@@ -326,24 +571,32 @@ class Club:
     and share courts.
     """
 
-    def __init__(self, _league: League, _file_location):
-        """Initialise the Club Class."""
+    def __init__(
+        self,
+        _league: League,
+        _file_location,
+        _club_data: Optional[Dict[str, pd.DataFrame]] = None,
+    ):
+        """Initialise the Club Class.
+
+        :param _league: league the club is entering
+        :param _file_location: URL of the club's entry sheet
+        :param _club_data: club sheets as returned by get_club_data, downloaded if None
+        """
         self.fileLocation = _file_location
         self.league = _league
         self.court_slots = []
+        if _club_data is None:
+            _club_data = get_club_data(self.fileLocation)
 
         # Club Info Sheet
-        _club_info = pd.DataFrame(
-            get_gsheet_data(self.fileLocation, "0. Club Information").get_all_records()
-        )
+        _club_info = _club_data["0. Club Information"]
         self.name = _club_info["Club Name"][0]
         if self.name == "BH Pegasus":
             print("BH Pegagsus")
 
         # Teams Entering Sheet
-        _teams_entering = pd.DataFrame(
-            get_gsheet_data(self.fileLocation, "1. Teams Entering").get_all_records()
-        )
+        _teams_entering = _club_data["1. Teams Entering"]
         _teams_columns = [
             "League Name",
             "Team Rank",
@@ -364,14 +617,17 @@ class Club:
                 self.teams.append(t)
 
         # Get Club Availability
-        self._get_club_availability()
+        self._get_club_availability(_club_data["2. Availability"])
 
-    def _get_club_availability(self):
-        _club_availability = pd.DataFrame(
-            get_gsheet_data(self.fileLocation, "2. Availability").get("C11:K223")
-        )
-        _club_availability.columns = _club_availability.iloc[0]
-        _club_availability = _club_availability[1:]
+    def _get_club_availability(self, _club_availability: pd.DataFrame):
+        """Create the club's court slots from its availability sheet.
+
+        Each available date gives one court slot per concurrent match, linked to the club's teams
+        in the date's availability group. The dates are parsed together and the slots built from
+        one table of date, concurrency number and team.
+
+        :param _club_availability: availability sheet of the club entry
+        """
         _date_columns = [
             "Date",
             "League Type",
@@ -380,15 +636,58 @@ class Club:
             "No. Concurrent Matches",
         ]
         print(self.name)
-        for index, row in _club_availability[_date_columns].iterrows():
-            if row["Available"] != "Unavailable":
-                _date = self.league.dates.add_date(row["Date"], row["League Type"], row["Weekday"])
-                for _concurrent_matches in range(int(row["No. Concurrent Matches"])):
-                    _court_slot = CourtSlot(_date, self, _concurrent_matches)
-                    self.court_slots.append(_court_slot)
-                    for _team in self.teams:
-                        if _team.availability_group == row["Available"]:
-                            _court_slot.add_team(_team)
+        _available = _club_availability.loc[
+            _club_availability["Available"] != "Unavailable", _date_columns
+        ].reset_index(drop=True)
+        _available["Date Obj"] = self.league.dates.add_dates(
+            _available["Date"], _available["League Type"], _available["Weekday"]
+        )
+
+        _num_slots = pd.to_numeric(_available["No. Concurrent Matches"]).astype(int)
+        _slots = _available.loc[_available.index.repeat(_num_slots)].copy()
+        _slots["Concurrency"] = _slots.groupby(level=0).cumcount()
+        _slots = _slots.reset_index(drop=True)
+        _new_court_slots = [
+            CourtSlot(_date, self, _concurrency)
+            for _date, _concurrency in zip(_slots["Date Obj"], _slots["Concurrency"])
+        ]
+        self.court_slots.extend(_new_court_slots)
+
+        _teams = pd.DataFrame(
+            {"Available": [t.availability_group for t in self.teams], "Team": self.teams}
+        )
+        _slot_teams = (
+            _slots[["Available"]]
+            .reset_index()
+            .merge(_teams, on="Available")
+            .sort_values("index", kind="stable")
+        )
+        for _slot_number, _team in zip(_slot_teams["index"], _slot_teams["Team"]):
+            _new_court_slots[_slot_number].add_team(_team)
+
+    def set_concurrent_matches(self, _num_matches: int):
+        """Give the club the same number of court slots on each of its available dates.
+
+        Slots past the number are removed and new slots take the teams of the date's first slot.
+        The league's fixtures must be regenerated afterwards.
+
+        :param _num_matches: number of matches the club can host at the same time
+        """
+        _date_slots = defaultdict(list)
+        for cs in self.court_slots:
+            _date_slots[cs.date].append(cs)
+        self.court_slots = []
+        for _date, _slots in _date_slots.items():
+            for cs in _slots[_num_matches:]:
+                _date.court_slots.remove(cs)
+                for t in cs.teams:
+                    t.court_slots.remove(cs)
+            self.court_slots.extend(_slots[:_num_matches])
+            for _concurrency in range(len(_slots), _num_matches):
+                cs = CourtSlot(_date, self, _concurrency)
+                for t in _slots[0].teams:
+                    cs.add_team(t)
+                self.court_slots.append(cs)
 
     def write_output(self):
         """Write output for the club."""
@@ -436,25 +735,40 @@ class Club:
 class Date:
     """Class to represent a date in the league."""
 
-    def __init__(self, _date_str, _league_type, _weekday, _date_anchor):
-        """Initialise an instance of the Date class."""
+    def __init__(self, _date_str, _league_type, _weekday, _date_anchor, _date=None):
+        """Initialise an instance of the Date class, parsing the date string unless given _date."""
         self.date_str: str = _date_str
-        self.date: datetime = datetime.strptime(_date_str, "%d-%b-%Y")
+        if _date is None:
+            _date = datetime.strptime(_date_str, "%d-%b-%Y")
+        self.date: datetime = _date
         self.league_type = _league_type
         self.weekday = _weekday
         self.court_slots = []
-        # Anchor date could be wrong for early dates added if not added in order
+        self.ordinal: Optional[int] = None
+        self.day_offset: Optional[int] = None
+        self.week_number: Optional[int] = None
+        self.date_delta_from_start: Optional[timedelta] = None
+        if _date_anchor is not None:
+            self.set_date_numbers(None, _date_anchor)
+
+    def set_date_numbers(self, _ordinal: Optional[int], _date_anchor: datetime):
+        """Set the date's ordinal and its day and week offsets from the season anchor.
+
+        :param _ordinal: position of the date in the sorted league dates
+        :param _date_anchor: Monday the league's weeks are counted from
+        """
+        self.ordinal = _ordinal
         self.date_delta_from_start = self.date - _date_anchor
+        self.day_offset = self.date_delta_from_start.days
+        self.week_number = self.day_offset // 7
 
-    # def calculate_date_numbers(self, min_date: datetime):
-    #     self.date_delta_from_start = self.date - min_date
     def __repr__(self):
         """Return the date string."""
         return self.date_str
 
     def get_week_number(self) -> int:
         """Return the week number of the date from the start of the league year."""
-        return self.date_delta_from_start.days // 7
+        return self.week_number
 
 
 # Collection of all dates available to the league. Handles the uniques of the Date object.
@@ -465,28 +779,70 @@ class Dates:
         """Initialise the collection of dates."""
         self.dates = []
         self.date_values = ()
-        self.min_date = datetime(2021, 11, 1)
+        self.min_date: Optional[datetime] = None
+        self.anchor_date: Optional[datetime] = None
+        self.is_finalised = False
+        self._dates_by_str = {}
+
+    def _get_dates_by_str(self) -> Dict[str, "Date"]:
+        """Return the dates by date string, building the lookup for leagues pickled without it."""
+        if getattr(self, "_dates_by_str", None) is None or len(self._dates_by_str) != len(
+            self.dates
+        ):
+            self._dates_by_str = {d.date_str: d for d in self.dates}
+        return self._dates_by_str
 
     def add_date(self, _date_str, _league_type, _weekday):
         """Add a date to the collection if it does not already exist. Returns the date object."""
-        _date_tuple = (_date_str,)
-        for d in self.dates:
-            if d.date_str == _date_str:
-                return d
-        _date_obj = Date(_date_str, _league_type, _weekday, self.min_date)
+        _dates_by_str = self._get_dates_by_str()
+        if _date_str in _dates_by_str:
+            return _dates_by_str[_date_str]
+        _date_obj = Date(_date_str, _league_type, _weekday, self.anchor_date)
         self.dates.append(_date_obj)
-        # self._update_min_date(_date_obj)
+        _dates_by_str[_date_str] = _date_obj
+        self.is_finalised = False
         return _date_obj
 
-    def _update_min_date(self, _date: Date):
-        """Update the minimum date in the collection."""
-        if _date.date < self.min_date:
-            self.min_date = _date.date
+    def add_dates(
+        self, _date_strs: pd.Series, _league_types: pd.Series, _weekdays: pd.Series
+    ) -> List["Date"]:
+        """Add many dates at once, parsing the new date strings together.
 
-    def calculate_dates_numbers(self):
-        """Calculate the date numbers for each date in the collection."""
-        for d in self.dates:
-            d.calculate_date_numbers(self.min_date)
+        :param _date_strs: date strings in the %d-%b-%Y format
+        :param _league_types: league type of each date
+        :param _weekdays: weekday of each date
+        :return: the date object of each date string, in order
+        """
+        _dates_by_str = self._get_dates_by_str()
+        _new = pd.DataFrame(
+            {"Date": _date_strs, "League Type": _league_types, "Weekday": _weekdays}
+        )
+        _new = _new[~_new["Date"].isin(_dates_by_str)].drop_duplicates("Date")
+        _parsed = pd.to_datetime(_new["Date"], format="%d-%b-%Y")
+        for _date_str, _league_type, _weekday, _date in zip(
+            _new["Date"], _new["League Type"], _new["Weekday"], _parsed
+        ):
+            _date_obj = Date(
+                _date_str, _league_type, _weekday, self.anchor_date, _date.to_pydatetime()
+            )
+            self.dates.append(_date_obj)
+            _dates_by_str[_date_str] = _date_obj
+            self.is_finalised = False
+        return [_dates_by_str[d] for d in _date_strs]
+
+    def finalise(self):
+        """Set the ordinal and offsets of every date once they have all been added.
+
+        The season anchor is the Monday on or before the first date, so weeks run Monday to
+        Sunday. Each date gets its dense ordinal in date order and its day and week offsets from
+        the anchor.
+        """
+        if self.dates:
+            self.min_date = min(d.date for d in self.dates)
+            self.anchor_date = self.min_date - timedelta(days=self.min_date.weekday())
+            for _ordinal, d in enumerate(sorted(self.dates, key=lambda _d: _d.date)):
+                d.set_date_numbers(_ordinal, self.anchor_date)
+        self.is_finalised = True
 
 
 # An entry into a specific division of a specific league type.
@@ -708,6 +1064,81 @@ class FixtureCourtSlot:
         return self.identifier
 
 
+# Teams whose matches can't be on the same day as they share players.
+class TeamConflictGraph:
+    """Graph with an edge between each pair of teams that share players.
+
+    Teams share players if they are from the same club and either in the same league with
+    adjacent ranks, or in different leagues with the same rank.
+    """
+
+    def __init__(self, _teams: List[Team]):
+        """Build the graph for the given teams."""
+        self.teams = list(_teams)
+        self.neighbours = {t: set() for t in self.teams}
+        _teams_by_club = {}
+        for t in self.teams:
+            _teams_by_club.setdefault(t.club, []).append(t)
+        for _club_teams in _teams_by_club.values():
+            _rank_numbers = {t: ord(t.rank) for t in _club_teams}
+            for i, t1 in enumerate(_club_teams):
+                for t2 in _club_teams[i + 1 :]:
+                    if self._teams_share_players(t1, t2, _rank_numbers):
+                        self.neighbours[t1].add(t2)
+                        self.neighbours[t2].add(t1)
+        self._cliques = None
+
+    @staticmethod
+    def _teams_share_players(t1: Team, t2: Team, _rank_numbers) -> bool:
+        if t1 == t2:
+            return False
+        if t1.league == t2.league:
+            return abs(_rank_numbers[t1] - _rank_numbers[t2]) <= 1
+        return t1.rank == t2.rank
+
+    def get_edges(self) -> List[tuple]:
+        """Return each pair of teams that share players once."""
+        _positions = {t: i for i, t in enumerate(self.teams)}
+        return [
+            (t1, t2)
+            for t1 in self.teams
+            for t2 in self.neighbours[t1]
+            if _positions[t1] < _positions[t2]
+        ]
+
+    def get_maximal_cliques(self) -> List[List[Team]]:
+        """Return the maximal groups of teams that all share players with each other.
+
+        Teams sharing players with no other team are not included. Found with the Bron-Kerbosch
+        algorithm with pivoting and cached, as the graph does not change.
+        """
+        if self._cliques is None:
+            self._cliques = []
+            _positions = {t: i for i, t in enumerate(self.teams)}
+            self._find_cliques(set(), set(self.teams), set())
+            self._cliques = [
+                sorted(c, key=_positions.get) for c in self._cliques if len(c) > 1
+            ]
+            self._cliques.sort(key=lambda c: _positions[c[0]])
+        return self._cliques
+
+    def _find_cliques(self, _clique: set, _candidates: set, _excluded: set) -> None:
+        if not _candidates and not _excluded:
+            self._cliques.append(_clique)
+            return
+        _pivot = max(_candidates | _excluded, key=lambda t: len(self.neighbours[t] & _candidates))
+        for t in list(_candidates - self.neighbours[_pivot]):
+            self._find_cliques(
+                _clique | {t}, _candidates & self.neighbours[t], _excluded & self.neighbours[t]
+            )
+            _candidates.remove(t)
+            _excluded.add(t)
+
+    def __repr__(self):
+        """Return a summary of the graph."""
+        return f"TeamConflictGraph({len(self.teams)} teams, {len(self.get_edges())} edges)"
+
+
 def main():
     """Run to test the league class."""
     test1 = League(
@@ -0,0 +1,157 @@
+"""Benchmark League construction, model building and solving on synthetic leagues.
+
+Run with e.g. `python benchmark.py --scales small medium --run-time 30`. Results are written as
+JSON so runs on different versions can be compared. Solve modes are compared on the same leagues
+with e.g. `python benchmark.py --scales large --solve-modes monolithic week_then_court`. Each
+solved schedule is checked by schedule_validator, so a solve mode or model change that breaks a
+rule shows up as violations in the results. `--memory-profile memory.json` reports the memory of
+each stage, see memory_profile.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any, Dict, List
+
+from memory_profile import MemoryProfiler
+from schedule_validator import validate_schedule
+from scheduling import SOLVE_MODES, Schedule, SolveOptions
+from synthetic_league import generate_league
+
+SCALES: Dict[str, Dict[str, Any]] = {
+    "small": {"num_clubs": 6, "teams_per_club": 3, "num_divisions": 1, "num_dates": 60},
+    "medium": {"num_clubs": 12, "teams_per_club": 6, "num_divisions": 3, "num_dates": 80},
+    "large": {"num_clubs": 24, "teams_per_club": 6, "num_divisions": 6, "num_dates": 100},
+}
+
+
+def _get_versions() -> Dict[str, str]:
+    """Return the code and package versions the benchmark ran against."""
+    try:
+        _commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        _commit = "unknown"
+    _versions = {"commit": _commit, "python": platform.python_version()}
+    for _package in ["ortools", "pandas", "numpy"]:
+        try:
+            _versions[_package] = version(_package)
+        except PackageNotFoundError:
+            _versions[_package] = "not installed"
+    return _versions
+
+
+def benchmark_scale(
+    scale_name: str, allowed_run_time: int, seed: int = 0, solve_mode: str = "monolithic"
+) -> Dict[str, Any]:
+    """Time one synthetic league through construction, model build, solve and result extraction.
+
+    :param scale_name: key of SCALES giving the league size
+    :param allowed_run_time: seconds the solver is allowed
+    :param seed: seed for the synthetic league
+    :param solve_mode: key of SOLVE_MODES the schedule is solved with
+    :return: dict of league size, stage timings in seconds and solve result
+    """
+    _parameters = SCALES[scale_name]
+    print(f"Benchmarking {scale_name} {solve_mode}: {_parameters}")
+    _start = time.perf_counter()
+    _league = generate_league(seed=seed, **_parameters)
+    _league_time = time.perf_counter() - _start
+
+    _result: Dict[str, Any] = {
+        "scale": scale_name,
+        "solve_mode": solve_mode,
+        "parameters": _parameters,
+        "seed": seed,
+        "num_teams": len(_league.get_teams()),
+        "num_fixtures": len(_league.fixtures),
+        "num_fixture_slots": len(_league.get_fixture_court_slots()),
+        "timings": {"league_construction": _league_time},
+    }
+    _start = time.perf_counter()
+    try:
+        _schedule = Schedule(
+            _league, allowed_run_time=allowed_run_time, options=SolveOptions(solve_mode=solve_mode)
+        )
+    except ValueError as e:
+        _result["status"] = "PRECHECK_FAILED"
+        _result["error"] = str(e)
+        return _result
+
+    _result["timings"].update(_schedule.stage_times)
+    _result["status"] = _schedule.model_result
+    _result["objective"] = _schedule.objective_value
+    _result["schedule_time"] = time.perf_counter() - _start
+    _result["report"] = _schedule.report.as_dict()
+
+    _start = time.perf_counter()
+    _slot_table = _league.get_fixture_court_slot_table()
+    _violations = validate_schedule(
+        _league, _slot_table[_slot_table["is_scheduled"] == 1], require_all_fixtures=False
+    )
+    _result["timings"]["validate"] = time.perf_counter() - _start
+    _result["violations"] = {str(k): int(v) for k, v in _violations["Rule"].value_counts().items()}
+    if _result["violations"]:
+        print(f"Schedule breaks rules: {_result['violations']}")
+    return _result
+
+
+def run_benchmark(
+    scale_names: List[str],
+    allowed_run_time: int,
+    seed: int = 0,
+    solve_modes: List[str] = ("monolithic",),
+) -> Dict[str, Any]:
+    """Run the benchmark at each scale with each solve mode.
+
+    :param scale_names: keys of SCALES to run
+    :param allowed_run_time: seconds the solver is allowed at each scale
+    :param seed: seed for the synthetic leagues
+    :param solve_modes: keys of SOLVE_MODES to run at each scale
+    :return: dict of run metadata and one result per scale and solve mode
+    """
+    return {
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "versions": _get_versions(),
+        "allowed_run_time": allowed_run_time,
+        "results": [
+            benchmark_scale(s, allowed_run_time, seed, m) for s in scale_names for m in solve_modes
+        ],
+    }
+
+
+def main():
+    """Run the benchmark from the command line."""
+    _parser = argparse.ArgumentParser(description=__doc__)
+    _parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    _parser.add_argument("--run-time", type=int, default=30, help="solver seconds per scale")
+    _parser.add_argument("--seed", type=int, default=0)
+    _parser.add_argument(
+        "--solve-modes", nargs="+", choices=list(SOLVE_MODES), default=["monolithic"]
+    )
+    _parser.add_argument("--output", default="benchmark_results.json")
+    _parser.add_argument(
+        "--memory-profile", help="profile the memory of each stage, writing it to this JSON file"
+    )
+    _args = _parser.parse_args()
+
+    if _args.memory_profile:
+        with MemoryProfiler() as _profiler:
+            _results = run_benchmark(_args.scales, _args.run_time, _args.seed, _args.solve_modes)
+        _profiler.print_report()
+        _profiler.write_json(_args.memory_profile)
+    else:
+        _results = run_benchmark(_args.scales, _args.run_time, _args.seed, _args.solve_modes)
+    with Path(_args.output).open("w") as f:
+        json.dump(_results, f, indent=2)
+    print(f"Benchmark results written to {_args.output}")
+
+
+if __name__ == "__main__":
+    main()
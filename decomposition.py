@@ -0,0 +1,256 @@
+"""Solve a Schedule as several smaller models in parallel processes.
+
+Fixtures interact only through the constraints they share: a team's fixtures through the one
+fixture a week and pair separation rules, the fixtures of a court slot through the one fixture per
+slot rule and the fixtures of teams that share players through the different day rule. Fixtures
+with no such link, directly or through other fixtures, form independent components that are solved
+as separate models.
+
+When the league is a single component the two phase mode solves each league on its own share of
+the court slots, then repairs the combined result with a solve of the full model.
+"""
+
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from Class_League import Fixture, FixtureCourtSlot
+from schedule_report import SolverReport
+from solver_pool import SolveResult, solve_model_protos
+
+if TYPE_CHECKING:
+    from scheduling import Schedule
+
+SolveOutcome = Tuple[str, Optional[np.ndarray], Optional[float]]
+
+
+def get_fixture_components(schedule: "Schedule") -> List[List[Fixture]]:
+    """Return the schedule's fixtures grouped into components that share no constraint.
+
+    Uses union-find over the fixtures, joining fixtures that share a team, a court slot or a
+    clique of teams that share players.
+
+    :param schedule: schedule to split
+    :return: the fixtures of each component, largest first
+    """
+    _parent = list(range(len(schedule.fixtures)))
+
+    def _find(_number: int) -> int:
+        while _parent[_number] != _number:
+            _parent[_number] = _parent[_parent[_number]]
+            _number = _parent[_number]
+        return _number
+
+    _first_fixture: Dict[Tuple[str, object], int] = {}
+
+    def _link(_key: Tuple[str, object], _number: int):
+        if _key in _first_fixture:
+            _parent[_find(_number)] = _find(_first_fixture[_key])
+        else:
+            _first_fixture[_key] = _number
+
+    _team_cliques = defaultdict(list)
+    for _clique_number, _clique in enumerate(
+        schedule.league.get_team_conflict_graph().get_maximal_cliques()
+    ):
+        for t in _clique:
+            _team_cliques[t].append(_clique_number)
+
+    for _number, f in enumerate(schedule.fixtures):
+        for t in (f.home_team, f.away_team):
+            _link(("team", t), _number)
+            for _clique_number in _team_cliques[t]:
+                _link(("clique", _clique_number), _number)
+    for _position, fs in enumerate(schedule.fixture_slots):
+        _link(("court_slot", fs.court_slot), int(schedule.fixture_slot_fixture_numbers[_position]))
+
+    _components = defaultdict(list)
+    for _number, f in enumerate(schedule.fixtures):
+        _components[_find(_number)].append(f)
+    return sorted(_components.values(), key=len, reverse=True)
+
+
+def solve_sub_schedules(
+    schedule: "Schedule", sub_schedules: List["Schedule"], allowed_run_time: float
+) -> Tuple[List[SolveResult], np.ndarray]:
+    """Solve the sub schedules in parallel and map their solutions onto the schedule's slots.
+
+    :return: the result of each sub schedule and the 0/1 values aligned with the schedule's
+        fixture_slots, 0 for slots of sub schedules without a solution
+    """
+    _results = solve_model_protos(
+        [s.model.Proto().SerializeToString() for s in sub_schedules],
+        allowed_run_time,
+        max_workers=schedule.options.max_workers,
+    )
+    _values = np.zeros(len(schedule.fixture_slots), dtype=int)
+    for _sub_schedule, _result in zip(sub_schedules, _results):
+        if _result["solution"] is None:
+            continue
+        _positions = [
+            schedule.fixture_slot_positions[fs.identifier] for fs in _sub_schedule.fixture_slots
+        ]
+        _values[_positions] = np.asarray(_result["solution"], dtype=int)[
+            _sub_schedule.fixture_slot_var_indices
+        ]
+    return _results, _values
+
+
+def get_combined_status(_results: List[SolveResult]) -> str:
+    """Return OPTIMAL if all are optimal, FEASIBLE if all have a solution, else a failure status."""
+    _statuses = [r["status"] for r in _results]
+    if all(s == "OPTIMAL" for s in _statuses):
+        return "OPTIMAL"
+    for s in _statuses:
+        if s not in ["FEASIBLE", "OPTIMAL"]:
+            return s
+    return "FEASIBLE"
+
+
+def get_solver_report(
+    _status: str, _results: List[SolveResult], _wall_time: float
+) -> SolverReport:
+    """Return one report over several parallel solves, summing their statistics."""
+    _has_solution = _status in ["FEASIBLE", "OPTIMAL"]
+    return SolverReport(
+        status=_status,
+        wall_time=_wall_time,
+        user_time=sum(r["user_time"] for r in _results),
+        deterministic_time=sum(r["deterministic_time"] for r in _results),
+        num_conflicts=sum(r["num_conflicts"] for r in _results),
+        num_branches=sum(r["num_branches"] for r in _results),
+        num_solutions=len(_results) if _has_solution else 0,
+        objective=sum(r["objective"] for r in _results) if _has_solution else None,
+        best_bound=sum(r["best_bound"] for r in _results),
+    )
+
+
+def solve_components(
+    schedule: "Schedule", allowed_run_time: float, solution_sinks=None, stop_rules=None
+) -> SolveOutcome:
+    """Solve each independent component of the schedule as its own model, in parallel.
+
+    The allowance of fixtures in the incorrect week is shared by the whole league, so when it is
+    not zero and there is more than one component the two phase mode is used instead. A single
+    component is solved as one model. Solution sinks and stop rules are only used by a single
+    model solve.
+
+    :param schedule: built schedule to solve
+    :param allowed_run_time: seconds each component's solver is allowed
+    :return: status, 0/1 values aligned with fixture_slots or None, and objective value
+    """
+    _components = get_fixture_components(schedule)
+    print(f"Independent components: {[len(c) for c in _components]}")
+    if len(_components) <= 1:
+        return schedule.solve_monolithic(allowed_run_time, solution_sinks, stop_rules)
+    if schedule.build_parameters["num_allowed_incorrect_fixture_week"] > 0:
+        print("Incorrect week fixtures couple the components, solving in two phases")
+        return solve_two_phase(schedule, allowed_run_time, solution_sinks, stop_rules)
+
+    _sub_schedules = schedule._run_stage(
+        "build_components",
+        lambda: [schedule.create_sub_schedule(_fixtures) for _fixtures in _components],
+    )
+    _start = time.perf_counter()
+    _results, _values = schedule._run_stage(
+        "solve", solve_sub_schedules, schedule, _sub_schedules, allowed_run_time
+    )
+    _status = get_combined_status(_results)
+    schedule.report.solver = get_solver_report(_status, _results, time.perf_counter() - _start)
+    if _status not in ["FEASIBLE", "OPTIMAL"]:
+        return _status, None, None
+    return _status, _values, schedule.report.solver.objective
+
+
+def get_league_slot_filters(
+    schedule: "Schedule",
+) -> Dict[str, Callable[[FixtureCourtSlot], bool]]:
+    """Return a fixture slot filter for each league, splitting the clubs' court capacity by weekday.
+
+    At each club the weekdays a league can play its home fixtures on are shared out between the
+    leagues that can use them. Weekdays only one league can use go to that league, the rest go in
+    turn to the league with the fewest weekdays at the club so far. Only slots in the correct week
+    type for the league are kept.
+
+    :param schedule: schedule to split
+    :return: dict of filter by league name
+    """
+    _club_weekday_leagues = defaultdict(lambda: defaultdict(set))
+    for fs in schedule.fixture_slots:
+        if fs.is_correct_week():
+            _club_weekday_leagues[fs.court_slot.club][fs.court_slot.date.weekday].add(
+                fs.fixture.home_team.league
+            )
+
+    _weekday_league = {}
+    for _club, _weekday_leagues in _club_weekday_leagues.items():
+        _league_weekday_count = defaultdict(int)
+        for _weekday, _leagues in sorted(
+            _weekday_leagues.items(), key=lambda item: (len(item[1]), str(item[0]))
+        ):
+            _league = min(sorted(_leagues), key=lambda _l: _league_weekday_count[_l])
+            _league_weekday_count[_league] += 1
+            _weekday_league[(_club, _weekday)] = _league
+
+    def _get_filter(_league: str):
+        def _in_league_share(_fixture_slot: FixtureCourtSlot) -> bool:
+            _court_slot = _fixture_slot.court_slot
+            return (
+                _fixture_slot.is_correct_week()
+                and _weekday_league.get((_court_slot.club, _court_slot.date.weekday)) == _league
+            )
+
+        return _in_league_share
+
+    return {
+        _league: _get_filter(_league) for _league in {f.home_team.league for f in schedule.fixtures}
+    }
+
+
+def solve_two_phase(
+    schedule: "Schedule",
+    allowed_run_time: float,
+    solution_sinks=None,
+    stop_rules=None,
+    repair_time_fraction: float = 0.5,
+) -> SolveOutcome:
+    """Solve each league in parallel on its share of the court slots, then repair the combination.
+
+    Phase one builds a model per league over the correct week slots on the weekdays given to the
+    league by get_league_slot_filters and solves them in parallel. The combined result breaks no
+    court slot rule but may break the shared players rule between leagues or leave fixtures
+    unscheduled, so phase two solves the full model hinted with it.
+
+    :param schedule: built schedule to solve
+    :param allowed_run_time: seconds for both phases together
+    :param solution_sinks: passed to the repair solve
+    :param stop_rules: passed to the repair solve
+    :param repair_time_fraction: share of allowed_run_time given to the repair solve
+    :return: status, 0/1 values aligned with fixture_slots or None, and objective value
+    """
+    _league_fixtures = defaultdict(list)
+    for f in schedule.fixtures:
+        _league_fixtures[f.home_team.league].append(f)
+    _slot_filters = get_league_slot_filters(schedule)
+
+    _sub_schedules = schedule._run_stage(
+        "build_leagues",
+        lambda: [
+            schedule.create_sub_schedule(_fixtures, _slot_filters[_league])
+            for _league, _fixtures in sorted(_league_fixtures.items())
+        ],
+    )
+    _phase_one_time = allowed_run_time * (1 - repair_time_fraction)
+    _results, _values = schedule._run_stage(
+        "solve_leagues", solve_sub_schedules, schedule, _sub_schedules, _phase_one_time
+    )
+    print(f"Phase one statuses: {[r['status'] for r in _results]}")
+    print(f"Phase one fixtures scheduled: {int(_values.sum())}/{len(schedule.fixtures)}")
+
+    schedule.model.ClearHints()
+    schedule._add_solution_hints(np.flatnonzero(_values).tolist())
+    return schedule.solve_monolithic(
+        allowed_run_time * repair_time_fraction, solution_sinks, stop_rules
+    )
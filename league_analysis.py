@@ -1,17 +1,56 @@
 """Run this file to analyse the league results."""
-import matplotlib.pyplot as plt
-import pandas as pd
-
-from gsheets import get_gsheet_data
-
-
-def main():
-    """Run the analysis."""
-    # import the match results and person data from Google sheets
-    match_results_df = import_results("Match Results")
-    match_results_processed_df = process_match_results(match_results_df)
+import argparse
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import matplotlib
+
+# Charts are only saved to files, so use the non-interactive backend in this and worker processes
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from gsheets import get_gsheet_data  # noqa: E402
+from results_store import ResultsStore  # noqa: E402
+from standings_store import StandingsStore  # noqa: E402
+
+# The x and y axis of each chart created for a division
+CHART_AXES = [("Match Date", "Running Total"), ("Matches Played", "Current Rank")]
+CHART_COLUMNS = sorted({column for axes in CHART_AXES for column in axes})
+CHART_MANIFEST_FILE = "chart_manifest.json"
+STANDINGS_DIR = "standings"
+RESULTS_STORE_DIR = "results_store"
+
+
+def main(incremental: bool = False, offline: bool = False):
+    """Run the analysis.
+
+    When incremental, only match results added since the last incremental run are processed.
+    When offline, the match results and player data are loaded from the local results store
+    instead of the Google sheets.
+    """
+    results_store = ResultsStore(RESULTS_STORE_DIR)
+    if offline:
+        match_results_df = results_store.load("match_results")
+        players_df = results_store.load("players")
+    else:
+        # import the match results and person data from Google sheets
+        match_results_df = parse_match_results(import_results("Match Results"))
+        players_df = parse_player_results(import_results("Players"))
+        results_store.save("match_results", match_results_df)
+        results_store.save("players", players_df)
+
+    if incremental:
+        match_results_processed_df = update_match_results(
+            match_results_df, StandingsStore(STANDINGS_DIR)
+        )
+    else:
+        match_results_processed_df = process_match_results(match_results_df)
+    results_store.save("match_results_processed", match_results_processed_df)
 
-    players_df = import_results("Players")
     players_df = process_player_results(players_df)
 
     print(match_results_df.head(5).to_markdown())
@@ -46,11 +85,100 @@ def process_match_results(df: pd.DataFrame) -> pd.DataFrame:
     Align the home and away scores into a single column,
     Calculate the accumulative score for each team over time.
     """
-    df["Match ID"] = df.index
-    df[["Home Score", "Away Score"]] = (
-        df["Score"].str.split("-", expand=True).astype(int).rename({"Score": "Score Text"})
+    df = _get_team_results(df)
+    df = df.sort_values(by=["Match Date", "Time"])
+    df["Running Total"] = df.groupby(["Division", "Team"], observed=True)[["Score"]].cumsum()
+    df["Matches Played"] = df.groupby(["Division", "Team"], observed=True)[["Score"]].cumcount() + 1
+    df["Current Rank"] = _get_current_ranks(df)
+
+    print("Processed Match Results")
+    print(df.head(25).to_markdown())
+    return df
+
+
+def update_match_results(df: pd.DataFrame, store: StandingsStore) -> pd.DataFrame:
+    """Process only the match results added since the last run and store the result.
+
+    Matches with a Match ID above the last one stored are new. Their running totals and matches
+    played continue on from each team's stored standings, unless a new match is dated before a
+    match already processed for one of its teams, when that division is processed again in full.
+    Current ranks are only recalculated in the divisions with new matches.
+    """
+    processed_df, team_state_df, last_match_id = store.load()
+    if processed_df is None:
+        processed_df = process_match_results(df)
+        store.save(processed_df, _get_team_state(processed_df), processed_df["Match ID"].max())
+        return processed_df
+
+    new_df = df[df.index > last_match_id]
+    if len(new_df) == 0:
+        print("No new match results")
+        return processed_df
+    new_df = _get_team_results(new_df).sort_values(by=["Match Date", "Time"]).merge(
+        team_state_df, on=["Division", "Team"], how="left", suffixes=("", " Before")
     )
+    divisions = new_df["Division"].unique()
+    late_divisions = new_df.loc[
+        new_df["Match Date"] < new_df["Match Date Before"], "Division"
+    ].unique()
+    print(f"Processing {new_df['Match ID'].nunique()} new matches in divisions {list(divisions)}")
+
+    # Continue each team's running total and matches played from its stored standings
+    new_df = new_df[~new_df["Division"].isin(late_divisions)].copy()
+    team_groups = new_df.groupby(["Division", "Team"], observed=True)
+    new_df["Running Total"] = team_groups["Score"].cumsum() + new_df["Running Total"].fillna(0)
+    new_df["Matches Played"] = team_groups.cumcount() + 1 + new_df["Matches Played"].fillna(0)
+    new_df = new_df.astype({"Running Total": int, "Matches Played": int})
+    new_df.index = new_df["Match ID"].to_numpy()
+
+    # A match dated before one already processed changes the standings after it, so process
+    # those divisions again from all their matches
+    is_late = processed_df["Division"].isin(late_divisions).to_numpy()
+    late_df = processed_df.iloc[:0]
+    if len(late_divisions):
+        print(f"Reprocessing divisions with late results: {list(late_divisions)}")
+        late_df = process_match_results(df[df["Division"].isin(late_divisions)])
+
+    processed_df = pd.concat(
+        [
+            processed_df[~is_late],
+            new_df.reindex(columns=processed_df.columns),
+            late_df[processed_df.columns],
+        ]
+    )
+    is_updated = processed_df["Division"].isin(divisions).to_numpy()
+    processed_df.loc[is_updated, "Current Rank"] = _get_current_ranks(
+        processed_df[is_updated]
+    ).to_numpy()
+    team_state_df = pd.concat(
+        [
+            team_state_df[~team_state_df["Division"].isin(divisions)],
+            _get_team_state(processed_df[is_updated]),
+        ],
+        ignore_index=True,
+    )
+    store.save(processed_df, team_state_df, max(last_match_id, df.index.max()))
+    return processed_df
+
+
+def parse_match_results(df: pd.DataFrame) -> pd.DataFrame:
+    """Give each match an ID, split the score into home and away scores and parse the date.
+
+    Results that have already been parsed are returned as they are.
+    """
+    if "Home Score" in df.columns:
+        return df
+    df = df.copy()
+    df["Match ID"] = df.index
+    df = df.rename(columns={"Score": "Score Text"})
+    df[["Home Score", "Away Score"]] = df["Score Text"].str.split("-", expand=True).astype(int)
     df["Match Date"] = pd.to_datetime(df["Match Date"])
+    return df
+
+
+def _get_team_results(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a row per team in each match, with its score, from the match results."""
+    df = parse_match_results(df)
     shared_columns = [
         "Division",
         "Status",
@@ -69,29 +197,56 @@ def process_match_results(df: pd.DataFrame) -> pd.DataFrame:
             df.rename(columns=away_columns)[shared_columns],
         ]
     )
-    df = df.sort_values(by=["Match Date", "Time"])
-    df["Running Total"] = df.groupby(["Division", "Team"])[["Score"]].cumsum()
-    df["Matches Played"] = df.groupby(["Division", "Team"])[["Score"]].cumcount() + 1
 
-    df["Current Rank"] = df.groupby(["Division", "Matches Played"])["Running Total"].rank(
+    # Get club from team by removing the division strings "Ladies, Open, Mixed" and anything after
+    df["Club"] = df["Team"].str.replace(r"\s*(Ladies|Open|Mixed).*", "", regex=True)
+    return df
+
+
+def _get_current_ranks(df: pd.DataFrame) -> pd.Series:
+    """Return the rank of each running total among the division's teams after as many matches."""
+    return df.groupby(["Division", "Matches Played"], observed=True)["Running Total"].rank(
         ascending=True, method="max"
     )
 
-    # Get club from team by removing the division strings "Ladies, Open, Mixed" and anything after
-    df["Club"] = df["Team"].str.replace(r"\s*(Ladies|Open|Mixed).*", "", regex=True)
 
-    print("Processed Match Results")
-    print(df.head(25).to_markdown())
-    return df
+def _get_team_state(df: pd.DataFrame) -> pd.DataFrame:
+    """Return each team's running total, matches played and date after its last match."""
+    return (
+        df.groupby(["Division", "Team"], observed=True)[
+            ["Running Total", "Matches Played", "Match Date"]
+        ]
+        .max()
+        .reset_index()
+    )
 
 
 def process_player_results(df: pd.DataFrame) -> pd.DataFrame:
     """Take the player raw data and prepares for analysis.
 
+    Parse the raw data if needed
+    Calculate the percentage of potential fixtures played
+    """
+    df = parse_player_results(df)
+
+    df["Played Percentage"] = df["Matches Played"] / df["Potential Fixtures"]
+
+    df_sorted = df.sort_values(by=["Rating", "Played Percentage"], ascending=False)
+
+    return df_sorted
+
+
+def parse_player_results(df: pd.DataFrame) -> pd.DataFrame:
+    """Parse the player raw data.
+
     Split Rubbers Won/Lost/Drawn into separate columns
     Convert Rating from Text to Numeric
     Split Matches Played into separate columns
+    Data that has already been parsed is returned as it is.
     """
+    if "Rubbers Won" in df.columns:
+        return df
+    df = df.copy()
     # Split the 'Rubbers' column into 'Rubbers Won', 'Rubbers Lost', and 'Rubbers Drawn'
     df[["Rubbers Won", "Rubbers Lost", "Rubbers Drawn"]] = (
         df["Rubbers"].str.split("/", expand=True).astype(int)
@@ -105,27 +260,48 @@ def process_player_results(df: pd.DataFrame) -> pd.DataFrame:
         df["Matches Played"].str.split("/", expand=True).astype(int)
     )
 
-    df["Played Percentage"] = df["Matches Played"] / df["Potential Fixtures"]
+    # Drop the original 'Rubbers' column
+    return df.drop(columns=["Rubbers"])
 
-    df_sorted = df.sort_values(by=["Rating", "Played Percentage"], ascending=False)
-
-    # Drop the original 'Rubbers' and 'Matches Played / Fixtures' columns
-    df_sorted = df.drop(columns=["Rubbers"])
-
-    return df_sorted
 
-
-def create_division_charts(match_results_df: pd.DataFrame) -> pd.DataFrame:
-    """Create a chart for each division."""
-    # Identify the different divisions
-    divisions = match_results_df["Division"].unique()
-    for division in divisions:
-        create_division_chart(
-            match_results_df, division, x_axis="Match Date", y_axis="Running Total"
-        )
-        create_division_chart(
-            match_results_df, division, x_axis="Matches Played", y_axis="Current Rank"
-        )
+def create_division_charts(
+    match_results_df: pd.DataFrame,
+    max_workers: Optional[int] = None,
+    manifest_file: str = CHART_MANIFEST_FILE,
+) -> pd.DataFrame:
+    """Create each chart in CHART_AXES for each division, rendering divisions in parallel.
+
+    The results are split by division once. A chart is only rendered when its file is missing or
+    the hash of its input slice differs from the one recorded in the manifest file at the last run.
+    Returns a row per chart with its file and whether it was rendered.
+    """
+    manifest = _read_chart_manifest(manifest_file)
+    charts = []
+    jobs = []
+    for division, division_df in match_results_df.groupby("Division", observed=True, sort=False):
+        division_jobs = []
+        for x_axis, y_axis in CHART_AXES:
+            file_name = _get_chart_file_name(division, x_axis, y_axis)
+            chart_hash = _get_chart_hash(division_df, division, x_axis, y_axis)
+            rendered = manifest.get(file_name) != chart_hash or not Path(file_name).exists()
+            if rendered:
+                division_jobs.append((x_axis, y_axis, file_name))
+            manifest[file_name] = chart_hash
+            charts.append([division, x_axis, y_axis, file_name, rendered])
+        if division_jobs:
+            jobs.append((division, division_df[["Team", *CHART_COLUMNS]], division_jobs))
+
+    if len(jobs) > 1 and max_workers != 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(_render_division_charts, *zip(*jobs)))
+    else:
+        for job in jobs:
+            _render_division_charts(*job)
+
+    Path(manifest_file).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    charts_df = pd.DataFrame(charts, columns=["Division", "X Axis", "Y Axis", "File", "Rendered"])
+    print(f"Charts rendered {charts_df['Rendered'].sum()} of {len(charts_df)}")
+    return charts_df
 
 
 def create_division_chart(
@@ -135,12 +311,26 @@ def create_division_chart(
     y_axis: str = "Running Total",
 ) -> None:
     """Create a chart for a single division for given X & Y axis."""
-    # Create a chart for each division
     df = match_results_df[match_results_df["Division"] == division]
+    file_name = _get_chart_file_name(division, x_axis, y_axis)
+    _plot_division_chart(df, division, x_axis, y_axis, file_name)
+
+
+def _render_division_charts(
+    division: str, division_df: pd.DataFrame, division_jobs: List[Tuple[str, str, str]]
+) -> None:
+    """Render the charts of one division, run in a worker process."""
+    for x_axis, y_axis, file_name in division_jobs:
+        _plot_division_chart(division_df, division, x_axis, y_axis, file_name)
+
+
+def _plot_division_chart(
+    df: pd.DataFrame, division: str, x_axis: str, y_axis: str, file_name: str
+) -> None:
+    """Plot the results of one division, a line per team, and save the chart to a file."""
     fig, ax = plt.subplots(figsize=(10, 6))
 
-    for team in df["Team"].unique():
-        team_data = df[df["Team"] == team]
+    for team, team_data in df.groupby("Team", observed=True, sort=False):
         final_result = team_data.iloc[-1]
         ax.plot(
             team_data[x_axis],
@@ -164,10 +354,30 @@ def create_division_chart(
     # Place the legend outside the chart to the right
     ax.legend(bbox_to_anchor=(1.2, 1), loc="upper left")
 
-    # Save the chart to a file
-    plt.savefig(f"{division}_Standings_{y_axis}_by_{x_axis}.png", bbox_inches="tight")
+    # Save the chart to a file and release the figure, pyplot keeps every open figure alive
+    fig.savefig(file_name, bbox_inches="tight")
+    plt.close(fig)
+
+
+def _get_chart_file_name(division: str, x_axis: str, y_axis: str) -> str:
+    """Return the file name a division chart is saved to."""
+    return f"{division}_Standings_{y_axis}_by_{x_axis}.png"
+
 
-    # create a chart that shows the current score for each team over time.
+def _get_chart_hash(division_df: pd.DataFrame, division: str, x_axis: str, y_axis: str) -> str:
+    """Return a hash of everything a division chart is drawn from."""
+    chart_hash = hashlib.sha256(f"{division}|{x_axis}|{y_axis}".encode())
+    chart_df = division_df[["Team", x_axis, y_axis]].reset_index(drop=True)
+    chart_hash.update(pd.util.hash_pandas_object(chart_df, index=False).values.tobytes())
+    return chart_hash.hexdigest()
+
+
+def _read_chart_manifest(manifest_file: str) -> Dict[str, str]:
+    """Return the chart hashes recorded at the last run, by file name."""
+    try:
+        return json.loads(Path(manifest_file).read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
 
 def import_results(sheet_name: str) -> pd.DataFrame:
@@ -181,4 +391,12 @@ def import_results(sheet_name: str) -> pd.DataFrame:
 
 
 if __name__ == "__main__":
-    main()
+    _parser = argparse.ArgumentParser(description=__doc__)
+    _parser.add_argument(
+        "--incremental", action="store_true", help="only process results added since last run"
+    )
+    _parser.add_argument(
+        "--offline", action="store_true", help="load results from the local store, not the sheets"
+    )
+    _args = _parser.parse_args()
+    main(_args.incremental, _args.offline)
@@ -0,0 +1,262 @@
+"""Fast capacity checks on a League, run before any scheduling model is built.
+
+Each check compares the number of fixtures that must be placed (demand) with an upper bound on
+the number that can be placed (supply), counted with pandas rather than by building the model.
+A shortfall in any check means the schedule cannot place every fixture.
+"""
+
+import pandas as pd
+
+from Class_League import League
+
+_REPORT_COLUMNS = ["Check", "Level", "Name", "Demand", "Supply", "Shortfall"]
+
+
+def _get_court_slot_table(league: League) -> pd.DataFrame:
+    """Return one row per court slot and team that can use it."""
+    return pd.DataFrame(
+        [
+            {
+                "Club": c.name,
+                "Court Slot": cs.name,
+                "Team": t.name,
+                "Date": cs.date.date_str,
+                "Week": cs.date.get_week_number(),
+            }
+            for c in league.clubs
+            for cs in c.court_slots
+            for t in cs.teams
+        ],
+        columns=["Club", "Court Slot", "Team", "Date", "Week"],
+    )
+
+
+def _get_fixture_table(league: League) -> pd.DataFrame:
+    """Return one row per fixture."""
+    return pd.DataFrame(
+        [
+            {
+                "Home Team": f.home_team.name,
+                "Away Team": f.away_team.name,
+                "Home Club": f.home_team.club.name,
+                "League": f.home_team.league,
+                "Division": f.home_team.division,
+                "Is Intra Club": f.is_intra_club,
+            }
+            for f in league.fixtures
+        ],
+        columns=["Home Team", "Away Team", "Home Club", "League", "Division", "Is Intra Club"],
+    )
+
+
+def _compare(
+    _check: str, _level: str, _demand: pd.Series, _supply: pd.Series
+) -> pd.DataFrame:
+    """Line up demand and supply by name, treating missing supply as zero."""
+    _supply = _supply.reindex(_demand.index, fill_value=0)
+    return pd.DataFrame(
+        {
+            "Check": _check,
+            "Level": _level,
+            "Name": _demand.index.astype(str),
+            "Demand": _demand.to_numpy(),
+            "Supply": _supply.to_numpy(),
+            "Shortfall": (_demand - _supply).to_numpy(),
+        }
+    )
+
+
+def _get_inter_club_window_weeks(league: League, _num_fixtures: pd.Series) -> pd.DataFrame:
+    """Return the weeks each club's intra club fixtures are allowed in.
+
+    Mirrors Schedule.create_constraint_inter_club_matches_first, with the window length set by the
+    number of intra club fixtures the club has.
+    """
+    _weeks = pd.Series(sorted({d.get_week_number() for d in league.dates.dates}), name="Week")
+    _min_week = _weeks.min()
+    _second_year = min(d.date for d in league.dates.dates).year + 1
+    _post_xmas_weeks = [
+        d.get_week_number() for d in league.dates.dates if d.date.year == _second_year
+    ]
+    _post_xmas_week = min(_post_xmas_weeks) if _post_xmas_weeks else None
+
+    _window = _num_fixtures.rename("Num Fixtures").reset_index().merge(_weeks, how="cross")
+    _allowed = _window["Week"] - _min_week < _window["Num Fixtures"]
+    if _post_xmas_week is not None:
+        _allowed |= (_window["Week"] >= _post_xmas_week) & (
+            _window["Week"] <= _post_xmas_week + _window["Num Fixtures"]
+        )
+    return _window.loc[_allowed, ["Club", "Week"]]
+
+
+def get_capacity_report(league: League) -> pd.DataFrame:
+    """Return the demand and supply of every capacity check, worst shortfall first.
+
+    Checks:
+    - team weeks: fixtures of a team vs weeks it has a home or away slot in, as a team plays
+      at most once a week.
+    - team home weeks: home fixtures of a team vs weeks it has a home court slot in.
+    - club court slots: home fixtures of a club vs its court slots.
+    - club intra club window: intra club fixtures with a slot in the weeks they are allowed in
+      vs the club's court slots in those weeks. Fixtures with no slot in the window are not
+      constrained to it, as in Schedule.create_constraint_inter_club_matches_first.
+    - division weeks: fixtures in a division vs the sum over weeks of the smaller of half the
+      division's teams and the court slots available to the division.
+    - shared players dates: fixtures of a group of teams that all share players vs the dates
+      any of them has a slot on, as at most one of them can play on a date.
+
+    :param league: league to check
+    :return: DataFrame with columns Check, Level, Name, Demand, Supply and Shortfall
+    """
+    _slots = _get_court_slot_table(league)
+    _fixtures = _get_fixture_table(league)
+    if _fixtures.empty:
+        return pd.DataFrame(columns=_REPORT_COLUMNS)
+
+    _reports = []
+
+    # Team: every fixture needs its own week, home weeks come from the team's slots and away
+    # weeks from the slots of the home team.
+    _home_weeks = _slots[["Team", "Week"]].drop_duplicates()
+    _away_weeks = _fixtures[["Home Team", "Away Team"]].merge(
+        _home_weeks, left_on="Home Team", right_on="Team"
+    )[["Away Team", "Week"]]
+    _team_weeks = pd.concat(
+        [_home_weeks, _away_weeks.rename(columns={"Away Team": "Team"})]
+    ).drop_duplicates()
+    _team_fixtures = pd.concat([_fixtures["Home Team"], _fixtures["Away Team"]]).value_counts()
+    _reports.append(
+        _compare("team weeks", "Team", _team_fixtures, _team_weeks.groupby("Team").size())
+    )
+    _reports.append(
+        _compare(
+            "team home weeks",
+            "Team",
+            _fixtures["Home Team"].value_counts(),
+            _home_weeks.groupby("Team").size(),
+        )
+    )
+
+    # Club: each court slot holds one fixture.
+    _club_slots = _slots[["Club", "Court Slot", "Week"]].drop_duplicates()
+    _reports.append(
+        _compare(
+            "club court slots",
+            "Club",
+            _fixtures["Home Club"].value_counts(),
+            _club_slots.groupby("Club").size(),
+        )
+    )
+
+    # Intra club fixtures go in the club's window, except those with no slot in it, which the
+    # constraint leaves free. A fixture's slots are its home team's court slots.
+    _intra_fixtures = _fixtures[_fixtures["Is Intra Club"]]
+    _intra_club = _intra_fixtures["Home Club"].value_counts()
+    _intra_club.index.name = "Club"
+    if not _intra_club.empty:
+        _window_weeks = _get_inter_club_window_weeks(league, _intra_club)
+        _window_slots = _club_slots.merge(_window_weeks, on=["Club", "Week"])
+        _window_teams = _slots.merge(_window_weeks, on=["Club", "Week"])["Team"].unique()
+        _window_demand = _intra_fixtures.loc[
+            _intra_fixtures["Home Team"].isin(_window_teams), "Home Club"
+        ].value_counts()
+        _window_demand.index.name = "Club"
+        _reports.append(
+            _compare(
+                "club intra club window",
+                "Club",
+                _window_demand,
+                _window_slots.groupby("Club").size(),
+            )
+        )
+
+    # Division: in any week at most half of a division's teams can play.
+    _team_divisions = pd.DataFrame(
+        {
+            "Team": [t.name for t in league.get_teams()],
+            "Division Name": [f"{t.league} {t.division}" for t in league.get_teams()],
+        }
+    )
+    _division_teams = _team_divisions.groupby("Division Name").size()
+    _division_week_slots = (
+        _slots.merge(_team_divisions, on="Team")[["Division Name", "Court Slot", "Week"]]
+        .drop_duplicates()
+        .groupby(["Division Name", "Week"])
+        .size()
+        .rename("Slots")
+        .reset_index()
+    )
+    _division_week_slots["Supply"] = _division_week_slots["Slots"].clip(
+        upper=(_division_week_slots["Division Name"].map(_division_teams) // 2)
+    )
+    _division_fixtures = (
+        _fixtures["League"] + " " + _fixtures["Division"].astype(str)
+    ).value_counts()
+    _reports.append(
+        _compare(
+            "division weeks",
+            "Division",
+            _division_fixtures,
+            _division_week_slots.groupby("Division Name")["Supply"].sum(),
+        )
+    )
+
+    # Shared players: the teams in a clique of the conflict graph play on different dates.
+    _cliques = pd.DataFrame(
+        [
+            {"Clique": " / ".join(t.name for t in _clique), "Team": t.name}
+            for _clique in league.get_team_conflict_graph().get_maximal_cliques()
+            for t in _clique
+        ],
+        columns=["Clique", "Team"],
+    )
+    if not _cliques.empty:
+        _home_dates = _slots[["Team", "Date"]].drop_duplicates()
+        _away_dates = _fixtures[["Home Team", "Away Team"]].merge(
+            _home_dates, left_on="Home Team", right_on="Team"
+        )[["Away Team", "Date"]]
+        _team_dates = pd.concat(
+            [_home_dates, _away_dates.rename(columns={"Away Team": "Team"})]
+        ).drop_duplicates()
+        _fixture_teams = pd.concat(
+            [
+                _fixtures["Home Team"].rename("Team").reset_index(),
+                _fixtures["Away Team"].rename("Team").reset_index(),
+            ]
+        )
+        _clique_fixtures = (
+            _cliques.merge(_fixture_teams, on="Team")[["Clique", "index"]]
+            .drop_duplicates()
+            .groupby("Clique")
+            .size()
+        )
+        _clique_dates = (
+            _cliques.merge(_team_dates, on="Team")[["Clique", "Date"]]
+            .drop_duplicates()
+            .groupby("Clique")
+            .size()
+        )
+        _reports.append(
+            _compare("shared players dates", "Clique", _clique_fixtures, _clique_dates)
+        )
+
+    _report = pd.concat(_reports, ignore_index=True)
+    return _report.sort_values(by="Shortfall", ascending=False, kind="stable").reset_index(
+        drop=True
+    )
+
+
+def check_league_capacity(league: League) -> pd.DataFrame:
+    """Check the league has the capacity to schedule every fixture, failing fast if not.
+
+    :param league: league to check
+    :return: the capacity report
+    :raises ValueError: listing every check with a shortfall, worst first
+    """
+    _report = get_capacity_report(league)
+    _shortfalls = _report[_report["Shortfall"] > 0]
+    if not _shortfalls.empty:
+        raise ValueError(
+            f"League does not have capacity for all fixtures:\n{_shortfalls.to_string(index=False)}"
+        )
+    return _report
@@ -0,0 +1,212 @@
+"""Queries over the processed match results and player data, answered from precomputed indexes.
+
+LeagueQueries builds, once, the standings table of each division after each match date, the
+matches between each pair of teams and the player leaderboards of the whole league, each
+division and each club. A query then only looks up a table and slices it, so it does not depend
+on the size of the results.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from results_store import ResultsStore
+
+DateLike = Union[str, datetime, pd.Timestamp]
+STANDINGS_COLUMNS = ["Position", "Team", "Running Total", "Matches Played"]
+
+
+class LeagueQueries:
+    """Standings, head to head and player leaderboard queries over a season's results."""
+
+    def __init__(self, match_results_df: pd.DataFrame, players_df: Optional[pd.DataFrame] = None):
+        """Build the indexes.
+
+        :param match_results_df: processed match results, from process_match_results
+        :param players_df: processed player results, from process_player_results, or None for no
+            player queries
+        """
+        self.division_dates: Dict[str, np.ndarray] = {}
+        self.division_standings: Dict[str, List[pd.DataFrame]] = {}
+        for _division, _division_df in match_results_df.groupby("Division", observed=True):
+            _dates, _standings = self._get_division_standings(_division_df)
+            self.division_dates[str(_division)] = _dates
+            self.division_standings[str(_division)] = _standings
+
+        self.head_to_head = self._get_head_to_head(match_results_df)
+
+        self.player_rankings: Dict[Tuple[str, str], pd.DataFrame] = {}
+        self.player_participation: Dict[Tuple[str, str], pd.DataFrame] = {}
+        if players_df is not None:
+            self._index_players(players_df)
+
+    @classmethod
+    def from_store(cls, results_store: ResultsStore) -> "LeagueQueries":
+        """Build the indexes from the tables saved by league_analysis in a results store."""
+        _columns = [
+            "Division",
+            "Team",
+            "Match ID",
+            "Match Date",
+            "Score",
+            "Running Total",
+            "Matches Played",
+        ]
+        _players_df = None
+        if results_store.has_table("players"):
+            _players_df = results_store.load("players")
+            _players_df["Played Percentage"] = (
+                _players_df["Matches Played"] / _players_df["Potential Fixtures"]
+            )
+        return cls(results_store.load("match_results_processed", columns=_columns), _players_df)
+
+    @staticmethod
+    def _get_division_standings(
+        _division_df: pd.DataFrame,
+    ) -> Tuple[np.ndarray, List[pd.DataFrame]]:
+        """Return the match dates of a division and its standings before the first and after each.
+
+        Teams are positioned by running total, teams on the same total sharing a position.
+        """
+        _df = _division_df.astype({"Team": str})
+        _totals = _df.pivot_table(
+            index="Match Date", columns="Team", values="Running Total", aggfunc="max"
+        )
+        _played = _df.pivot_table(
+            index="Match Date", columns="Team", values="Matches Played", aggfunc="max"
+        )
+        _totals = _totals.cummax().fillna(0).astype(int)
+        _played = _played.cummax().fillna(0).astype(int)
+
+        _teams = np.asarray(_totals.columns)
+        _standings = [_get_standings_table(_teams, np.zeros(len(_teams)), np.zeros(len(_teams)))]
+        for _total, _num_played in zip(_totals.to_numpy(), _played.to_numpy()):
+            _standings.append(_get_standings_table(_teams, _total, _num_played))
+        return _totals.index.to_numpy(dtype="datetime64[ns]"), _standings
+
+    @staticmethod
+    def _get_head_to_head(match_results_df: pd.DataFrame) -> Dict[Tuple[str, str], pd.DataFrame]:
+        """Return the matches between each pair of teams, by team and opponent."""
+        _df = match_results_df[["Match ID", "Match Date", "Division", "Team", "Score"]].astype(
+            {"Team": str, "Division": str}
+        )
+        _df = _df.merge(
+            _df[["Match ID", "Team", "Score"]].rename(
+                columns={"Team": "Opponent", "Score": "Opponent Score"}
+            ),
+            on="Match ID",
+        )
+        _df = _df[_df["Team"] != _df["Opponent"]].sort_values(by=["Match Date", "Match ID"])
+        _columns = ["Match ID", "Match Date", "Division", "Score", "Opponent Score"]
+        return {
+            _pair: _pair_df[_columns].reset_index(drop=True)
+            for _pair, _pair_df in _df.groupby(["Team", "Opponent"])
+        }
+
+    def _index_players(self, players_df: pd.DataFrame):
+        """Index the player leaderboards of the league, each division and each club.
+
+        Rankings are sorted by rating then played percentage, participation by played percentage.
+        """
+        _groupings = [(None, None)]
+        _groupings += [(d, None) for d in players_df.get("Division", pd.Series()).unique()]
+        _groupings += [(None, c) for c in players_df.get("Club", pd.Series()).unique()]
+        for _division, _club in _groupings:
+            _mask = np.ones(len(players_df), dtype=bool)
+            if _division is not None:
+                _mask &= (players_df["Division"] == _division).to_numpy()
+            if _club is not None:
+                _mask &= (players_df["Club"] == _club).to_numpy()
+            _key = (_division, _club)
+            self.player_rankings[_key] = players_df[_mask].sort_values(
+                by=["Rating", "Played Percentage"], ascending=False, ignore_index=True
+            )
+            self.player_participation[_key] = players_df[_mask].sort_values(
+                by="Played Percentage", ascending=False, ignore_index=True
+            )
+
+    def get_standings(self, division: str, date: Optional[DateLike] = None) -> pd.DataFrame:
+        """Return a division's standings after the matches played on or before a date.
+
+        :param division: division name
+        :param date: date of the standings, the latest if None
+        :return: Position, Team, Running Total and Matches Played of each team, by position
+        """
+        _standings = self.division_standings[division]
+        if date is None:
+            return _standings[-1]
+        _number = np.searchsorted(
+            self.division_dates[division], np.datetime64(pd.Timestamp(date), "ns"), side="right"
+        )
+        return _standings[_number]
+
+    def get_top_teams(
+        self, division: str, num_teams: int, date: Optional[DateLike] = None
+    ) -> pd.DataFrame:
+        """Return the first num_teams rows of a division's standings, see get_standings."""
+        return self.get_standings(division, date).iloc[:num_teams]
+
+    def get_head_to_head(self, team: str, opponent: str) -> pd.DataFrame:
+        """Return the matches between two teams, oldest first.
+
+        :return: Match ID, Match Date, Division, the team's Score and the Opponent Score of each
+            match, empty if they have not played
+        """
+        _matches = self.head_to_head.get((team, opponent))
+        if _matches is None:
+            return pd.DataFrame(
+                columns=["Match ID", "Match Date", "Division", "Score", "Opponent Score"]
+            )
+        return _matches
+
+    def get_top_players(
+        self, num_players: int, division: Optional[str] = None, club: Optional[str] = None
+    ) -> pd.DataFrame:
+        """Return the players with the highest ratings, ties broken by played percentage.
+
+        :param num_players: number of players to return
+        :param division: only players in this division, needs a Division column in the player data
+        :param club: only players of this club, needs a Club column in the player data
+        :return: player rows, best first
+        """
+        return self.player_rankings[(division, club)].iloc[:num_players]
+
+    def get_players_by_played_percentage(
+        self,
+        min_played_percentage: float,
+        division: Optional[str] = None,
+        club: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Return the players who played more than a share of their potential fixtures.
+
+        :param min_played_percentage: share of potential fixtures, 0.8 for 80%
+        :param division: only players in this division, needs a Division column in the player data
+        :param club: only players of this club, needs a Club column in the player data
+        :return: player rows, highest played percentage first
+        """
+        _players = self.player_participation[(division, club)]
+        _num_players = np.searchsorted(
+            -_players["Played Percentage"].to_numpy(), -min_played_percentage, side="left"
+        )
+        return _players.iloc[:_num_players]
+
+
+def _get_standings_table(
+    _teams: np.ndarray, _totals: np.ndarray, _num_played: np.ndarray
+) -> pd.DataFrame:
+    """Return the standings of teams with the given running totals and matches played."""
+    _order = np.lexsort((_teams, -_totals))
+    _sorted_totals = _totals[_order]
+    _is_new_position = np.r_[True, _sorted_totals[1:] != _sorted_totals[:-1]]
+    _positions = np.maximum.accumulate(np.where(_is_new_position, np.arange(1, len(_order) + 1), 0))
+    return pd.DataFrame(
+        {
+            "Position": _positions,
+            "Team": _teams[_order],
+            "Running Total": _sorted_totals.astype(int),
+            "Matches Played": _num_played[_order].astype(int),
+        },
+        columns=STANDINGS_COLUMNS,
+    )
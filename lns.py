@@ -0,0 +1,209 @@
+"""Large neighbourhood search over a built Schedule.
+
+Starting from the best solution of a short solve of the full model, the search repeatedly frees
+the fixture slots of one neighbourhood, a club, a division or a window of weeks, fixes every other
+slot to its value in the incumbent and solves that much smaller model under a short time limit.
+Any solution found is a solution of the full model, so it replaces the incumbent whenever it
+schedules at least as many fixtures. Worker processes explore different neighbourhoods at the
+same time.
+"""
+
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import TYPE_CHECKING, List, Tuple
+
+import numpy as np
+
+from decomposition import SolveOutcome
+from solution_callbacks import SolutionSnapshot
+from solver_pool import solve_model_proto
+
+if TYPE_CHECKING:
+    from scheduling import Schedule
+
+Neighbourhood = Tuple[str, np.ndarray]
+
+
+def get_neighbourhoods(schedule: "Schedule", week_window: int = 3) -> List[Neighbourhood]:
+    """Return the neighbourhoods of the schedule, each a name and the slot positions it frees.
+
+    A club frees the slots of fixtures its teams play home or away, a division the slots of its
+    fixtures and a week window the slots in that many consecutive weeks, windows overlapping by
+    half.
+
+    :param schedule: built schedule
+    :param week_window: number of weeks in each week window
+    :return: list of neighbourhoods
+    """
+    _home_clubs = np.array([fs.fixture.home_team.club.name for fs in schedule.fixture_slots])
+    _away_clubs = np.array([fs.fixture.away_team.club.name for fs in schedule.fixture_slots])
+    _divisions = np.array(
+        [
+            f"{fs.fixture.home_team.league} {fs.fixture.home_team.division}"
+            for fs in schedule.fixture_slots
+        ]
+    )
+    _weeks = np.array([fs.get_week_number() for fs in schedule.fixture_slots], dtype=int)
+
+    _neighbourhoods = []
+    for _club in np.unique(_home_clubs):
+        _neighbourhoods.append(
+            (f"club {_club}", np.flatnonzero((_home_clubs == _club) | (_away_clubs == _club)))
+        )
+    for _division in np.unique(_divisions):
+        _neighbourhoods.append((f"division {_division}", np.flatnonzero(_divisions == _division)))
+    if len(_weeks):
+        for _first_week in range(_weeks.min(), _weeks.max() + 1, max(1, week_window // 2)):
+            _in_window = (_weeks >= _first_week) & (_weeks < _first_week + week_window)
+            if _in_window.any():
+                _neighbourhoods.append(
+                    (
+                        f"weeks {_first_week}-{_first_week + week_window - 1}",
+                        np.flatnonzero(_in_window),
+                    )
+                )
+    return _neighbourhoods
+
+
+def _get_snapshot(
+    _solution_number: int,
+    _objective: float,
+    _bound: float,
+    _wall_time: float,
+    _values: np.ndarray,
+) -> SolutionSnapshot:
+    """Return a solution snapshot in the format of StreamingSolutionCallback.snapshot."""
+    return {
+        "solution_number": _solution_number,
+        "objective": _objective,
+        "bound": _bound,
+        "wall_time": _wall_time,
+        "selected": np.flatnonzero(_values).tolist(),
+    }
+
+
+def solve_lns(
+    schedule: "Schedule",
+    allowed_run_time: float,
+    solution_sinks=None,
+    stop_rules=None,
+    initial_time_fraction: float = 0.25,
+    neighbourhood_time: float = 5.0,
+    week_window: int = 3,
+    seed: int = 0,
+) -> SolveOutcome:
+    """Solve the schedule with a short full solve followed by large neighbourhood search.
+
+    The stop rules end the initial solve, e.g. NoImprovementStop hands over to the search as soon
+    as the full solve stalls. The search stops when time runs out, when the incumbent reaches the
+    best bound of the initial solve or after every neighbourhood has been tried without improving
+    the incumbent. Solution sinks are given each solution of the initial solve and each improving
+    solution of the search.
+
+    :param schedule: built schedule to solve
+    :param allowed_run_time: seconds for the initial solve and the search together
+    :param initial_time_fraction: share of allowed_run_time given to the initial solve
+    :param neighbourhood_time: seconds the solver is allowed for each neighbourhood
+    :param week_window: number of weeks in each week window neighbourhood
+    :param seed: seed for the order the neighbourhoods are tried in
+    :return: status, 0/1 values aligned with fixture_slots or None, and objective value
+    """
+    _start = time.perf_counter()
+    _status, _values, _objective = schedule.solve_monolithic(
+        allowed_run_time * initial_time_fraction, solution_sinks, stop_rules
+    )
+    _report = schedule.report.solver
+    if _status in ["OPTIMAL", "INFEASIBLE", "MODEL_INVALID"]:
+        return _status, _values, _objective
+    if _values is None:
+        # With no first solution start from nothing scheduled, which the search can only improve.
+        _values = np.zeros(len(schedule.fixture_slots), dtype=int)
+        _objective = 0.0
+    _bound = _report.best_bound
+
+    _neighbourhoods = get_neighbourhoods(schedule, week_window)
+    _random = random.Random(seed)
+    _order: List[Neighbourhood] = []
+    _model_proto = schedule.model.Proto().SerializeToString()
+    _var_indices = schedule.fixture_slot_var_indices.tolist()
+    _num_workers = schedule.options.max_workers or os.cpu_count() or 1
+    _threads = max(1, (os.cpu_count() or 1) // _num_workers)
+    _tried_without_improvement = 0
+    _num_improvements = 0
+
+    def _next_neighbourhood() -> Neighbourhood:
+        if not _order:
+            _order.extend(_random.sample(_neighbourhoods, len(_neighbourhoods)))
+        return _order.pop()
+
+    def _submit(executor: ProcessPoolExecutor):
+        _name, _positions = _next_neighbourhood()
+        _is_fixed = np.ones(len(_values), dtype=bool)
+        _is_fixed[_positions] = False
+        _incumbent = dict(zip(_var_indices, _values.tolist()))
+        _fixed = {i: v for i, v, f in zip(_var_indices, _values.tolist(), _is_fixed) if f}
+        _time = min(neighbourhood_time, allowed_run_time - (time.perf_counter() - _start))
+        _future = executor.submit(
+            solve_model_proto, _model_proto, _time, _threads, None, _fixed, _incumbent
+        )
+        return _future, _name
+
+    def _search():
+        nonlocal _values, _objective, _tried_without_improvement, _num_improvements
+        _results = []
+        with ProcessPoolExecutor(max_workers=_num_workers) as executor:
+            _running = dict(
+                _submit(executor) for _ in range(min(_num_workers, len(_neighbourhoods)))
+            )
+            while _running:
+                _done, _ = wait(_running, return_when=FIRST_COMPLETED)
+                for _future in _done:
+                    _name = _running.pop(_future)
+                    _result = _future.result()
+                    _results.append(_result)
+                    _tried_without_improvement += 1
+                    if _result["solution"] is None or _result["objective"] < _objective:
+                        continue
+                    _is_improvement = _result["objective"] > _objective
+                    if _is_improvement:
+                        print(f"LNS {_name}: {_objective} -> {_result['objective']}")
+                    _values = np.asarray(_result["solution"], dtype=int)[_var_indices]
+                    _objective = _result["objective"]
+                    if _is_improvement:
+                        _tried_without_improvement = 0
+                        _num_improvements += 1
+                        _snapshot = _get_snapshot(
+                            _report.num_solutions + _num_improvements,
+                            _objective,
+                            _bound,
+                            time.perf_counter() - _start,
+                            _values,
+                        )
+                        for _sink in solution_sinks or []:
+                            _sink(_snapshot)
+
+                _finished = (
+                    allowed_run_time - (time.perf_counter() - _start) < 1
+                    or (_bound is not None and _objective >= _bound)
+                    or _tried_without_improvement >= len(_neighbourhoods)
+                )
+                if not _finished:
+                    while len(_running) < _num_workers:
+                        _future, _name = _submit(executor)
+                        _running[_future] = _name
+        return _results
+
+    _results = schedule._run_stage("lns", _search) if _neighbourhoods else []
+
+    _report.wall_time = time.perf_counter() - _start
+    _report.user_time += sum(r["user_time"] for r in _results)
+    _report.deterministic_time += sum(r["deterministic_time"] for r in _results)
+    _report.num_conflicts += sum(r["num_conflicts"] for r in _results)
+    _report.num_branches += sum(r["num_branches"] for r in _results)
+    _report.num_solutions += _num_improvements
+    _report.objective = _objective
+    _report.status = "OPTIMAL" if _bound is not None and _objective >= _bound else "FEASIBLE"
+    print(f"LNS tried {len(_results)} neighbourhoods, {_num_improvements} improvements")
+    return _report.status, _values, _objective
@@ -1,8 +1,12 @@
 from __future__ import print_function
 import pickle as pickle
 import sys
+import pandas as pd
 from Class_League import League
-from scheduling import Schedule
+from gsheets import get_gsheet_data
+from league_precheck import check_league_capacity
+from schedule_validator import check_predefined_fixtures
+from scheduling import Schedule, SolveOptions
 
 
 def main():
@@ -19,13 +23,33 @@ def main():
 
     # league.write_output()
 
-    for i in range(10, 30):
+    # The capacity does not depend on the allowance, so it is checked once. A league short of
+    # capacity is still scheduled, placing as many fixtures as it can.
+    try:
+        check_league_capacity(league)
+    except ValueError as e:
+        print(e)
+
+    _allowances = range(10, 30)
+    # Hand-edited predefined fixtures that break a rule would make every model infeasible.
+    predefined_fixtures = pd.DataFrame(
+        get_gsheet_data(predefined_fixtures_url, "Sheet1").get_all_records()
+    )
+    check_predefined_fixtures(
+        league, predefined_fixtures, num_allowed_incorrect_fixture_week=max(_allowances)
+    )
+
+    for i in _allowances:
         print(f"Number Allowed incorrect week fixture = {i}")
         schedule_2022 = Schedule(
             league,
-            predefined_fixtures_url,
             allowed_run_time=100,
-            num_allowed_incorrect_fixture_week=i,
+            options=SolveOptions(
+                num_allowed_incorrect_fixture_week=i,
+                predefined_fixtures=predefined_fixtures,
+                cache_dir="model_cache",
+                precheck=False,
+            ),
         )
         if schedule_2022.model_result != "INFEASIBLE":
             return None
@@ -36,7 +60,7 @@ def reload_league_data_from_gsheet(
 ) -> League:
     if _load_from_gsheets:
         sys.setrecursionlimit(100000)
-        _league = League(_league_management_url)
+        _league = League(_league_management_url, _stream=True)
         with open("league2022.pkl", "ab"):
             pass
         with open("league2022.pkl", "wb") as f:
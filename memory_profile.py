@@ -0,0 +1,254 @@
+"""Opt-in memory profiling of building a League and building and solving its Schedule.
+
+Profiling is off unless code runs inside a MemoryProfiler. Every Schedule stage, each
+create_constraint_* call and the solve, is a profiled stage, and so are the PROFILED_METHODS of the
+league model, which the profiler wraps only while it is running. For each stage the profiler
+records the process RSS before and after, the Python memory traced by tracemalloc before, after
+and at its peak, the source lines that allocated most during the stage and the number of live
+objects of each League class afterwards.
+
+Example:
+-------
+    with MemoryProfiler() as profiler:
+        league = generate_league(num_clubs=24, teams_per_club=6)
+        Schedule(league, allowed_run_time=10, options=SolveOptions(write_results=False))
+    profiler.print_report()
+
+Snapshots and object counts slow the profiled code down several times, so the figures to look at
+are the memory ones, not the stage times. Solve modes that solve in other processes only show the
+memory of this process.
+
+"""
+
+import functools
+import gc
+import json
+import sys
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from Class_League import League
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Objects of the classes defined in these modules are counted after each stage.
+COUNTED_MODULES = ("Class_League", "ortools.sat.python.cp_model")
+
+# Methods of the league model profiled as stages while a MemoryProfiler is running. They are
+# wrapped on entry and restored on exit, so the model carries no profiling code otherwise.
+PROFILED_METHODS = [(League, "__init__"), (League, "_generate_fixtures")]
+
+# The profiler of the running MemoryProfiler block, None when profiling is off.
+_active_profiler: ContextVar[Optional["MemoryProfiler"]] = ContextVar(
+    "active_memory_profiler", default=None
+)
+
+
+def get_rss() -> Optional[int]:
+    """Return the resident set size of this process in bytes, None where /proc is not available."""
+    try:
+        return int(Path("/proc/self/statm").read_text().split()[1]) * _get_page_size()
+    except (OSError, ValueError):
+        return None
+
+
+def get_peak_rss() -> Optional[int]:
+    """Return the peak resident set size of this process in bytes, None on Windows."""
+    if resource is None:
+        return None
+    _max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes.
+    return _max_rss if sys.platform == "darwin" else _max_rss * 1024
+
+
+def _get_page_size() -> int:
+    return resource.getpagesize() if resource is not None else 4096
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    """Return a tracemalloc snapshot without the allocations of tracemalloc and the profiler."""
+    return tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+    )
+
+
+def count_objects(_modules=COUNTED_MODULES) -> Dict[str, int]:
+    """Return the number of live objects of each class defined in the modules, by class name."""
+    return dict(
+        sorted(
+            Counter(
+                type(o).__name__ for o in gc.get_objects() if type(o).__module__ in _modules
+            ).items()
+        )
+    )
+
+
+@dataclass
+class MemoryStageReport:
+    """Memory of the process around one profiled stage, sizes in bytes."""
+
+    name: str
+    depth: int
+    rss_before: Optional[int]
+    rss_after: Optional[int]
+    peak_rss: Optional[int]
+    traced_before: int
+    traced_after: int
+    traced_peak: int
+    # Source line, bytes allocated and number of allocations during the stage, largest first.
+    top_allocations: List[Tuple[str, int, int]] = field(default_factory=list)
+    object_counts: Dict[str, int] = field(default_factory=dict)
+
+
+class MemoryProfiler:
+    """Context manager turning memory profiling on for the stages run inside it."""
+
+    def __init__(self, top_n: int = 10, count_objects: bool = True):
+        """Create the profiler.
+
+        :param top_n: number of allocation sites recorded for each stage
+        :param count_objects: count the live League objects after each stage, a walk of every
+            object the garbage collector tracks
+        """
+        self.top_n = top_n
+        self.count_objects = count_objects
+        self.stages: List[MemoryStageReport] = []
+        self._stage_peaks: List[int] = []
+        self._started_tracing = False
+        self._token = None
+        self._original_methods: List[Tuple[type, str, Callable]] = []
+
+    def __enter__(self) -> "MemoryProfiler":
+        """Start tracemalloc, if not already tracing, and profile the stages run until exit."""
+        if _active_profiler.get() is not None:
+            raise RuntimeError("A MemoryProfiler is already running")
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        self._token = _active_profiler.set(self)
+        for _class, _name in PROFILED_METHODS:
+            _method = _class.__dict__[_name]
+            self._original_methods.append((_class, _name, _method))
+            setattr(_class, _name, profile_memory(f"{_class.__name__}.{_name}")(_method))
+        return self
+
+    def __exit__(self, *_exc_info):
+        """Stop profiling, and tracemalloc if it was started on entry."""
+        for _class, _name, _method in reversed(self._original_methods):
+            setattr(_class, _name, _method)
+        self._original_methods = []
+        _active_profiler.reset(self._token)
+        if self._started_tracing:
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Record the memory of the process around the code run in the block.
+
+        Stages can be nested, an outer stage's figures including its inner stages'. The report of
+        an inner stage is added before that of the stage around it.
+        """
+        if self._stage_peaks:
+            self._stage_peaks[-1] = max(self._stage_peaks[-1], tracemalloc.get_traced_memory()[1])
+        _depth = len(self._stage_peaks)
+        _rss_before = get_rss()
+        _snapshot_before = _take_snapshot()
+        # Reset after the snapshot so its own allocation is not the stage's peak.
+        tracemalloc.reset_peak()
+        self._stage_peaks.append(0)
+        _traced_before = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            _traced_after, _peak = tracemalloc.get_traced_memory()
+            _peak = max(self._stage_peaks.pop(), _peak)
+            if self._stage_peaks:
+                self._stage_peaks[-1] = max(self._stage_peaks[-1], _peak)
+            _differences = _take_snapshot().compare_to(_snapshot_before, "lineno")
+            tracemalloc.reset_peak()
+            self.stages.append(
+                MemoryStageReport(
+                    name=name,
+                    depth=_depth,
+                    rss_before=_rss_before,
+                    rss_after=get_rss(),
+                    peak_rss=get_peak_rss(),
+                    traced_before=_traced_before,
+                    traced_after=_traced_after,
+                    traced_peak=_peak,
+                    top_allocations=[
+                        (str(d.traceback[0]), d.size_diff, d.count_diff)
+                        for d in _differences[: self.top_n]
+                    ],
+                    object_counts=count_objects() if self.count_objects else {},
+                )
+            )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return one row per stage of the RSS and traced memory in MB and the object counts."""
+        _mb = 1024 * 1024
+        _rows = []
+        for s in self.stages:
+            _rows.append(
+                {
+                    "Stage": "  " * s.depth + s.name,
+                    "RSS After": s.rss_after / _mb if s.rss_after is not None else None,
+                    "RSS Change": (
+                        (s.rss_after - s.rss_before) / _mb if s.rss_before is not None else None
+                    ),
+                    "Peak RSS": s.peak_rss / _mb if s.peak_rss is not None else None,
+                    "Traced After": s.traced_after / _mb,
+                    "Traced Change": (s.traced_after - s.traced_before) / _mb,
+                    "Traced Peak": s.traced_peak / _mb,
+                }
+            )
+        _counts = pd.DataFrame([s.object_counts for s in self.stages], index=range(len(_rows)))
+        return pd.concat([pd.DataFrame(_rows), _counts.fillna(0).astype(int)], axis=1)
+
+    def print_report(self):
+        """Print the stage table then the top allocation sites of each stage."""
+        print(self.to_dataframe().to_string(index=False, float_format="{:.1f}".format))
+        for s in self.stages:
+            print(f"\n{s.name}: top allocations")
+            for _site, _size, _count in s.top_allocations:
+                print(f"    {_size / 1024:10.1f} KiB {_count:+9d} blocks  {_site}")
+
+    def write_json(self, _file_location) -> None:
+        """Write the stage reports to a JSON file."""
+        with Path(_file_location).open("w") as f:
+            json.dump([asdict(s) for s in self.stages], f, indent=2)
+
+
+def memory_stage(name: str):
+    """Return a context manager profiling a stage when a MemoryProfiler is running, else nothing.
+
+    :param name: name the stage is reported under
+    """
+    _profiler = _active_profiler.get()
+    if _profiler is None:
+        return nullcontext()
+    return _profiler.stage(name)
+
+
+def profile_memory(name: str) -> Callable[[Callable], Callable]:
+    """Decorate a function so each call made while a MemoryProfiler runs is a profiled stage."""
+
+    def _decorator(_function: Callable) -> Callable:
+        @functools.wraps(_function)
+        def _wrapper(*args, **kwargs):
+            with memory_stage(name):
+                return _function(*args, **kwargs)
+
+        return _wrapper
+
+    return _decorator
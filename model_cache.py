@@ -0,0 +1,92 @@
+"""Cache of built scheduling models and their best solutions, keyed by a hash of the inputs."""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from Class_League import League
+
+
+def league_content_hash(
+    league: League, parameters: Dict[str, Any], predefined_fixtures: Optional[pd.DataFrame]
+) -> str:
+    """Return a hash of everything the scheduling model is built from.
+
+    Covers the clubs, teams, divisions, dates, court slots and fixtures of the league, the
+    constraint parameters and the predefined fixtures, so any change to them gives a new hash.
+
+    :param league: league to be scheduled
+    :param parameters: constraint parameters used to build the model
+    :param predefined_fixtures: predefined fixtures table, or None if there are none
+    :return: hex digest of the content
+    """
+    _content = {
+        "teams": [
+            [t.name, t.league, t.rank, t.division, t.availability_group] for t in league.get_teams()
+        ],
+        "dates": [[d.date_str, d.league_type, d.weekday] for d in league.dates.dates],
+        "court_slots": [
+            [cs.name, cs.date.date_str, [t.name for t in cs.teams]]
+            for c in league.clubs
+            for cs in c.court_slots
+        ],
+        "fixtures": [
+            [f.name, [fcs.identifier for fcs in f.fixture_court_slots]] for f in league.fixtures
+        ],
+        "parameters": parameters,
+        "predefined_fixtures": (
+            [] if predefined_fixtures is None else predefined_fixtures.to_dict("records")
+        ),
+    }
+    _encoded = json.dumps(_content, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(_encoded).hexdigest()
+
+
+class ModelCache:
+    """Directory of serialised CP models and solutions, one pair of files per content hash."""
+
+    def __init__(self, _cache_dir):
+        """Create the cache, making the directory if needed."""
+        self.cache_dir = Path(_cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _model_path(self, _content_hash: str) -> Path:
+        return self.cache_dir / f"{_content_hash}.model.pb"
+
+    def _solution_path(self, _content_hash: str) -> Path:
+        return self.cache_dir / f"{_content_hash}.solution.json"
+
+    def load_model(self, _content_hash: str) -> Optional[bytes]:
+        """Return the serialised model proto for the hash, or None if it is not cached."""
+        _path = self._model_path(_content_hash)
+        if _path.exists():
+            return _path.read_bytes()
+        return None
+
+    def save_model(self, _content_hash: str, _model_proto: bytes) -> None:
+        """Save the serialised model proto under the hash."""
+        self._model_path(_content_hash).write_bytes(_model_proto)
+
+    def load_solution(self, _content_hash: str) -> Optional[Dict[str, Any]]:
+        """Return the cached solution for the hash, or None if it is not cached.
+
+        The solution holds the solver status, objective value and the positions of the
+        scheduled fixture slots.
+        """
+        _path = self._solution_path(_content_hash)
+        if _path.exists():
+            return json.loads(_path.read_text())
+        return None
+
+    def save_solution(
+        self, _content_hash: str, _status: str, _objective: float, _selected: list
+    ) -> None:
+        """Save a solution under the hash if it is at least as good as the one already cached."""
+        _cached = self.load_solution(_content_hash)
+        if _cached is not None and _cached["objective"] > _objective:
+            return
+        _solution = {"status": _status, "objective": _objective, "selected": _selected}
+        self._solution_path(_content_hash).write_text(json.dumps(_solution))
@@ -0,0 +1,389 @@
+"""Run the scheduling workflow as stages whose outputs are saved on disk by content.
+
+The stages are:
+
+- fetch: download the club entry sheets, the previous league positions and the predefined
+  fixtures
+- parse: load the downloaded sheets into a League
+- precheck: print the league data, check the league has the capacity for every fixture and the
+  predefined fixtures keep the schedule rules, and prune the fixture slots the model does not need
+- build: build the scheduling model
+- solve: solve it
+- publish: write the teams entered and the schedule to the league management sheet
+
+Each stage's output is saved under a key hashing the stage name, its parameters and the keys of
+the stages it reads from, so a rerun loads the output of every stage whose inputs are unchanged
+and only runs the rest. The fetch stage is the exception: its inputs are the sheets themselves,
+so it reuses the last download unless asked to download again, and its key is a hash of what was
+downloaded. The build and solve stages keep the model and solution in a ModelCache in the same
+directory.
+"""
+
+import argparse
+import hashlib
+import json
+import pickle
+import sys
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from Class_League import (
+    FixtureCourtSlot,
+    League,
+    get_club_entry_urls,
+    get_previous_league_position_data,
+    stream_club_data,
+)
+from gsheets import get_gsheet_data
+from league_precheck import check_league_capacity
+from schedule_validator import check_predefined_fixtures
+from scheduling import Schedule, SolveOptions, write_schedule_to_gsheet
+
+LeagueData = Dict[str, Any]
+
+
+@dataclass
+class StageRun:
+    """Timing of one stage of a pipeline run."""
+
+    name: str
+    key: str
+    wall_time: float
+    cached: bool
+
+
+def fetch_league_data(
+    league_management_url: str, predefined_fixtures_url: Optional[str] = None
+) -> LeagueData:
+    """Download everything a schedule is built from.
+
+    :param league_management_url: URL of the league management sheet
+    :param predefined_fixtures_url: URL of the sheet of already commited match dates, or None
+    :return: dict of the club sheets, downloaded concurrently, one per club as returned by
+        get_club_data, the previous league positions and the predefined fixtures or None
+    """
+    _predefined_fixtures = None
+    if predefined_fixtures_url:
+        _predefined_fixtures = pd.DataFrame(
+            get_gsheet_data(predefined_fixtures_url, "Sheet1").get_all_records()
+        )
+    return {
+        "club_data": list(stream_club_data(get_club_entry_urls(league_management_url))),
+        "previous_league_positions": get_previous_league_position_data(league_management_url),
+        "predefined_fixtures": _predefined_fixtures,
+    }
+
+
+def get_content_key(*_parts) -> str:
+    """Return a hash of the parts, tables included by content."""
+
+    def _encode(_value):
+        if isinstance(_value, pd.DataFrame):
+            return _value.to_json(orient="split", date_format="iso")
+        return str(_value)
+
+    _encoded = json.dumps(_parts, sort_keys=True, default=_encode).encode("utf-8")
+    return hashlib.sha256(_encoded).hexdigest()
+
+
+class PipelineStore:
+    """Directory of stage outputs, one pickle per stage and key."""
+
+    def __init__(self, _store_dir):
+        """Create the store, making the directory if needed."""
+        self.store_dir = Path(_store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    def _output_path(self, _stage: str, _key: str) -> Path:
+        return self.store_dir / f"{_stage}.{_key}.pkl"
+
+    def _latest_path(self, _stage: str, _name: str) -> Path:
+        return self.store_dir / f"{_stage}.latest.{get_content_key(_name)}.json"
+
+    def has_output(self, _stage: str, _key: str) -> bool:
+        """Return whether the stage's output for the key has been saved."""
+        return self._output_path(_stage, _key).exists()
+
+    def load_output(self, _stage: str, _key: str) -> Any:
+        """Return the stage's output saved under the key."""
+        with self._output_path(_stage, _key).open("rb") as f:
+            return pickle.load(f)
+
+    def save_output(self, _stage: str, _key: str, _output: Any):
+        """Save the stage's output under the key."""
+        # Leagues are deeply linked object graphs, as in main.reload_league_data_from_gsheet.
+        sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+        with self._output_path(_stage, _key).open("wb") as f:
+            pickle.dump(_output, f)
+
+    def get_latest_key(self, _stage: str, _name: str) -> Optional[str]:
+        """Return the key of the last output saved for the stage and name, None if there is none."""
+        _path = self._latest_path(_stage, _name)
+        if not _path.exists():
+            return None
+        return json.loads(_path.read_text())["key"]
+
+    def set_latest_key(self, _stage: str, _name: str, _key: str):
+        """Record the key as the last output saved for the stage and name."""
+        self._latest_path(_stage, _name).write_text(json.dumps({"name": _name, "key": _key}))
+
+
+@dataclass
+class Pipeline:
+    """Fetch, parse, precheck, build, solve and publish a league schedule, reusing saved stages."""
+
+    # URL of the league management sheet.
+    league_management_url: str
+    # Directory the stage outputs are saved in.
+    store_dir: str = "pipeline_store"
+    # URL of the sheet of already commited match dates.
+    predefined_fixtures_url: Optional[str] = None
+    # Download the sheets again rather than reuse the last download.
+    refetch: bool = False
+    # Seconds the solver is allowed.
+    allowed_run_time: int = 100
+    # How the model is built and solved. The pipeline sets the predefined fixtures, fixture slot
+    # filter, model cache and what is solved and written itself.
+    solve_options: SolveOptions = field(default_factory=SolveOptions)
+    # Write the teams entered and the schedule to the league management sheet.
+    publish: bool = True
+    # Callable downloading the league data, given the two URLs.
+    fetch: Callable[[str, Optional[str]], LeagueData] = fetch_league_data
+
+    def __post_init__(self):
+        """Open the store, nothing is run until run is called."""
+        self.store = PipelineStore(self.store_dir)
+        self.stage_runs: List[StageRun] = []
+
+    def run(self) -> Dict[str, Any]:
+        """Run every stage, loading the saved output of those whose inputs are unchanged.
+
+        :return: The solve stage output, the status, objective value and fixture court slot table
+        """
+        self.stage_runs = []
+        _data_key, _data = self._run_fetch()
+        _parse_key = get_content_key("parse", _data_key)
+        _league = self._run_stage("parse", _parse_key, self.parse, _data)
+        _precheck_key = get_content_key(
+            "precheck",
+            _parse_key,
+            self.solve_options.num_allowed_incorrect_fixture_week,
+            self.solve_options.weeks_separated,
+        )
+        _pruned = self._run_stage(
+            "precheck", _precheck_key, self.precheck, _league, _data["predefined_fixtures"]
+        )
+
+        # Predefined fixtures before today are not fixed, so the model changes with the date.
+        _build_key = get_content_key(
+            "build",
+            _precheck_key,
+            self.solve_options.num_allowed_incorrect_fixture_week,
+            self.solve_options.weeks_separated,
+            datetime.today().date(),
+        )
+        self._run_stage(
+            "build", _build_key, self.build, _league, _pruned, _data["predefined_fixtures"]
+        )
+        _solve_key = get_content_key(
+            "solve",
+            _build_key,
+            self.allowed_run_time,
+            self.solve_options.solve_mode,
+            self.solve_options.mode_options,
+        )
+        _solution = self._run_stage(
+            "solve", _solve_key, self.solve, _league, _pruned, _data["predefined_fixtures"]
+        )
+        if self.publish:
+            _publish_key = get_content_key("publish", _parse_key, _solve_key)
+            self._run_stage("publish", _publish_key, self.publish_schedule, _league, _solution)
+
+        print(self.get_stage_table().to_markdown(index=False))
+        return _solution
+
+    def _run_fetch(self):
+        """Return the key and output of the fetch stage, downloading unless refetch is False."""
+        _name = json.dumps([self.league_management_url, self.predefined_fixtures_url])
+        _key = None if self.refetch else self.store.get_latest_key("fetch", _name)
+        _start = time.perf_counter()
+        if _key is not None and self.store.has_output("fetch", _key):
+            _data = self.store.load_output("fetch", _key)
+            _cached = True
+        else:
+            _data = self.fetch(self.league_management_url, self.predefined_fixtures_url)
+            _key = get_content_key("fetch", _data)
+            self.store.save_output("fetch", _key, _data)
+            self.store.set_latest_key("fetch", _name, _key)
+            _cached = False
+        self.stage_runs.append(StageRun("fetch", _key, time.perf_counter() - _start, _cached))
+        return _key, _data
+
+    def _run_stage(self, _stage_name: str, _key: str, _stage, *args):
+        """Load the stage's output saved under the key, or run the stage and save its output.
+
+        :param _stage_name: Name the stage's output is saved under
+        :param _key: Content key of the stage's inputs
+        :param _stage: Callable running the stage
+        :return: The stage's output
+        """
+        _start = time.perf_counter()
+        _cached = self.store.has_output(_stage_name, _key)
+        if _cached:
+            _output = self.store.load_output(_stage_name, _key)
+        else:
+            _output = _stage(*args)
+            self.store.save_output(_stage_name, _key, _output)
+        self.stage_runs.append(StageRun(_stage_name, _key, time.perf_counter() - _start, _cached))
+        return _output
+
+    def get_stage_table(self) -> pd.DataFrame:
+        """Return a row per stage of the last run with its key, wall time and if it was reused."""
+        return pd.DataFrame(
+            [
+                {
+                    "Stage": r.name,
+                    "Key": r.key[:12],
+                    "Wall Time": r.wall_time,
+                    "Cached": r.cached,
+                }
+                for r in self.stage_runs
+            ],
+            columns=["Stage", "Key", "Wall Time", "Cached"],
+        )
+
+    def parse(self, _data: LeagueData) -> League:
+        """Load the downloaded sheets into a League."""
+        return League(
+            self.league_management_url, _data["club_data"], _data["previous_league_positions"]
+        )
+
+    def precheck(
+        self, _league: League, _predefined_fixtures: Optional[pd.DataFrame]
+    ) -> List[str]:
+        """Check the league and return the identifiers of the fixture slots the model can leave out.
+
+        With no fixtures allowed in the incorrect week the incorrect week slots can never be
+        used, so they are pruned.
+
+        :raises ValueError: if the league does not have capacity for every fixture, or the
+            predefined fixtures break a schedule rule
+        """
+        _league.check_league_data()
+        check_league_capacity(_league)
+        if _predefined_fixtures is not None:
+            check_predefined_fixtures(
+                _league,
+                _predefined_fixtures,
+                weeks_separated=self.solve_options.weeks_separated,
+                num_allowed_incorrect_fixture_week=(
+                    self.solve_options.num_allowed_incorrect_fixture_week
+                ),
+            )
+        if self.solve_options.num_allowed_incorrect_fixture_week > 0:
+            return []
+        return [
+            fs.identifier for fs in _league.get_fixture_court_slots() if not fs.is_correct_week()
+        ]
+
+    def build(
+        self, _league: League, _pruned: List[str], _predefined_fixtures: Optional[pd.DataFrame]
+    ) -> str:
+        """Build the model into the model cache and return its content hash."""
+        return self._get_schedule(_league, _pruned, _predefined_fixtures, solve=False).content_hash
+
+    def solve(
+        self, _league: League, _pruned: List[str], _predefined_fixtures: Optional[pd.DataFrame]
+    ) -> Dict[str, Any]:
+        """Solve the cached model and return the status, objective and fixture court slot table.
+
+        The stage only runs when its inputs have changed, so a solution cached for the same model
+        is used as a hint rather than returned as it is.
+        """
+        _schedule = self._get_schedule(_league, _pruned, _predefined_fixtures, solve=True)
+        return {
+            "status": _schedule.model_result,
+            "objective": _schedule.objective_value,
+            "fixture_court_slots": _league.get_fixture_court_slot_table(),
+        }
+
+    def _get_schedule(
+        self,
+        _league: League,
+        _pruned: List[str],
+        _predefined_fixtures: Optional[pd.DataFrame],
+        solve: bool,
+    ) -> Schedule:
+        """Return the Schedule of the league, built or loaded from the model cache."""
+        _pruned = set(_pruned)
+
+        def _is_kept(_fixture_slot: FixtureCourtSlot) -> bool:
+            return _fixture_slot.identifier not in _pruned
+
+        return Schedule(
+            _league,
+            allowed_run_time=self.allowed_run_time,
+            options=replace(
+                self.solve_options,
+                predefined_fixtures=_predefined_fixtures,
+                fixture_slot_filter=_is_kept if _pruned else None,
+                precheck=False,
+                solve=solve,
+                cache_dir=str(self.store.store_dir / "models"),
+                force_resolve=solve,
+                write_results=False,
+            ),
+        )
+
+    def publish_schedule(self, _league: League, _solution: Dict[str, Any]) -> Dict[str, Any]:
+        """Write the teams entered and, if every fixture is scheduled, the schedule."""
+        if not _league.league_management_URL:
+            return {"published": False}
+        _league.write_teams_entered()
+        if _solution["status"] not in ["FEASIBLE", "OPTIMAL"]:
+            print(f"Schedule not published, status {_solution['status']}")
+            return {"published": False}
+        write_schedule_to_gsheet(
+            _solution["fixture_court_slots"],
+            _league.league_management_URL,
+            _team_names=[t.name for t in _league.get_teams()],
+        )
+        return {"published": True, "time": datetime.now().isoformat()}
+
+
+def main():
+    """Run the pipeline from the command line."""
+    _parser = argparse.ArgumentParser(description=__doc__)
+    _parser.add_argument("league_management_url")
+    _parser.add_argument("--predefined-fixtures-url")
+    _parser.add_argument("--store-dir", default="pipeline_store")
+    _parser.add_argument("--refetch", action="store_true", help="download the sheets again")
+    _parser.add_argument("--run-time", type=int, default=100, help="solver seconds")
+    _parser.add_argument("--num-allowed-incorrect-fixture-week", type=int, default=0)
+    _parser.add_argument("--weeks-separated", type=int, default=2)
+    _parser.add_argument("--solve-mode", default="monolithic")
+    _parser.add_argument("--no-publish", action="store_true")
+    _args = _parser.parse_args()
+
+    Pipeline(
+        _args.league_management_url,
+        store_dir=_args.store_dir,
+        predefined_fixtures_url=_args.predefined_fixtures_url,
+        refetch=_args.refetch,
+        allowed_run_time=_args.run_time,
+        solve_options=SolveOptions(
+            num_allowed_incorrect_fixture_week=_args.num_allowed_incorrect_fixture_week,
+            weeks_separated=_args.weeks_separated,
+            solve_mode=_args.solve_mode,
+        ),
+        publish=not _args.no_publish,
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Find what a mid-season reschedule of a published schedule has to cover.
+
+A published schedule is a table of fixtures with the columns Home Team, Away Team and Date, as
+the scheduled rows of the Match Fixture slots sheet. Fixtures published before the reschedule date
+have been played and are left out of the model, along with every slot before that date. The
+played fixtures still limit the remaining slots: a team that played earlier in the week cannot
+play again that week, and a fixture cannot be too close to the reverse fixture already played.
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+from Class_League import Fixture, FixtureCourtSlot, League
+
+
+def get_published_fixture_slots(
+    league: League, published_fixtures: pd.DataFrame
+) -> Dict[Fixture, FixtureCourtSlot]:
+    """Return the fixture slot each fixture in the published schedule was published in.
+
+    The slot is the one on the published date with the published Court No., or the first slot on
+    that date if the table has no Court No. column or the court is no longer available. Rows with
+    no slot on their date in the league are reported and skipped.
+
+    :param league: league the schedule was published for
+    :param published_fixtures: table with Home Team, Away Team, Date and optionally Court No.
+    :return: dict of published fixture slot by fixture
+    """
+    if len(published_fixtures) == 0:
+        return {}
+    _fixture_slots = {}
+    for f in league.fixtures:
+        for fs in f.fixture_court_slots:
+            _key = (f.home_team.name, f.away_team.name, fs.court_slot.date.date)
+            _fixture_slots.setdefault(_key, {})[str(fs.court_slot.concurrency_number)] = fs
+    _dates = pd.to_datetime(published_fixtures["Date"], dayfirst=True)
+    if "Court No." in published_fixtures:
+        _court_numbers = published_fixtures["Court No."].astype(str)
+    else:
+        _court_numbers = pd.Series(None, index=published_fixtures.index, dtype=object)
+
+    _result = {}
+    _unmatched = []
+    for _home_team, _away_team, _date, _court_number in zip(
+        published_fixtures["Home Team"], published_fixtures["Away Team"], _dates, _court_numbers
+    ):
+        _slots = _fixture_slots.get((_home_team, _away_team, _date.to_pydatetime()), {})
+        _slot = _slots.get(_court_number) or next(iter(_slots.values()), None)
+        if _slot is None:
+            _unmatched.append(f"{_home_team} vs {_away_team} on {_date:%d-%b-%Y}")
+        else:
+            _result[_slot.fixture] = _slot
+    if _unmatched:
+        print(f"Published fixtures without a slot in the league: {_unmatched}")
+    return _result
+
+
+def get_reschedule_scope(
+    league: League,
+    published_fixture_slots: Dict[Fixture, FixtureCourtSlot],
+    reschedule_from: datetime,
+    weeks_separated: int,
+) -> Tuple[List[Fixture], Callable[[FixtureCourtSlot], bool]]:
+    """Return the fixtures still to be played and a filter of the slots they can move to.
+
+    Mirrors Schedule.create_constraint_one_fixture_per_week_per_team and
+    Schedule.create_constraint_fixture_pair_separation for the played fixtures.
+
+    :param league: league being rescheduled
+    :param published_fixture_slots: published slot of each fixture, from
+        get_published_fixture_slots
+    :param reschedule_from: first date that can be rescheduled, earlier fixtures have been played
+    :param weeks_separated: minimum number of weeks between the two fixtures of a pair of teams
+    :return: the fixtures to schedule and the fixture slot filter
+    """
+    _played = {
+        f: fs.court_slot.date
+        for f, fs in published_fixture_slots.items()
+        if fs.court_slot.date.date < reschedule_from
+    }
+    _blocked_team_weeks = set()
+    _reverse_played_day_offsets = {}
+    for _fixture, _date in _played.items():
+        _blocked_team_weeks.add((_fixture.home_team, _date.get_week_number()))
+        _blocked_team_weeks.add((_fixture.away_team, _date.get_week_number()))
+        _reverse_played_day_offsets[(_fixture.away_team, _fixture.home_team)] = _date.day_offset
+
+    def _is_reschedulable(_fixture_slot: FixtureCourtSlot) -> bool:
+        _date = _fixture_slot.court_slot.date
+        _fixture = _fixture_slot.fixture
+        if _date.date < reschedule_from:
+            return False
+        _week_number = _date.get_week_number()
+        if (_fixture.home_team, _week_number) in _blocked_team_weeks or (
+            _fixture.away_team,
+            _week_number,
+        ) in _blocked_team_weeks:
+            return False
+        _reverse_day_offset = _reverse_played_day_offsets.get(
+            (_fixture.home_team, _fixture.away_team)
+        )
+        if _reverse_day_offset is not None and _fixture.home_team.club != _fixture.away_team.club:
+            return abs(_date.day_offset - _reverse_day_offset) // 7 > weeks_separated
+        return True
+
+    return [f for f in league.fixtures if f not in _played], _is_reschedulable
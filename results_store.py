@@ -0,0 +1,79 @@
+"""Local Parquet store of the match results and player tables.
+
+Tables are stored parsed, with typed columns: scores as integers, match dates as datetimes,
+ratings as floats and divisions, teams and clubs as categories, so an analysis run can start from
+the store without downloading or parsing the Google Sheets again. Reads are memory mapped and can
+be limited to some of the columns and divisions of a table.
+"""
+
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+# Types of the columns of the stored tables, columns not listed keep the type they are saved with
+COLUMN_TYPES = {
+    "Division": "category",
+    "Team": "category",
+    "Home Team": "category",
+    "Away Team": "category",
+    "Club": "category",
+    "Status": "category",
+    "Time": "string",
+    "Player": "string",
+    "Score Text": "string",
+    "Match Date": "datetime64[ns]",
+    "Match ID": "int64",
+    "Score": "int64",
+    "Home Score": "int64",
+    "Away Score": "int64",
+    "Running Total": "int64",
+    "Matches Played": "int64",
+    "Current Rank": "float64",
+    "Rubbers Won": "int64",
+    "Rubbers Lost": "int64",
+    "Rubbers Drawn": "int64",
+    "Rating": "float64",
+    "Potential Fixtures": "int64",
+    "Played Percentage": "float64",
+}
+
+
+class ResultsStore:
+    """Directory of Parquet tables, one file per table name."""
+
+    def __init__(self, _store_dir="results_store"):
+        """Create the store, making the directory if needed."""
+        self.store_dir = Path(_store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    def _table_path(self, _name: str) -> Path:
+        return self.store_dir / f"{_name}.parquet"
+
+    def has_table(self, _name: str) -> bool:
+        """Return whether a table of this name has been saved."""
+        return self._table_path(_name).exists()
+
+    def save(self, _name: str, _df: pd.DataFrame):
+        """Save the table, converting its columns to the types in COLUMN_TYPES."""
+        _types = {c: t for c, t in COLUMN_TYPES.items() if c in _df.columns}
+        _df.astype(_types).to_parquet(self._table_path(_name))
+
+    def load(
+        self,
+        _name: str,
+        columns: Optional[List[str]] = None,
+        divisions: Optional[Iterable[str]] = None,
+    ) -> pd.DataFrame:
+        """Load a table, memory mapping the file.
+
+        :param _name: name of the table
+        :param columns: columns to read, all if None
+        :param divisions: divisions to read the rows of, all if None, the table needs a Division
+            column
+        :return: the table
+        """
+        _filters = None if divisions is None else [("Division", "in", list(divisions))]
+        return pd.read_parquet(
+            self._table_path(_name), columns=columns, filters=_filters, memory_map=True
+        )
@@ -0,0 +1,194 @@
+"""Build and solve variants of a league, described as overrides of a base League.
+
+Before the season the committee asks how the schedule would look with other division splits, an
+extra club, changed court counts or another weeks_separated. Each variant is a Scenario listing
+only what differs from the base league. run_scenarios pickles the base league once and hands it to
+a pool of worker processes, each scenario applying its changes to a fresh copy unpickled in the
+worker rather than rebuilt from the sheets, then solves it and returns one comparison table.
+
+Example:
+-------
+    scenarios = [
+        Scenario("base"),
+        Scenario("three courts at Club 1", court_counts={"Club 1": 3}),
+        Scenario("weeks separated 3", solve_options={"weeks_separated": 3}),
+    ]
+    print(run_scenarios(league, scenarios, allowed_run_time=60).to_markdown())
+
+"""
+
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from Class_League import Club, League
+from scheduling import Schedule, SolveOptions
+
+SCENARIO_COLUMNS = [
+    "Scenario",
+    "Status",
+    "Teams",
+    "Fixtures",
+    "Fixtures Scheduled",
+    "Incorrect Week Fixtures",
+    "Objective",
+    "Build Time",
+    "Solve Time",
+    "Error",
+]
+
+# The pickled base league of a worker process, set by _init_worker.
+_worker_state: Dict[str, bytes] = {}
+
+
+@dataclass
+class Scenario:
+    """A variant of the base league, described by its differences from it.
+
+    The overrides are applied in the order of the fields: extra clubs are added, the divisions
+    are set from the previous league positions then the division overrides, and the court counts
+    are changed, before the fixtures are generated again.
+    """
+
+    name: str
+    # Club sheets as returned by get_club_data of clubs entering in this scenario only.
+    extra_clubs: List[Dict[str, pd.DataFrame]] = field(default_factory=list)
+    # Previous League organisation sheet giving every team's New Division.
+    previous_league_position_df: Optional[pd.DataFrame] = None
+    # New division by team name.
+    divisions: Dict[str, int] = field(default_factory=dict)
+    # Number of matches a club can host at the same time on each of its dates, by club name.
+    court_counts: Dict[str, int] = field(default_factory=dict)
+    # SolveOptions fields, e.g. weeks_separated, over the solve options given to run_scenarios.
+    solve_options: Dict[str, Any] = field(default_factory=dict)
+
+    def changes_league(self) -> bool:
+        """Return true if the scenario changes the league's teams, divisions or court slots."""
+        return bool(
+            self.extra_clubs
+            or self.previous_league_position_df is not None
+            or self.divisions
+            or self.court_counts
+        )
+
+
+def apply_scenario(league: League, scenario: Scenario) -> League:
+    """Change a league in place to the scenario's variant of it.
+
+    :param league: league to change, a copy of the base league not used elsewhere
+    :param scenario: the overrides to apply
+    :return: the changed league
+    """
+    if not scenario.changes_league():
+        return league
+    for _data in scenario.extra_clubs:
+        league.clubs.append(Club(league, _data["Entry URL"], _data))
+    if scenario.previous_league_position_df is not None:
+        for t in league.get_teams():
+            t.division = 0
+        league._get_previous_league_position(scenario.previous_league_position_df)
+    for _team_name, _division in scenario.divisions.items():
+        league.get_team_obj_from_str(_team_name).division = int(_division)
+    for _club_name, _num_matches in scenario.court_counts.items():
+        _club = league.get_club(_club_name)
+        if _club is None:
+            raise ValueError(f"Club Not Found: {_club_name}")
+        _club.set_concurrent_matches(_num_matches)
+    league._check_team_divisions()
+    league.regenerate_fixtures()
+    return league
+
+
+def _init_worker(_league_pickle: bytes):
+    """Keep the pickled base league in the worker process."""
+    _worker_state["league"] = _league_pickle
+
+
+def _run_scenario(
+    _scenario: Scenario, _allowed_run_time: float, _solve_options: SolveOptions
+) -> Dict[str, Any]:
+    """Apply a scenario to a fresh copy of the worker's base league, solve it and summarise it.
+
+    Any exception is recorded in the row's Error column rather than raised.
+    """
+    _row: Dict[str, Any] = {"Scenario": _scenario.name}
+    _start = time.perf_counter()
+    try:
+        _league = apply_scenario(pickle.loads(_worker_state["league"]), _scenario)
+        _schedule = Schedule(
+            _league,
+            allowed_run_time=_allowed_run_time,
+            options=replace(_solve_options, **{**_scenario.solve_options, "write_results": False}),
+        )
+        _solve_time = _schedule.stage_times.get("solve", 0.0)
+        _slot_table = _league.get_fixture_court_slot_table()
+        _scheduled = _slot_table[_slot_table["is_scheduled"] == 1]
+        _row.update(
+            {
+                "Status": _schedule.model_result,
+                "Teams": len(_league.get_teams()),
+                "Fixtures": len(_league.fixtures),
+                "Fixtures Scheduled": len(_scheduled),
+                "Incorrect Week Fixtures": int((~_scheduled["Is Correct Week"]).sum()),
+                "Objective": _schedule.objective_value,
+                "Build Time": time.perf_counter() - _start - _solve_time,
+                "Solve Time": _solve_time,
+            }
+        )
+    except Exception as e:
+        _row.update({"Status": "FAILED", "Error": f"{type(e).__name__}: {e}"})
+    return _row
+
+
+def run_scenarios(
+    league: League,
+    scenarios: List[Scenario],
+    allowed_run_time: float = 100,
+    solve_options: SolveOptions = None,
+    max_workers: int = None,
+) -> pd.DataFrame:
+    """Build and solve each scenario of a league in a pool of processes and compare them.
+
+    Each scenario starts from its own copy of the base league, so its changes are never seen by
+    another. The worker processes are not daemons, so solve modes that start processes of their
+    own, such as race or lns, can be used.
+
+    :param league: base league, not changed
+    :param scenarios: variants of the league to solve, Scenario(name) for the base league itself
+    :param allowed_run_time: seconds the solver is allowed for each scenario
+    :param solve_options: how every scenario is built and solved
+    :param max_workers: maximum number of scenarios solved at the same time, defaults to the
+        number of CPU cores
+    :return: DataFrame of SCENARIO_COLUMNS, one row per scenario in the given order
+    """
+    _solve_options = solve_options or SolveOptions()
+    # Leagues are deeply linked object graphs, as in main.reload_league_data_from_gsheet.
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+    _league_pickle = pickle.dumps(league)
+
+    _rows = []
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=(_league_pickle,)
+    ) as _executor:
+        _futures = [
+            _executor.submit(_run_scenario, _scenario, allowed_run_time, _solve_options)
+            for _scenario in scenarios
+        ]
+        for _scenario, _future in zip(scenarios, _futures):
+            try:
+                _rows.append(_future.result())
+            except Exception as e:
+                # The worker died without returning a row, e.g. killed for running out of memory.
+                _rows.append(
+                    {
+                        "Scenario": _scenario.name,
+                        "Status": "FAILED",
+                        "Error": f"{type(e).__name__}: {e}",
+                    }
+                )
+    return pd.DataFrame(_rows, columns=SCENARIO_COLUMNS)
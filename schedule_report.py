@@ -0,0 +1,118 @@
+"""Structured report of how long each stage of building and solving a Schedule took."""
+
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from ortools.sat import cp_model_pb2
+
+_PRESOLVE_START = re.compile(r"Starting presolve at ([\d.]+)s")
+_PRESOLVE_END = re.compile(r"Starting (?:to load the model|search|sequential search) at ([\d.]+)s")
+
+
+@dataclass
+class StageReport:
+    """Wall time and model growth of one stage of building or solving the model."""
+
+    name: str
+    start_time: float
+    wall_time: float
+    constraints_added: int = 0
+    # Only counted for a detailed report.
+    literals_referenced: Optional[int] = None
+    memory_delta: Optional[int] = None
+
+
+@dataclass
+class SolverReport:
+    """Statistics of the solver response."""
+
+    status: str
+    wall_time: float
+    user_time: float
+    deterministic_time: float
+    num_conflicts: int
+    num_branches: int
+    num_solutions: int
+    first_solution_time: Optional[float] = None
+    presolve_time: Optional[float] = None
+    objective: Optional[float] = None
+    best_bound: Optional[float] = None
+
+
+@dataclass
+class ScheduleReport:
+    """Per-stage report of a Schedule, with the solver statistics once it has been solved."""
+
+    stages: List[StageReport] = field(default_factory=list)
+    solver: Optional[SolverReport] = None
+
+    def stage_times(self) -> Dict[str, float]:
+        """Return the wall time of each stage by stage name."""
+        return {s.name: s.wall_time for s in self.stages}
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the report as plain data."""
+        return asdict(self)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Return the stages as a table, one row per stage."""
+        return pd.DataFrame([asdict(s) for s in self.stages])
+
+    def write_json(self, _file_location) -> None:
+        """Write the report to a JSON file."""
+        with Path(_file_location).open("w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def write_trace(self, _file_location) -> None:
+        """Write the stages as a Chrome trace file, viewable in chrome://tracing or Perfetto."""
+        _events = [
+            {
+                "name": s.name,
+                "ph": "X",
+                "ts": s.start_time * 1e6,
+                "dur": s.wall_time * 1e6,
+                "pid": 0,
+                "tid": 0,
+                "args": {
+                    "constraints_added": s.constraints_added,
+                    "literals_referenced": s.literals_referenced,
+                    "memory_delta": s.memory_delta,
+                },
+            }
+            for s in self.stages
+        ]
+        _trace = {"traceEvents": _events, "otherData": {"solver": self.solver}}
+        with Path(_file_location).open("w") as f:
+            json.dump(_trace, f, default=str)
+
+
+def count_literals(_constraints: List[cp_model_pb2.ConstraintProto]) -> int:
+    """Return the number of variable references, including enforcement literals, in constraints."""
+    _count = 0
+    for _constraint in _constraints:
+        _count += len(_constraint.enforcement_literal)
+        _kind = _constraint.WhichOneof("constraint")
+        if _kind == "linear":
+            _count += len(_constraint.linear.vars)
+        elif _kind in ("bool_or", "bool_and", "at_most_one", "exactly_one", "bool_xor"):
+            _count += len(getattr(_constraint, _kind).literals)
+    return _count
+
+
+def get_presolve_time(_log_lines: List[str]) -> Optional[float]:
+    """Return the presolve time found in the solver's search log, or None if not logged."""
+    _start = None
+    for _line in _log_lines:
+        if _start is None:
+            _match = _PRESOLVE_START.search(_line)
+            if _match:
+                _start = float(_match.group(1))
+        else:
+            _match = _PRESOLVE_END.search(_line)
+            if _match:
+                return float(_match.group(1)) - _start
+    return None
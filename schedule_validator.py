@@ -0,0 +1,458 @@
+"""Check a schedule against the rules Schedule encodes, without building or trusting a model.
+
+A schedule is a table of fixtures with the columns Home Team, Away Team, Date and optionally
+Court No., as the scheduled rows of the Match Fixture slots sheet. Each rule is checked with
+pandas group-bys over the schedule joined to the league's teams, dates and court slots, and every
+fixture breaking a rule gets a row in the report:
+
+- fixture slot: the fixture is in the league and its home team has a court slot on the date
+- one slot per fixture: each fixture is scheduled once
+- one fixture per court slot: a court slot holds at most one fixture
+- one match per team per week: a team plays at most once a week
+- inter club window: intra club fixtures are played at the start of the season or straight
+  after Christmas, in as many weeks as the club has intra club fixtures
+- shared players: teams that share players play on different dates
+- pair separation: the two fixtures between teams of different clubs are more than
+  weeks_separated weeks apart
+- correct week: at most num_allowed_incorrect_fixture_week fixtures are on a date of the other
+  league type
+"""
+
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from Class_League import League
+
+REPORT_COLUMNS = ["Rule", "Home Team", "Away Team", "Date", "Detail"]
+
+
+def _get_team_table(league: League) -> pd.DataFrame:
+    """Return one row per team with its club, league and division."""
+    _teams = league.get_teams()
+    return pd.DataFrame(
+        {
+            "Team": [t.name for t in _teams],
+            "Club": [t.club.name for t in _teams],
+            "League": [t.league for t in _teams],
+            "Division": [t.division for t in _teams],
+        }
+    )
+
+
+def _get_date_table(league: League) -> pd.DataFrame:
+    """Return one row per league date with its week number, day offset and league type."""
+    _dates = league.dates.dates
+    return pd.DataFrame(
+        {
+            "Date": pd.to_datetime([d.date for d in _dates]),
+            "Week": [d.get_week_number() for d in _dates],
+            "Day Offset": [d.day_offset for d in _dates],
+            "League Type": [d.league_type for d in _dates],
+        }
+    )
+
+
+def _get_court_slot_table(league: League) -> pd.DataFrame:
+    """Return one row per court slot and team that can play a home fixture in it."""
+    return pd.DataFrame(
+        [
+            (c.name, pd.Timestamp(cs.date.date), str(cs.concurrency_number), t.name)
+            for c in league.clubs
+            for cs in c.court_slots
+            for t in cs.teams
+        ],
+        columns=["Club", "Date", "Court No.", "Team"],
+    )
+
+
+def _get_fixture_table(league: League) -> pd.DataFrame:
+    """Return one row per fixture of the league."""
+    return pd.DataFrame(
+        {
+            "Home Team": [f.home_team.name for f in league.fixtures],
+            "Away Team": [f.away_team.name for f in league.fixtures],
+            "Is Intra Club": [f.is_intra_club for f in league.fixtures],
+        }
+    )
+
+
+def _get_violations(_rows: pd.DataFrame, _rule: str, _detail) -> pd.DataFrame:
+    """Return a report row for each schedule row, the detail a string or a Series of strings."""
+    return pd.DataFrame(
+        {
+            "Rule": _rule,
+            "Home Team": _rows["Home Team"].to_numpy(),
+            "Away Team": _rows["Away Team"].to_numpy(),
+            "Date": _rows["Date"].to_numpy(),
+            "Detail": _detail.to_numpy() if isinstance(_detail, pd.Series) else _detail,
+        },
+        columns=REPORT_COLUMNS,
+    )
+
+
+def _get_team_rows(_schedule: pd.DataFrame) -> pd.DataFrame:
+    """Return a row for the home team and one for the away team of each scheduled fixture."""
+    _columns = ["Row", "Date", "Week"]
+    return pd.concat(
+        [
+            _schedule[["Home Team", *_columns]].rename(columns={"Home Team": "Team"}),
+            _schedule[["Away Team", *_columns]].rename(columns={"Away Team": "Team"}),
+        ],
+        ignore_index=True,
+    )
+
+
+def _check_fixture_slots(
+    _schedule: pd.DataFrame, _fixtures: pd.DataFrame, _court_slots: pd.DataFrame
+) -> pd.DataFrame:
+    """Report fixtures that are not in the league or have no slot on their date."""
+    _is_fixture = (
+        _schedule[["Home Team", "Away Team"]]
+        .merge(_fixtures[["Home Team", "Away Team"]], how="left", indicator=True)["_merge"]
+        .eq("both")
+        .to_numpy()
+    )
+    _slot_keys = ["Home Team", "Date"]
+    if "Court No." in _schedule.columns:
+        _slot_keys.append("Court No.")
+    _has_slot = (
+        _schedule[_slot_keys]
+        .merge(
+            _court_slots.rename(columns={"Team": "Home Team"})[_slot_keys].drop_duplicates(),
+            how="left",
+            indicator=True,
+        )["_merge"]
+        .eq("both")
+        .to_numpy()
+    )
+    return pd.concat(
+        [
+            _get_violations(_schedule[~_is_fixture], "fixture slot", "not a fixture of the league"),
+            _get_violations(
+                _schedule[_is_fixture & ~_has_slot],
+                "fixture slot",
+                "no court slot for the home team on the date",
+            ),
+        ]
+    )
+
+
+def _check_one_slot_per_fixture(
+    _schedule: pd.DataFrame, _fixtures: pd.DataFrame, _require_all_fixtures: bool
+) -> pd.DataFrame:
+    """Report fixtures scheduled more than once and, if required, fixtures not scheduled."""
+    _counts = _schedule.groupby(["Home Team", "Away Team"])["Row"].transform("size")
+    _reports = [
+        _get_violations(
+            _schedule[_counts > 1],
+            "one slot per fixture",
+            "scheduled " + _counts[_counts > 1].astype(str) + " times",
+        )
+    ]
+    if _require_all_fixtures:
+        _unscheduled = _fixtures.merge(
+            _schedule[["Home Team", "Away Team"]].drop_duplicates(), how="left", indicator=True
+        )
+        _unscheduled = _unscheduled[_unscheduled["_merge"] == "left_only"].assign(Date=pd.NaT)
+        _reports.append(_get_violations(_unscheduled, "one slot per fixture", "not scheduled"))
+    return pd.concat(_reports)
+
+
+def _check_one_fixture_per_court_slot(
+    _schedule: pd.DataFrame, _court_slots: pd.DataFrame
+) -> pd.DataFrame:
+    """Report fixtures sharing a court slot, or outnumbering the club's slots on a date."""
+    if "Court No." in _schedule.columns:
+        _counts = _schedule.groupby(["Home Club", "Date", "Court No."])["Row"].transform("size")
+        _is_over = _counts > 1
+        _detail = "court slot holds " + _counts[_is_over].astype(str) + " fixtures"
+    else:
+        _counts = _schedule.groupby(["Home Club", "Date"])["Row"].transform("size")
+        _club_date_slots = (
+            _court_slots[["Club", "Date", "Court No."]]
+            .drop_duplicates()
+            .groupby(["Club", "Date"])
+            .size()
+            .rename("Slots")
+        )
+        _slots = (
+            _schedule[["Home Club", "Date"]]
+            .merge(_club_date_slots, left_on=["Home Club", "Date"], right_index=True, how="left")[
+                "Slots"
+            ]
+            .fillna(0)
+            .astype(int)
+            .to_numpy()
+        )
+        _is_over = _counts.to_numpy() > _slots
+        _detail = (
+            pd.Series(_counts.to_numpy()[_is_over]).astype(str)
+            + " fixtures in "
+            + pd.Series(_slots[_is_over]).astype(str)
+            + " court slots"
+        )
+    return _get_violations(_schedule[_is_over], "one fixture per court slot", _detail)
+
+
+def _check_one_match_per_team_per_week(_schedule: pd.DataFrame) -> pd.DataFrame:
+    """Report fixtures of a team that plays more than once in a week."""
+    _team_rows = _get_team_rows(_schedule)
+    _counts = _team_rows.groupby(["Team", "Week"])["Row"].transform("size")
+    _over = _team_rows[_counts > 1]
+    _rows = _schedule.loc[_over["Row"]]
+    return _get_violations(
+        _rows,
+        "one match per team per week",
+        _over["Team"].reset_index(drop=True)
+        + " plays "
+        + _counts[_counts > 1].astype(str).reset_index(drop=True)
+        + " times in week "
+        + _over["Week"].astype(str).reset_index(drop=True),
+    )
+
+
+def _check_inter_club_window(
+    league: League, _schedule: pd.DataFrame, _fixtures: pd.DataFrame, _dates: pd.DataFrame
+) -> pd.DataFrame:
+    """Report intra club fixtures outside the club's window.
+
+    Mirrors Schedule.create_constraint_inter_club_matches_first, including leaving fixtures with
+    no slot in the window unconstrained.
+    """
+    _intra = _fixtures[_fixtures["Is Intra Club"]]
+    if _intra.empty:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    _min_week = league.get_min_week_number()
+    _post_xmas_week = league.get_christmas_week_number()
+    _teams = _get_team_table(league).set_index("Team")["Club"]
+    _club_intra_count = _intra["Home Team"].map(_teams).value_counts()
+
+    def _is_in_window(_clubs: pd.Series, _weeks: pd.Series) -> np.ndarray:
+        _num = _clubs.map(_club_intra_count).fillna(0).to_numpy()
+        _weeks = _weeks.to_numpy()
+        return (_weeks - _min_week < _num) | (
+            (_post_xmas_week <= _weeks) & (_weeks <= _post_xmas_week + _num)
+        )
+
+    _intra_slots = pd.DataFrame(
+        [
+            (f.home_team.name, f.away_team.name, pd.Timestamp(fs.court_slot.date.date))
+            for f in league.fixtures
+            if f.is_intra_club
+            for fs in f.fixture_court_slots
+        ],
+        columns=["Home Team", "Away Team", "Date"],
+    ).merge(_dates[["Date", "Week"]], on="Date")
+    _intra_slots["In Window"] = _is_in_window(
+        _intra_slots["Home Team"].map(_teams), _intra_slots["Week"]
+    )
+    _has_window_slot = (
+        _intra_slots.groupby(["Home Team", "Away Team"])["In Window"].any().rename("Has Window")
+    )
+
+    _rows = _schedule[_schedule["Is Intra Club"]].merge(
+        _has_window_slot, left_on=["Home Team", "Away Team"], right_index=True, how="left"
+    )
+    _is_outside = ~_is_in_window(_rows["Home Club"], _rows["Week"]) & _rows[
+        "Has Window"
+    ].fillna(False).to_numpy(dtype=bool)
+    _rows = _rows[_is_outside]
+    return _get_violations(
+        _rows,
+        "inter club window",
+        "intra club fixture in week " + _rows["Week"].astype(str),
+    )
+
+
+def _check_shared_players(league: League, _schedule: pd.DataFrame) -> pd.DataFrame:
+    """Report fixtures of teams that share players played on the same date."""
+    _cliques = pd.DataFrame(
+        [
+            (" / ".join(t.name for t in _clique), t.name)
+            for _clique in league.get_team_conflict_graph().get_maximal_cliques()
+            for t in _clique
+        ],
+        columns=["Clique", "Team"],
+    )
+    _clique_rows = (
+        _cliques.merge(_get_team_rows(_schedule), on="Team")
+        .drop_duplicates(["Clique", "Row"])
+        .reset_index(drop=True)
+    )
+    _counts = _clique_rows.groupby(["Clique", "Date"])["Row"].transform("size")
+    _over = _clique_rows[_counts > 1].drop_duplicates("Row")
+    return _get_violations(
+        _schedule.loc[_over["Row"]],
+        "shared players",
+        "teams sharing players " + _over["Clique"].reset_index(drop=True) + " play on the date",
+    )
+
+
+def _check_pair_separation(_schedule: pd.DataFrame, _weeks_separated: int) -> pd.DataFrame:
+    """Report the fixtures between two teams of different clubs that are too close together."""
+    _inter = _schedule[~_schedule["Is Intra Club"]].copy()
+    _inter["Pair"] = np.where(
+        _inter["Home Team"] < _inter["Away Team"],
+        _inter["Home Team"] + " / " + _inter["Away Team"],
+        _inter["Away Team"] + " / " + _inter["Home Team"],
+    )
+    _columns = ["Pair", "Row", "Home Team", "Day Offset"]
+    _pairs = _inter[_columns].merge(_inter[_columns], on="Pair")
+    _pairs = _pairs[
+        (_pairs["Row_x"] < _pairs["Row_y"]) & (_pairs["Home Team_x"] != _pairs["Home Team_y"])
+    ]
+    _weeks_apart = (_pairs["Day Offset_x"] - _pairs["Day Offset_y"]).abs() // 7
+    _too_close = _pairs[_weeks_apart <= _weeks_separated]
+    _detail = (
+        "reverse fixture "
+        + (_weeks_apart[_weeks_apart <= _weeks_separated]).astype(str)
+        + " weeks apart"
+    )
+    return pd.concat(
+        [
+            _get_violations(_schedule.loc[_too_close["Row_x"]], "pair separation", _detail),
+            _get_violations(_schedule.loc[_too_close["Row_y"]], "pair separation", _detail),
+        ]
+    )
+
+
+def _check_correct_week(
+    _schedule: pd.DataFrame, _num_allowed_incorrect_fixture_week: int
+) -> pd.DataFrame:
+    """Report every incorrect week fixture when there are more than allowed."""
+    _incorrect = _schedule[~_schedule["Is Correct Week"]]
+    if len(_incorrect) <= _num_allowed_incorrect_fixture_week:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    return _get_violations(
+        _incorrect,
+        "correct week",
+        f"{len(_incorrect)} incorrect week fixtures, {_num_allowed_incorrect_fixture_week} allowed",
+    )
+
+
+def get_schedule_table(league: League, schedule: pd.DataFrame) -> pd.DataFrame:
+    """Return the schedule joined to the league's teams and dates, one row per fixture.
+
+    Rows whose teams or date are not in the league are kept, without the joined columns.
+
+    :param league: league the schedule is for
+    :param schedule: table with Home Team, Away Team, Date and optionally Court No.
+    :return: the schedule with a Row number, parsed Date and the teams' and dates' columns
+    """
+    _teams = _get_team_table(league)
+    _table = pd.DataFrame(
+        {
+            "Row": np.arange(len(schedule)),
+            "Home Team": schedule["Home Team"].astype(str).to_numpy(),
+            "Away Team": schedule["Away Team"].astype(str).to_numpy(),
+            "Date": pd.to_datetime(schedule["Date"], dayfirst=True).to_numpy(),
+        }
+    )
+    if "Court No." in schedule.columns:
+        _table["Court No."] = schedule["Court No."].astype(str).to_numpy()
+    _table = (
+        _table.merge(
+            _teams.add_prefix("Home "), left_on="Home Team", right_on="Home Team", how="left"
+        )
+        .merge(_teams.add_prefix("Away "), left_on="Away Team", right_on="Away Team", how="left")
+        .merge(_get_date_table(league), on="Date", how="left")
+    )
+    _table["Is Intra Club"] = (_table["Home Club"] == _table["Away Club"]).to_numpy()
+    _table["Is Correct Week"] = (
+        (_table["League Type"] == "Mixed") == (_table["Home League"] == "Mixed")
+    ).to_numpy()
+    return _table.set_index("Row", drop=False)
+
+
+def validate_schedule(
+    league: League,
+    schedule: pd.DataFrame,
+    weeks_separated: int = 2,
+    num_allowed_incorrect_fixture_week: int = 0,
+    require_all_fixtures: bool = True,
+) -> pd.DataFrame:
+    """Check a schedule against every rule Schedule encodes.
+
+    :param league: league the schedule is for
+    :param schedule: table with Home Team, Away Team, Date and optionally Court No., dates in
+        the %d-%b-%Y format of the sheets or any day first format
+    :param weeks_separated: minimum number of weeks between the two fixtures of a pair of teams
+    :param num_allowed_incorrect_fixture_week: number of fixtures allowed in the incorrect week
+    :param require_all_fixtures: report the league's fixtures missing from the schedule, set
+        False for a partial schedule such as the predefined fixtures
+    :return: DataFrame with columns Rule, Home Team, Away Team, Date and Detail, one row per
+        fixture breaking a rule, empty if the schedule is valid
+    """
+    _table = get_schedule_table(league, schedule)
+    _fixtures = _get_fixture_table(league)
+    _court_slots = _get_court_slot_table(league)
+    _reports: List[pd.DataFrame] = [_check_fixture_slots(_table, _fixtures, _court_slots)]
+
+    # The other rules only apply to fixtures of the league on league dates.
+    _known = _table[_table["Home Club"].notna() & _table["Away Club"].notna()]
+    _known = _known[_known["Week"].notna()].astype({"Week": int, "Day Offset": int})
+    _reports.append(_check_one_slot_per_fixture(_known, _fixtures, require_all_fixtures))
+    if not _known.empty:
+        _reports += [
+            _check_one_fixture_per_court_slot(_known, _court_slots),
+            _check_one_match_per_team_per_week(_known),
+            _check_inter_club_window(league, _known, _fixtures, _get_date_table(league)),
+            _check_shared_players(league, _known),
+            _check_pair_separation(_known, weeks_separated),
+            _check_correct_week(_known, num_allowed_incorrect_fixture_week),
+        ]
+    _reports = [r for r in _reports if not r.empty]
+    if not _reports:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    return pd.concat(_reports, ignore_index=True)
+
+
+def get_predefined_fixture_schedule(predefined_fixtures: pd.DataFrame) -> pd.DataFrame:
+    """Return the predefined fixtures sheet as a schedule table for validate_schedule.
+
+    Team names without a rank get the A team rank and Match Date becomes Date, as in
+    Schedule.input_predefined_fixtures.
+    """
+    _team_names = {}
+    for _column in ["Home Team", "Away Team"]:
+        _names = predefined_fixtures[_column].astype(str)
+        _team_names[_column] = _names.where(_names.str.fullmatch(r".* [A-G]"), _names + " A")
+    return pd.DataFrame(
+        {
+            **_team_names,
+            "Date": pd.to_datetime(
+                predefined_fixtures["Match Date"], format="%d/%m/%Y", errors="coerce"
+            ),
+        }
+    )
+
+
+def check_predefined_fixtures(
+    league: League,
+    predefined_fixtures: pd.DataFrame,
+    weeks_separated: int = 2,
+    num_allowed_incorrect_fixture_week: int = 0,
+) -> pd.DataFrame:
+    """Check the hand-edited predefined fixtures keep every rule, before they fix the model.
+
+    :param league: league the fixtures are for
+    :param predefined_fixtures: predefined fixtures sheet with Home Team, Away Team and Match Date
+    :param weeks_separated: minimum number of weeks between the two fixtures of a pair of teams
+    :param num_allowed_incorrect_fixture_week: number of fixtures allowed in the incorrect week
+    :return: the violations report, empty
+    :raises ValueError: listing every predefined fixture breaking a rule
+    """
+    _violations = validate_schedule(
+        league,
+        get_predefined_fixture_schedule(predefined_fixtures),
+        weeks_separated=weeks_separated,
+        num_allowed_incorrect_fixture_week=num_allowed_incorrect_fixture_week,
+        require_all_fixtures=False,
+    )
+    if not _violations.empty:
+        raise ValueError(
+            f"Predefined fixtures break the schedule rules:\n{_violations.to_string(index=False)}"
+        )
+    return _violations
@@ -1,20 +1,93 @@
 from __future__ import print_function
-from typing import List, Tuple, Dict, Any, Union
+from typing import List, Tuple, Dict, Any, Union, Callable, Optional
 from ortools.sat.python import cp_model
 from datetime import datetime, timedelta, date
 import itertools
+import logging
+import time
+import tracemalloc
 from ortools.sat.python.cp_model import IntVar, CpModel
+import numpy as np
 import pandas as pd
-import re
-from Class_League import League
+from Class_League import League, Fixture, FixtureCourtSlot
 from gsheets import get_gsheet_data, write_gsheet_output_data
 from collections import defaultdict
+from dataclasses import dataclass, field
+from decomposition import solve_components, solve_two_phase
+from two_stage import solve_week_then_court
+from lns import solve_lns
+from solver_race import solve_race
+from reschedule import get_published_fixture_slots, get_reschedule_scope
+from league_precheck import check_league_capacity
+from memory_profile import memory_stage
+from model_cache import ModelCache, league_content_hash
+from schedule_report import (
+    ScheduleReport,
+    SolverReport,
+    StageReport,
+    count_literals,
+    get_presolve_time,
+)
+from solution_callbacks import SolutionSink, StopRule, StreamingSolutionCallback
+
+logger = logging.getLogger(__name__)
 
 
 def main():
     pass
 
 
+@dataclass
+class SolveOptions:
+    """How a Schedule is built, solved and reported, beyond the league and the run time."""
+
+    # Number of fixtures that can be scheduled in the incorrect week.
+    num_allowed_incorrect_fixture_week: int = 0
+    # Minimum number of weeks between the two fixtures of a pair of teams.
+    weeks_separated: int = 2
+    # Table of already commited match dates, used instead of the predefined_fixtures_url.
+    predefined_fixtures: Optional[pd.DataFrame] = None
+    # Fixtures to schedule, all the league's fixtures if None.
+    fixtures: Optional[List[Fixture]] = None
+    # Only include the fixture slots this returns true for in the model.
+    fixture_slot_filter: Optional[Callable[[FixtureCourtSlot], bool]] = None
+    # Url of spreadsheet whose Match Fixture slots sheet has the published schedule to reschedule.
+    published_fixtures_url: Optional[str] = None
+    # Table of the published schedule, used instead of published_fixtures_url.
+    published_fixtures: Optional[pd.DataFrame] = None
+    # First date a reschedule can move fixtures to, defaults to today.
+    reschedule_from: Optional[datetime] = None
+    # Check the league has capacity for every fixture before building the model.
+    precheck: bool = True
+    # Solve the model, or only build it.
+    solve: bool = True
+    # One of SOLVE_MODES, how the model is solved.
+    solve_mode: str = "monolithic"
+    # Further keyword arguments of the solve mode's function.
+    mode_options: Dict[str, Any] = field(default_factory=dict)
+    # Maximum number of processes used by the parallel solve modes.
+    max_workers: Optional[int] = None
+    # Callables given a snapshot of each improving solution, see solution_callbacks.
+    solution_sinks: List[SolutionSink] = field(default_factory=list)
+    # Rules that stop the search before allowed_run_time, see solution_callbacks.
+    stop_rules: List[StopRule] = field(default_factory=list)
+    # Directory to cache models and solutions in, no caching if None.
+    cache_dir: Optional[str] = None
+    # Solve again even if a cached solution exists.
+    force_resolve: bool = False
+    # Record the Python memory allocated by each stage in the report, using tracemalloc.
+    track_memory: bool = False
+    # Also record the literals each stage's constraints reference and the solver's presolve time,
+    # which cost a walk of the constraints and a search log.
+    detailed_report: bool = False
+    # Write the stage report to this file as a Chrome trace, with the detailed report.
+    trace_file: Optional[str] = None
+    # Write the solution to the league management sheet once solved.
+    write_results: bool = True
+    # Also write every candidate fixture slot, not only the scheduled fixtures.
+    write_all_fixture_slots: bool = False
+
+
 class Schedule:
     """
     A scheduling model to schedule fixtures for a given league.
@@ -29,40 +102,405 @@ class Schedule:
         league: League,
         allowed_run_time: int,
         predefined_fixtures_url: str = None,
-        num_allowed_incorrect_fixture_week: int = 0,
+        options: SolveOptions = None,
     ):
         """
         Initialize a new scheduling model for a given league.
 
+        When a cache directory is given the built model and best solution are saved under a hash of
+        the league, constraint parameters and predefined fixtures. A rerun with the same content
+        returns the cached solution if it is optimal or schedules every fixture. Otherwise, or with
+        force_resolve, it loads the cached model and solves it again starting from the cached
+        solution.
+
+        Given a published schedule the model is a reschedule: it only covers the fixtures and
+        slots from reschedule_from on, and the objective keeps as many fixtures as it can on their
+        published date, after scheduling as many fixtures as possible.
+
         :param league: The prepared league to be scheduled
         :param predefined_fixtures_url: Url of spreadsheet containing already commited match dates
-        :param allowed_run_time: Seconds the model will be left to run for before a sub optimial result will be returned
-        :param num_allowed_incorrect_fixture_week: Fix the number of matches that can be scheduled on the incorrect week
+        :param allowed_run_time: Seconds the model will be left to run for before a sub optimial
+            result will be returned
+        :param options: How the model is built, solved and reported, see SolveOptions
         """
         self.league = league
+        if not getattr(self.league.dates, "is_finalised", False):
+            # Leagues with dates added since they were built.
+            self.league.dates.finalise()
+        self.options = options or SolveOptions()
+        if self.options.solve_mode not in SOLVE_MODES:
+            raise ValueError(
+                f"Unknown solve mode {self.options.solve_mode}, "
+                f"expected one of {list(SOLVE_MODES)}"
+            )
         self.model: CpModel = cp_model.CpModel()
 
         self.selected_fixture = {}
+        self._set_fixture_slots()
+        self.fixture_slot_var_indices = np.empty(0, dtype=int)
+        self.build_parameters: Dict[str, Any] = {}
+        self.solution_values = None
+        self.objective_value = None
+        # Status returned by the solver, before unscheduled fixtures make the result INFEASIBLE.
+        self.solver_status = None
+        self.report = ScheduleReport()
+        self.detailed_report = self.options.detailed_report or self.options.trace_file is not None
+        self._report_start_time = time.perf_counter()
+
+        _start_tracing = self.options.track_memory and not tracemalloc.is_tracing()
+        if _start_tracing:
+            tracemalloc.start()
+        try:
+            self.model_result = self._build_and_solve(allowed_run_time, predefined_fixtures_url)
+        finally:
+            if _start_tracing:
+                tracemalloc.stop()
+            if self.options.trace_file:
+                self.report.write_trace(self.options.trace_file)
+
+    def _set_fixture_slots(self):
+        """Set the fixtures and fixture slots in the model, limited to the reschedule scope."""
+        self.fixtures = (
+            self.league.fixtures if self.options.fixtures is None else self.options.fixtures
+        )
+        self.published_fixtures = self.options.published_fixtures
+        if self.published_fixtures is None and self.options.published_fixtures_url:
+            self.published_fixtures = self._get_published_fixtures(
+                self.options.published_fixtures_url
+            )
+        self.reschedule_from = self.options.reschedule_from
+        self.fixture_slot_filter = self.options.fixture_slot_filter
+        self.published_fixture_slots = {}
+        if self.published_fixtures is not None:
+            if self.reschedule_from is None:
+                self.reschedule_from = datetime.combine(
+                    datetime.today().date(), datetime.min.time()
+                )
+            self.published_fixture_slots = get_published_fixture_slots(
+                self.league, self.published_fixtures
+            )
+            _remaining_fixtures, _is_reschedulable = get_reschedule_scope(
+                self.league,
+                self.published_fixture_slots,
+                self.reschedule_from,
+                self.options.weeks_separated,
+            )
+            _remaining_fixtures = set(_remaining_fixtures)
+            self.fixtures = [f for f in self.fixtures if f in _remaining_fixtures]
+            self.fixture_slot_filter = self._combine_fixture_slot_filters(
+                _is_reschedulable, self.fixture_slot_filter
+            )
+
+        self.fixture_slots = []
+        _fixture_numbers = []
+        for _fixture_number, _fixture in enumerate(self.fixtures):
+            for _fixture_slot in _fixture.fixture_court_slots:
+                if self.fixture_slot_filter is None or self.fixture_slot_filter(_fixture_slot):
+                    self.fixture_slots.append(_fixture_slot)
+                    _fixture_numbers.append(_fixture_number)
+        self.fixture_slot_fixture_numbers = np.array(_fixture_numbers, dtype=int)
+        self.fixture_slot_positions = {
+            fs.identifier: _position for _position, fs in enumerate(self.fixture_slots)
+        }
+
+    @property
+    def stage_times(self) -> Dict[str, float]:
+        """Return the wall time in seconds of each stage run so far."""
+        return self.report.stage_times()
+
+    def _build_and_solve(self, allowed_run_time: int, predefined_fixtures_url: str) -> str:
+        """Check the league, build or load the model and solve it, or use a cached solution.
+
+        See __init__ for the parameters.
+
+        :return: The status of the solution, NOT_SOLVED if only built
+        """
+        if self.options.precheck:
+            self._run_stage("precheck", check_league_capacity, self.league)
+
+        predefined_fixtures = self.options.predefined_fixtures
+        if predefined_fixtures is None and predefined_fixtures_url:
+            predefined_fixtures = self._get_predefined_fixtures(predefined_fixtures_url)
+        self.build_parameters = {
+            "predefined_fixtures": predefined_fixtures,
+            "num_allowed_incorrect_fixture_week": self.options.num_allowed_incorrect_fixture_week,
+            "weeks_separated": self.options.weeks_separated,
+            "published_fixtures": self.published_fixtures,
+            "reschedule_from": self.reschedule_from,
+        }
+
+        self.model_cache = ModelCache(self.options.cache_dir) if self.options.cache_dir else None
+        self.content_hash = None
+        _cached_solution = None
+        if self.model_cache:
+            self.content_hash = self._get_content_hash(predefined_fixtures)
+            _cached_solution = self.model_cache.load_solution(self.content_hash)
 
-        self.create_model_variables()
+        if (
+            _cached_solution
+            and not self.options.force_resolve
+            and self._is_final_solution(_cached_solution)
+        ):
+            print(f"Using cached solution {self.content_hash}")
+            return self._use_cached_solution(_cached_solution)
 
-        self.create_constraint_one_slot_per_fixture()
-        self.create_constraint_one_fixture_per_slot()
-        self.create_constraint_one_fixture_per_week_per_team()
-        self.create_constraint_inter_club_matches_first()
-        self.create_constraint_fixture_correct_week(
-            num_allowed_incorrect=num_allowed_incorrect_fixture_week
+        if not self._load_cached_model():
+            self.build_model(
+                predefined_fixtures=predefined_fixtures,
+                num_allowed_incorrect_fixture_week=self.options.num_allowed_incorrect_fixture_week,
+                weeks_separated=self.options.weeks_separated,
+            )
+            if self.model_cache:
+                self.model_cache.save_model(
+                    self.content_hash, self.model.Proto().SerializeToString()
+                )
+        if not self.options.solve:
+            return "NOT_SOLVED"
+        if _cached_solution:
+            self._add_solution_hints(_cached_solution["selected"])
+
+        status_name = self.run_model(
+            allowed_run_time=allowed_run_time,
+            solution_sinks=self.options.solution_sinks,
+            stop_rules=self.options.stop_rules,
+        )
+        if self.model_cache and self.solution_values is not None:
+            self.model_cache.save_solution(
+                self.content_hash,
+                self.solver_status,
+                self.objective_value,
+                np.flatnonzero(self.solution_values).tolist(),
+            )
+        return status_name
+
+    def _get_content_hash(self, predefined_fixtures: Optional[pd.DataFrame]) -> str:
+        """Return the hash the model and solution are cached under.
+
+        :param predefined_fixtures: Table of already commited match dates, or None
+        :return: Hash of the league, the constraint parameters and the fixture slots in the model
+        """
+        _hash_parameters = {
+            "num_allowed_incorrect_fixture_week": self.options.num_allowed_incorrect_fixture_week,
+            "weeks_separated": self.options.weeks_separated,
+        }
+        if predefined_fixtures is not None or self.published_fixtures is not None:
+            _hash_parameters["today"] = datetime.today().date()
+        if self.fixtures is not self.league.fixtures or self.fixture_slot_filter is not None:
+            _hash_parameters["fixture_slots"] = list(self.fixture_slot_positions)
+        if self.published_fixture_slots:
+            _hash_parameters["published_fixture_slots"] = sorted(
+                fs.identifier for fs in self.published_fixture_slots.values()
+            )
+        return league_content_hash(self.league, _hash_parameters, predefined_fixtures)
+
+    def build_model(
+        self,
+        predefined_fixtures: pd.DataFrame = None,
+        num_allowed_incorrect_fixture_week: int = 0,
+        weeks_separated: int = 2,
+    ):
+        """Create the model variables, constraints and objective.
+
+        :param predefined_fixtures: Table of already commited match dates, or None
+        :param num_allowed_incorrect_fixture_week: Fix the number of matches that can be scheduled
+            on the incorrect week
+        :param weeks_separated: Minimum number of weeks between the two fixtures of a pair of teams
+        """
+        self._run_stage("create_model_variables", self.create_model_variables)
+
+        self._run_stage(
+            "create_constraint_one_slot_per_fixture", self.create_constraint_one_slot_per_fixture
+        )
+        self._run_stage(
+            "create_constraint_one_fixture_per_slot", self.create_constraint_one_fixture_per_slot
+        )
+        self._run_stage(
+            "create_constraint_one_fixture_per_week_per_team",
+            self.create_constraint_one_fixture_per_week_per_team,
+        )
+        self._run_stage(
+            "create_constraint_inter_club_matches_first",
+            self.create_constraint_inter_club_matches_first,
+        )
+        self._run_stage(
+            "create_constraint_fixture_correct_week",
+            self.create_constraint_fixture_correct_week,
+            num_allowed_incorrect=num_allowed_incorrect_fixture_week,
+        )
+        self._run_stage(
+            "create_constraint_shared_players_diff_day",
+            self.create_constraint_shared_players_diff_day,
+        )
+        self._run_stage(
+            "create_constraint_fixture_pair_separation",
+            self.create_constraint_fixture_pair_separation,
+            weeks_separated=weeks_separated,
         )
-        self.create_constraint_shared_players_diff_day()
-        self.create_constraint_fixture_pair_separation(weeks_separated=2)
         # self.create_constraint_mix_home_and_away_fixture(weeks_separated=2)
 
         # self.create_objective_fixture_correct_week()
-        self.create_objective_maximise_fixtures_scheduled()
-        if predefined_fixtures_url:
-            self.input_predefined_fixtures(predefined_fixtures_url)
+        if self.published_fixture_slots:
+            self._run_stage(
+                "create_objective_minimise_moved_fixtures",
+                self.create_objective_minimise_moved_fixtures,
+            )
+        else:
+            self._run_stage(
+                "create_objective_maximise_fixtures_scheduled",
+                self.create_objective_maximise_fixtures_scheduled,
+            )
+        if predefined_fixtures is not None:
+            self._run_stage(
+                "input_predefined_fixtures", self.input_predefined_fixtures, predefined_fixtures
+            )
+
+    @staticmethod
+    def _combine_fixture_slot_filters(
+        *_filters: Callable[[FixtureCourtSlot], bool]
+    ) -> Callable[[FixtureCourtSlot], bool]:
+        """Return a filter passing the fixture slots that pass every given filter, skipping None."""
+        _filters = [f for f in _filters if f is not None]
+
+        def _passes_all(_fixture_slot: FixtureCourtSlot) -> bool:
+            return all(f(_fixture_slot) for f in _filters)
+
+        return _passes_all
+
+    def create_sub_schedule(
+        self,
+        fixtures: List[Fixture],
+        fixture_slot_filter: Callable[[FixtureCourtSlot], bool] = None,
+    ) -> "Schedule":
+        """Build, without solving, the model for some of this schedule's fixtures.
+
+        The sub schedule uses the same constraint parameters and predefined fixtures. Its fixture
+        slots are those of this schedule for the given fixtures that also pass the filter.
+
+        :param fixtures: Fixtures to include
+        :param fixture_slot_filter: Further restriction on the fixture slots to include
+        :return: The built sub schedule
+        """
+
+        def _in_sub_schedule(_fixture_slot: FixtureCourtSlot) -> bool:
+            if _fixture_slot.identifier not in self.fixture_slot_positions:
+                return False
+            return fixture_slot_filter is None or fixture_slot_filter(_fixture_slot)
+
+        return Schedule(
+            self.league,
+            allowed_run_time=0,
+            options=SolveOptions(
+                fixtures=fixtures,
+                fixture_slot_filter=_in_sub_schedule,
+                precheck=False,
+                solve=False,
+                **self.build_parameters,
+            ),
+        )
+
+    def _run_stage(self, _stage_name: str, _stage, *args, **kwargs):
+        """Run one stage of building or solving the model, recording it in the report.
+
+        The report records the stage's wall time, the constraints it added to the model and, when
+        tracemalloc is tracing, the change in Python memory allocated. With detailed_report it
+        also records the literals those constraints reference. Inside a MemoryProfiler the stage
+        is also a profiled stage.
+
+        :param _stage_name: Name the stage is recorded under
+        :param _stage: Callable running the stage
+        :return: The value returned by the stage
+        """
+        _constraints_before = len(self.model.Proto().constraints)
+        _memory_before = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        _start = time.perf_counter()
+        with memory_stage(_stage_name):
+            _result = _stage(*args, **kwargs)
+        _wall_time = time.perf_counter() - _start
+
+        _new_constraints = self.model.Proto().constraints[_constraints_before:]
+        _literals = count_literals(_new_constraints) if self.detailed_report else None
+        _memory_delta = None
+        if _memory_before is not None and tracemalloc.is_tracing():
+            _memory_delta = tracemalloc.get_traced_memory()[0] - _memory_before
+        self.report.stages.append(
+            StageReport(
+                name=_stage_name,
+                start_time=_start - self._report_start_time,
+                wall_time=_wall_time,
+                constraints_added=len(_new_constraints),
+                literals_referenced=_literals,
+                memory_delta=_memory_delta,
+            )
+        )
+        return _result
+
+    def _load_cached_model(self) -> bool:
+        """Load the model cached under the content hash and link its variables to the fixture slots.
+
+        :return: True if a cached model was loaded
+        """
+        if not self.model_cache:
+            return False
+        _model_proto = self.model_cache.load_model(self.content_hash)
+        if _model_proto is None:
+            return False
+        self.model.Proto().ParseFromString(_model_proto)
+        for _index, _fixture_slot in enumerate(self.fixture_slots):
+            _var = self.model.GetBoolVarFromProtoIndex(_index)
+            if _var.Name() != _fixture_slot.identifier:
+                raise ValueError(f"Cached model does not match fixture slot {_fixture_slot}")
+            self.selected_fixture[_fixture_slot.identifier] = _var
+        self.fixture_slot_var_indices = np.arange(len(self.fixture_slots))
+        print(f"Loaded cached model {self.content_hash}")
+        return True
 
-        self.model_result = self.run_model(allowed_run_time=allowed_run_time)
+    def _is_final_solution(self, _cached_solution: Dict[str, Any]) -> bool:
+        """Return true if a cached solution cannot be improved on by solving again.
+
+        That is a solution proven optimal or, unless rescheduling where the moved fixtures are
+        also minimised, one scheduling every fixture in the model. Any other cached solution, e.g.
+        from a run with a shorter allowed_run_time, only hints the solver.
+
+        :param _cached_solution: Solution loaded from the model cache
+        """
+        if _cached_solution["status"] == "OPTIMAL":
+            return True
+        if self.published_fixture_slots:
+            return False
+        _scheduled = np.unique(self.fixture_slot_fixture_numbers[_cached_solution["selected"]])
+        return len(_scheduled) == len(self.fixtures)
+
+    def _use_cached_solution(self, _cached_solution: Dict[str, Any]) -> str:
+        """Apply a cached solution to the fixture slots and write it out as if just solved.
+
+        :param _cached_solution: Solution loaded from the model cache
+        :return: The status of the cached solution
+        """
+        self.solution_values = np.zeros(len(self.fixture_slots), dtype=int)
+        self.solution_values[_cached_solution["selected"]] = 1
+        self.objective_value = _cached_solution["objective"]
+        self.solver_status = _cached_solution["status"]
+        status_name = self._apply_solution(self.solution_values, _cached_solution["status"])
+        self._write_results()
+        return status_name
+
+    def _add_solution_hints(self, _selected: List[int]):
+        """Hint the solver with a previous solution, given as the positions of the scheduled slots.
+
+        :param _selected: Positions in fixture_slots of the scheduled slots
+        """
+        _values = np.zeros(len(self.fixture_slots), dtype=int)
+        _values[_selected] = 1
+        for _fixture_slot, _value in zip(self.fixture_slots, _values.tolist()):
+            self.model.AddHint(self.selected_fixture[_fixture_slot.identifier], _value)
+
+    def _get_model_vars(self, _fixture_slots: List[FixtureCourtSlot]) -> List[IntVar]:
+        """Return the model variables of those fixture slots that are in this model."""
+        return [
+            self.selected_fixture[fs.identifier]
+            for fs in _fixture_slots
+            if fs.identifier in self.selected_fixture
+        ]
 
     def create_model_variables(self):
         """
@@ -70,12 +508,17 @@ class Schedule:
 
         For each fixture court slot in the league, this method creates a new Boolean variable
         to represent the selection of the fixture for that slot. The identifier of the court slot
-        is used as the name of the variable.
+        is used as the name of the variable. The variables are created in the fixture order of
+        fixture_slots and the index of each slot's variable is kept in fixture_slot_var_indices.
         """
-        for _fixture_slot in self.league.get_fixture_court_slots():
+        for _fixture_slot in self.fixture_slots:
             self.selected_fixture[_fixture_slot.identifier] = self.model.NewBoolVar(
                 _fixture_slot.identifier
             )
+        self.fixture_slot_var_indices = np.array(
+            [self.selected_fixture[fs.identifier].Index() for fs in self.fixture_slots],
+            dtype=int,
+        )
 
     def create_constraint_one_slot_per_fixture(self):
         """
@@ -85,14 +528,10 @@ class Schedule:
         representing the selection of the fixture court slots for a given fixture is less than or equal to 1.
         This ensures that each fixture is scheduled to a single court slot.
         """
-        for _fixture in self.league.fixtures:
-            self.model.Add(
-                sum(
-                    self.selected_fixture[_fixture_slot.identifier]
-                    for _fixture_slot in _fixture.fixture_court_slots
-                )
-                <= 1
-            )
+        for _fixture in self.fixtures:
+            _fixture_vars = self._get_model_vars(_fixture.fixture_court_slots)
+            if _fixture_vars:
+                self.model.Add(sum(_fixture_vars) <= 1)
 
     def create_constraint_one_fixture_per_slot(self):
         """
@@ -104,36 +543,26 @@ class Schedule:
         """
         for _club in self.league.clubs:
             for _court_slot in _club.court_slots:
-                self.model.Add(
-                    sum(
-                        self.selected_fixture[_fixture_slot.identifier]
-                        for _fixture_slot in _court_slot.fixtures_court_slot
-                    )
-                    <= 1
-                )
+                _court_slot_vars = self._get_model_vars(_court_slot.fixtures_court_slot)
+                if _court_slot_vars:
+                    self.model.Add(sum(_court_slot_vars) <= 1)
 
     def create_constraint_one_fixture_per_week_per_team(self):
         """
         This method creates a constraint that enforces that each team is scheduled for only one fixture in each week.
 
-        For each team, creates a list of all potential slots for that team either home or away.
-        Finds the maximum week number for this set of court slots, Uses this to loop through each potential
+        Groups the fixture slots in the model by team, home or away, and week number in one pass,
+        then limits each group to at most one scheduled fixture.
         """
-        for c in self.league.clubs:
-            for t in c.teams:
-                _team_court_slots = defaultdict(list)
-                for fs in self.league.get_fixture_court_slots():
-                    if fs.fixture.home_team == t or fs.fixture.away_team == t:
-                        _team_court_slots[fs.get_week_number].append(fs)
+        _team_week_slots = defaultdict(list)
+        for fs in self.fixture_slots:
+            _week_number = fs.get_week_number()
+            _team_week_slots[(fs.fixture.home_team, _week_number)].append(fs)
+            _team_week_slots[(fs.fixture.away_team, _week_number)].append(fs)
 
-                for _team_slots_in_week in _team_court_slots.values():
-                    self.model.Add(
-                        sum(
-                            self.selected_fixture[_fixture_slot.identifier]
-                            for _fixture_slot in _team_slots_in_week
-                        )
-                        <= 1
-                    )
+        for _team_slots_in_week in _team_week_slots.values():
+            if len(_team_slots_in_week) > 1:
+                self.model.Add(sum(self._get_model_vars(_team_slots_in_week)) <= 1)
 
     def create_constraint_inter_club_matches_first(self):
         """
@@ -147,6 +576,7 @@ class Schedule:
         min_week_num = self.league.get_min_week_number()
         post_xmas_week_num = self.league.get_christmas_week_number()
 
+        _fixtures_in_model = set(self.fixtures)
         for t in self.league.get_teams():
             af = t.club.get_all_fixtures(
                 _is_intra_club=True,
@@ -162,6 +592,8 @@ class Schedule:
                     _include_home=True,
                     _include_away=True,
                 ):
+                    if f not in _fixtures_in_model:
+                        continue
                     allow_fixture_slots = []
                     disallowed_fixture_slots = []
                     for fs in f.fixture_court_slots:
@@ -181,13 +613,9 @@ class Schedule:
                         # print("Team =", t.name)
                         # print("Allowed_fixture_slots =", len(allow_fixture_slots))
                         # print("Weeks to be allocated in =", num_fixtures * 2)
-                        self.model.Add(
-                            sum(
-                                self.selected_fixture[fs.identifier]
-                                for fs in disallowed_fixture_slots
-                            )
-                            <= 0
-                        )
+                        _disallowed_vars = self._get_model_vars(disallowed_fixture_slots)
+                        if _disallowed_vars:
+                            self.model.Add(sum(_disallowed_vars) <= 0)
 
     def create_constraint_fixture_pair_separation(self, weeks_separated=0):
         # for each pair of home and away matches they should be in separate by a number of weeks
@@ -203,49 +631,43 @@ class Schedule:
                 )
                 between_team_fixture_slot_list = []
                 for f in all_t1_fixture_slot_list:
-                    if t2 in [f.fixture.home_team, f.fixture.away_team]:
+                    if (
+                        t2 in [f.fixture.home_team, f.fixture.away_team]
+                        and f.identifier in self.fixture_slot_positions
+                    ):
                         between_team_fixture_slot_list.append(f)
                 self._create_constraint_fixture_in_list_separated(
                     between_team_fixture_slot_list, weeks_separated
                 )
 
     def create_constraint_shared_players_diff_day(self):
-        # for teams that share players their matches shouldn't be scheduled on the same day.
-        for c in self.league.clubs:
-            for t1, t2 in itertools.combinations(c.teams, 2):
-                teams_different = t1 != t2  # probably redundant but wanting to be sure.
-                teams_adj_rank_same_league = (
-                    t1.league == t2.league and abs(ord(t1.rank) - ord(t2.rank)) <= 1
-                )
-                teams_same_rank_dif_league = (
-                    t1.league != t2.league and t1.rank == t2.rank
-                )
-                teams_adj_rank_dif_league = (
-                    t1.league != t2.league and abs(ord(t1.rank) - ord(t2.rank)) <= 1
-                )
-                at_least_one_mixed_team = t1.league == "Mixed" or t2.league == "Mixed"
-                teams_share_players = teams_different and (
-                    teams_adj_rank_same_league or (teams_same_rank_dif_league)
-                )
-                if teams_share_players:
-                    for d in self.league.dates.dates:
-                        fcs_list = (
-                            self.league.get_fixture_court_slots_for_teams_on_date(
-                                [t1, t2], d
-                            )
-                        )
-                        if len(fcs_list) > 0:
-                            self.model.Add(
-                                sum(
-                                    self.selected_fixture[fcs.identifier]
-                                    for fcs in fcs_list
-                                )
-                                <= 1
-                            )
+        """For teams that share players their matches shouldn't be scheduled on the same day.
+
+        Uses the maximal cliques of the league's team conflict graph, adding one at most one
+        constraint per clique per date over the fixture slots of all the clique's teams on that
+        date.
+        """
+        _team_slots_by_date = defaultdict(lambda: defaultdict(list))
+        for fs in self.fixture_slots:
+            _date = fs.court_slot.date
+            _team_slots_by_date[fs.fixture.home_team][_date].append(fs)
+            _team_slots_by_date[fs.fixture.away_team][_date].append(fs)
+
+        for _clique in self.league.get_team_conflict_graph().get_maximal_cliques():
+            _clique_slots_by_date = defaultdict(dict)
+            for t in _clique:
+                for _date, _fixture_slots in _team_slots_by_date[t].items():
+                    for fs in _fixture_slots:
+                        _clique_slots_by_date[_date][fs.identifier] = fs
+            for _fixture_slots in _clique_slots_by_date.values():
+                if len(_fixture_slots) > 1:
+                    self.model.AddAtMostOne(
+                        self.selected_fixture[_identifier] for _identifier in _fixture_slots
+                    )
 
     def create_constraint_fixture_correct_week(self, num_allowed_incorrect=10):
         incorrect_week_fixture_slots = []
-        for _fixture_slot in self.league.get_fixture_court_slots():
+        for _fixture_slot in self.fixture_slots:
             if not _fixture_slot.is_correct_week():
                 incorrect_week_fixture_slots.append(_fixture_slot)
 
@@ -277,8 +699,8 @@ class Schedule:
     ):
         _rules_added = 0
         for fcs1, fcs2 in itertools.combinations(fixture_list, 2):
-            date_diff = fcs1.court_slot.date.date - fcs2.court_slot.date.date
-            if abs(date_diff.days) // 7 <= weeks_separated:
+            _days_apart = abs(fcs1.court_slot.date.day_offset - fcs2.court_slot.date.day_offset)
+            if _days_apart // 7 <= weeks_separated:
                 if fcs1.fixture != fcs2.fixture:
                     # print("\t", fcs1, fcs2)
                     self.model.Add(
@@ -293,69 +715,105 @@ class Schedule:
                     _rules_added += 1
         # print("Rules Added:", _rules_added)
 
-    def input_predefined_fixtures(self, _fixture_sheet_url):
-        predefined_fixtures = pd.DataFrame(
+    def _get_published_fixtures(self, _file_location) -> pd.DataFrame:
+        _fixture_slots = pd.DataFrame(
+            get_gsheet_data(_file_location, "Match Fixture slots").get_all_records()
+        )
+        if "is_scheduled" not in _fixture_slots:
+            return _fixture_slots
+        return _fixture_slots[_fixture_slots["is_scheduled"] == 1]
+
+    def _get_predefined_fixtures(self, _fixture_sheet_url) -> pd.DataFrame:
+        return pd.DataFrame(
             get_gsheet_data(_fixture_sheet_url, "Sheet1").get_all_records()
         )
-        _headings = [
-            "Division",
-            "Home Team",
-            "Away Team",
-            "Status",
-            "Match Date",
-            "Time",
-            "Courts",
-        ]
-        _unfixed_fixtures = self.league.get_fixture_court_slots()
+
+    def get_fixture_slot_index(self) -> pd.DataFrame:
+        """Return a table of the model's fixture slots keyed by home team, away team and date.
+
+        :return: DataFrame with columns Home Team, Away Team, Date and Position, the position of
+            the slot in fixture_slots
+        """
+        return pd.DataFrame(
+            {
+                "Home Team": [fs.fixture.home_team.name for fs in self.fixture_slots],
+                "Away Team": [fs.fixture.away_team.name for fs in self.fixture_slots],
+                "Date": pd.to_datetime([fs.court_slot.date.date for fs in self.fixture_slots]),
+                "Position": np.arange(len(self.fixture_slots)),
+            }
+        )
+
+    def input_predefined_fixtures(self, predefined_fixtures: pd.DataFrame):
+        """Fix the predefined fixtures to their dates and leave no other fixture before today.
+
+        The predefined fixtures are joined to the fixture slot index on home team, away team and
+        date. Each predefined fixture with slots in the model is scheduled in one of them, and
+        every other slot up to today is left empty.
+
+        :param predefined_fixtures: Table of already commited match dates
+        :raises ValueError: listing every row whose teams or date are not in the league
+        """
         if len(predefined_fixtures) == 0:
             return
 
-        for index, row in predefined_fixtures[_headings].iterrows():
-            _home_team = self.league.get_team_obj_from_str(
-                self._fix_team_name(row["Home Team"])
+        _predefined = pd.DataFrame(
+            {
+                "Row": np.arange(len(predefined_fixtures)),
+                "Home Team": self._fix_team_names(predefined_fixtures["Home Team"]),
+                "Away Team": self._fix_team_names(predefined_fixtures["Away Team"]),
+                "Date": pd.to_datetime(
+                    predefined_fixtures["Match Date"], format="%d/%m/%Y", errors="coerce"
+                ).to_numpy(),
+            }
+        )
+        _team_names = pd.Series([t.name for t in self.league.get_teams()])
+        _dates = pd.Series(pd.to_datetime([d.date for d in self.league.dates.dates]))
+        _is_unknown = (
+            ~_predefined["Home Team"].isin(_team_names)
+            | ~_predefined["Away Team"].isin(_team_names)
+            | ~_predefined["Date"].isin(_dates)
+        )
+        if _is_unknown.any():
+            raise ValueError(
+                "Predefined fixtures not in the league:\n"
+                + predefined_fixtures[_is_unknown.to_numpy()].to_string(index=False)
             )
-            _away_team = self.league.get_team_obj_from_str(
-                self._fix_team_name(row["Away Team"])
+
+        _slot_index = self.get_fixture_slot_index()
+        _matched = _predefined.merge(_slot_index, on=["Home Team", "Away Team", "Date"])
+        _fixtures_in_model = pd.Series([f.name for f in self.fixtures])
+        _is_without_slot = (
+            _predefined["Home Team"] + " vs " + _predefined["Away Team"]
+        ).isin(_fixtures_in_model) & ~_predefined["Row"].isin(_matched["Row"])
+        if _is_without_slot.any():
+            print(
+                "Predefined fixtures with no slot on their date:\n"
+                + predefined_fixtures[_is_without_slot.to_numpy()].to_string(index=False)
             )
-            _date = self.league.get_date_obj_from_str(row["Match Date"])
 
-            _fixture_slots = self.league.get_specific_fixture_court_slot(
-                _home_team, _away_team, _date
+        for _, _positions in _matched.groupby("Row")["Position"]:
+            self.model.Add(
+                sum(self._get_model_vars([self.fixture_slots[p] for p in _positions])) == 1
             )
-            for fs in _fixture_slots:
-                _unfixed_fixtures.remove(fs)
-
-            if _fixture_slots:
-                self.model.Add(
-                    sum(
-                        self.selected_fixture[_fixture_slot.identifier]
-                        for _fixture_slot in _fixture_slots
-                    )
-                    == 1
-                )
 
-        _next_week = datetime.today() + timedelta(days=0)
+        _is_unfixed_before_today = ~_slot_index["Position"].isin(_matched["Position"]) & (
+            _slot_index["Date"] <= datetime.today()
+        )
         _unfixed_fixtures_before_date = [
-            i for i in _unfixed_fixtures if i.court_slot.date.date <= _next_week
+            self.fixture_slots[p] for p in np.flatnonzero(_is_unfixed_before_today.to_numpy())
         ]
-
         if _unfixed_fixtures_before_date:
-            self.model.Add(
-                sum(
-                    self.selected_fixture[_fixture_slot.identifier]
-                    for _fixture_slot in _unfixed_fixtures_before_date
-                )
-                == 0
-            )
+            self.model.Add(sum(self._get_model_vars(_unfixed_fixtures_before_date)) == 0)
 
-    def _fix_team_name(self, _team_name_str):
-        if re.fullmatch(r".* [A-G]", _team_name_str):
-            return _team_name_str
-        return _team_name_str + " A"
+    @staticmethod
+    def _fix_team_names(_team_names: pd.Series) -> pd.Series:
+        """Add the A team rank to the team names given without one."""
+        _team_names = _team_names.astype(str)
+        return _team_names.where(_team_names.str.fullmatch(r".* [A-G]"), _team_names + " A")
 
     def create_objective_fixture_correct_week(self):
         correct_week_fixture_slots = []
-        for _fixture_slot in self.league.get_fixture_court_slots():
+        for _fixture_slot in self.fixture_slots:
             if _fixture_slot.is_correct_week():
                 correct_week_fixture_slots.append(_fixture_slot)
 
@@ -370,86 +828,268 @@ class Schedule:
         self.model.Maximize(
             sum(
                 self.selected_fixture[_fixture_slot.identifier]
-                for _fixture_slot in self.league.get_fixture_court_slots()
+                for _fixture_slot in self.fixture_slots
             )
         )
 
-    def run_model(self, allowed_run_time=200) -> str:
+    def create_objective_minimise_moved_fixtures(self):
+        """Maximise the fixtures scheduled, then the published fixtures kept on their dates.
+
+        Each scheduled fixture is worth more than keeping every published fixture on its date, so
+        moving fixtures never costs a fixture being scheduled.
         """
-        Runs the model generated by the schedule.
+        _kept_fixture_slots = [fs for fs in self.fixture_slots if self._is_on_published_date(fs)]
+        _fixture_weight = len(_kept_fixture_slots) + 1
+        self.model.Maximize(
+            _fixture_weight * sum(self._get_model_vars(self.fixture_slots))
+            + sum(self._get_model_vars(_kept_fixture_slots))
+        )
+
+    def _is_on_published_date(self, _fixture_slot: FixtureCourtSlot) -> bool:
+        _published_slot = self.published_fixture_slots.get(_fixture_slot.fixture)
+        return (
+            _published_slot is not None
+            and _published_slot.court_slot.date is _fixture_slot.court_slot.date
+        )
+
+    def get_moved_fixtures(self) -> List[Fixture]:
+        """Return the published fixtures in the model not scheduled on their published date."""
+        _kept = {
+            fs.fixture
+            for fs in self.fixture_slots
+            if fs.is_scheduled and self._is_on_published_date(fs)
+        }
+        return [f for f in self.fixtures if f in self.published_fixture_slots and f not in _kept]
+
+    def run_model(
+        self,
+        allowed_run_time=200,
+        solution_sinks: List[SolutionSink] = None,
+        stop_rules: List[StopRule] = None,
+    ) -> str:
+        """
+        Runs the model generated by the schedule, solving it with the schedule's solve mode.
+
+        Each improving solution is passed as a snapshot to the solution sinks and the search is
+        stopped early as soon as any of the stop rules is met.
 
         :param allowed_run_time: How long in seconds the model can run for
+        :param solution_sinks: Callables given a snapshot of each improving solution
+        :param stop_rules: Rules that stop the search before allowed_run_time
         :return: If the model was successful, INFEASIBLE
         """
+        print("Started Model Run")
+        status_name, _values, objective_value = SOLVE_MODES[self.options.solve_mode](
+            self, allowed_run_time, solution_sinks, stop_rules, **self.options.mode_options
+        )
+        print("Status:")
+        print(status_name)
+        print("Objective Value: ", objective_value)
+        self.solver_status = status_name
+        if _values is not None:
+            self.solution_values = _values
+            self.objective_value = objective_value
+            status_name = self._run_stage(
+                "apply_results", self._apply_solution, self.solution_values, status_name
+            )
+            # Print Results
+            self._write_results()
 
-        # Amends the OnSolution Callback Function in the solution class of the model
-        class SolutionCallback(cp_model.CpSolverSolutionCallback):
-            def __init__(self):
-                cp_model.CpSolverSolutionCallback.__init__(self)
+        return status_name
 
-            def OnSolutionCallback(self):
-                print("Objective Value: ", self.ObjectiveValue())
-                print("Objective Bound: ", self.BestObjectiveBound())
-                print("Timestamp: ", self.UserTime())
-                print()
-                return True
+    def solve_monolithic(
+        self,
+        allowed_run_time=200,
+        solution_sinks: List[SolutionSink] = None,
+        stop_rules: List[StopRule] = None,
+    ) -> Tuple[str, Optional[np.ndarray], Optional[float]]:
+        """Solve the whole model in this process.
 
-        # Creates the solver and solve.
-        print("Started Model Run")
+        :param allowed_run_time: How long in seconds the model can run for
+        :param solution_sinks: Callables given a snapshot of each improving solution
+        :param stop_rules: Rules that stop the search before allowed_run_time
+        :return: The status, the solution values aligned with fixture_slots or None if there is
+            no solution, and the objective value
+        """
         solver = cp_model.CpSolver()
         solver.parameters.max_time_in_seconds = allowed_run_time
-        sc = SolutionCallback()
-        status_num = solver.SolveWithSolutionCallback(self.model, sc)
+        _log_lines = []
+        if self.detailed_report and hasattr(solver, "log_callback"):
+            # Keep the search log to read the presolve time from, without printing it.
+            solver.parameters.log_search_progress = True
+            solver.parameters.log_to_stdout = False
+            solver.log_callback = _log_lines.append
+        sc = StreamingSolutionCallback(
+            [self.selected_fixture[fs.identifier] for fs in self.fixture_slots],
+            sinks=solution_sinks,
+            stop_rules=stop_rules,
+        )
+        status_num = self._run_stage("solve", solver.SolveWithSolutionCallback, self.model, sc)
+        sc.finish()
 
         status_name = solver.StatusName(status_num)
-        print("Status:")
-        print(status_name)
-        objective_value = solver.ObjectiveValue()
-        print("Objective Value: ", objective_value)
-        if status_name in ["FEASIBLE", "OPTIMAL"]:
-            for fixture in self.league.fixtures:
-                fixture_has_been_scheduled = False
-                for fixture_slot in fixture.fixture_court_slots:
-                    is_scheduled = solver.Value(
-                        self.selected_fixture[fixture_slot.identifier]
-                    )
-                    fixture_slot.is_scheduled = is_scheduled
-                    if is_scheduled:
-                        fixture_has_been_scheduled = True
-                        print(fixture_slot.friendly_name)
-                if fixture_has_been_scheduled is not True:
-                    print(f"Fixture not Scheduled {fixture_slot.friendly_name}")
-                    status_name = "INFEASIBLE"
-                    print(f"Status Update: {status_name}")
-
-            # for _fixture_slot in self.league.get_fixture_court_slots():
-            #     _is_scheduled = solver.Value(self.selected_fixture[_fixture_slot.identifier])
-            #     _fixture_slot.is_scheduled = _is_scheduled
-            #     if _is_scheduled:
-            #         print(_fixture_slot.friendly_name, _is_scheduled)
-            # Print Results
-            self._write_schedule_to_gsheet(self.league.league_management_URL)
+        self.report.solver = SolverReport(
+            status=status_name,
+            wall_time=solver.WallTime(),
+            user_time=solver.UserTime(),
+            deterministic_time=solver.ResponseProto().deterministic_time,
+            num_conflicts=solver.NumConflicts(),
+            num_branches=solver.NumBranches(),
+            num_solutions=sc.solution_count,
+            first_solution_time=sc.first_solution_time,
+            presolve_time=get_presolve_time(_log_lines),
+            objective=solver.ObjectiveValue() if sc.solution_count else None,
+            best_bound=solver.BestObjectiveBound(),
+        )
+        if status_name not in ["FEASIBLE", "OPTIMAL"]:
+            return status_name, None, None
+        _values = self._run_stage("extract_results", self.get_solution_values, solver)
+        return status_name, _values, solver.ObjectiveValue()
+
+    def get_solution_values(self, solver: cp_model.CpSolver) -> np.ndarray:
+        """Return the value of every fixture slot variable in one bulk read of the solver response.
+
+        :param solver: Solver that has found a solution to the model
+        :return: Array of 0/1 values aligned with fixture_slots
+        """
+        _solution = np.asarray(solver.ResponseProto().solution, dtype=int)
+        return _solution[self.fixture_slot_var_indices]
+
+    def get_objective_value(self, _values: np.ndarray) -> float:
+        """Return the model's objective for solution values aligned with fixture_slots.
+
+        Every objective only references fixture slot variables.
+
+        :param _values: Array of 0/1 values aligned with fixture_slots
+        """
+        _proto = self.model.Proto()
+        _var_values = np.zeros(len(_proto.variables), dtype=int)
+        _var_values[self.fixture_slot_var_indices] = _values
+        # A negative reference is minus the variable at -reference - 1.
+        _references = np.asarray(_proto.objective.vars, dtype=int)
+        _term_values = _var_values[np.where(_references >= 0, _references, -_references - 1)]
+        _term_values = np.where(_references >= 0, _term_values, -_term_values)
+        _value = float(np.dot(_proto.objective.coeffs, _term_values)) + _proto.objective.offset
+        return _value * (_proto.objective.scaling_factor or 1)
+
+    def _apply_solution(self, _values: np.ndarray, status_name: str) -> str:
+        """Write the solution values back to the fixture slots and check every fixture is scheduled.
+
+        Scheduled slots are logged at debug level and unscheduled fixtures printed.
+
+        :param _values: Array of 0/1 values aligned with fixture_slots
+        :param status_name: Status returned by the solver
+        :return: The status, INFEASIBLE if any fixture has not been scheduled
+        """
+        # Slots outside the model, e.g. those of a previous solve before a reschedule, are cleared.
+        for _fixture_slot in self.league.get_fixture_court_slots():
+            _fixture_slot.is_scheduled = 0
+        for _fixture_slot, _is_scheduled in zip(self.fixture_slots, _values.tolist()):
+            _fixture_slot.is_scheduled = _is_scheduled
+        # Fixtures already played in a reschedule stay where they were published.
+        _fixtures_in_model = set(self.fixtures)
+        for _fixture, _fixture_slot in self.published_fixture_slots.items():
+            if _fixture not in _fixtures_in_model:
+                _fixture_slot.is_scheduled = 1
 
+        _fixture_is_scheduled = (
+            pd.Series(_values)
+            .groupby(self.fixture_slot_fixture_numbers)
+            .max()
+            .reindex(range(len(self.fixtures)), fill_value=0)
+        )
+        _unscheduled = np.flatnonzero(_fixture_is_scheduled.to_numpy() == 0)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            for _position in np.flatnonzero(_values):
+                logger.debug(self.fixture_slots[_position].friendly_name)
+        for _fixture_number in _unscheduled:
+            print(f"Fixture not Scheduled {self.fixtures[_fixture_number].name}")
+
+        print(f"Fixtures Scheduled: {len(self.fixtures) - len(_unscheduled)}/{len(self.fixtures)}")
+        if self.published_fixture_slots:
+            print(f"Published Fixtures Moved: {len(self.get_moved_fixtures())}")
+        if len(_unscheduled) > 0:
+            status_name = "INFEASIBLE"
+            print(f"Status Update: {status_name}")
         return status_name
 
-    def _write_schedule_to_gsheet(self, _file_location):
-        print("***Test.py***")
-        result = [fcs.as_dict() for fcs in self.league.get_fixture_court_slots()]
-        _data_dict = pd.DataFrame(result)
-        write_gsheet_output_data(_data_dict, "Match Fixture slots", _file_location)
-        result = []
-        for t in self.league.get_teams():
-            _get_home = True
-            _get_away = True
-            for fcs in t.get_fixture_court_slots(_get_home, _get_away):
-                fcs_dict = fcs.as_dict()
-                fcs_dict["Team"] = t.name
-                result.append(fcs_dict)
-        _data_dict = pd.DataFrame(result)
-        write_gsheet_output_data(
-            _data_dict, "Match Fixture slots by team", _file_location
+    def _write_results(self):
+        """Write the schedule to the league management sheet, if the league has one."""
+        if self.options.write_results and self.league.league_management_URL:
+            self._run_stage(
+                "write_results",
+                self._write_schedule_to_gsheet,
+                self.league.league_management_URL,
+                write_all_fixture_slots=self.options.write_all_fixture_slots,
+            )
+
+    def _write_schedule_to_gsheet(self, _file_location, write_all_fixture_slots=False):
+        """Write the fixture court slots, and the same slots listed by team, to the spreadsheet.
+
+        :param _file_location: Url of the spreadsheet to write to
+        :param write_all_fixture_slots: Write every candidate fixture slot, not only the scheduled
+        """
+        write_schedule_to_gsheet(
+            self.league.get_fixture_court_slot_table(),
+            _file_location,
+            write_all_fixture_slots,
+            [t.name for t in self.league.get_teams()],
         )
 
 
+def write_schedule_to_gsheet(
+    _slot_table: pd.DataFrame,
+    _file_location,
+    write_all_fixture_slots=False,
+    _team_names: List[str] = None,
+):
+    """Write the fixture court slots to the Match Fixture slots and the slots by team sheets.
+
+    Only the scheduled slots are written unless write_all_fixture_slots is set, when every
+    candidate slot is written as before. The by team sheet is a reshape of the first, with a row
+    for the home team and one for the away team of each slot, in the order of the teams, each
+    team's home slots before its away slots.
+
+    :param _slot_table: Table of the league's fixture court slots, from
+        League.get_fixture_court_slot_table
+    :param _file_location: Url of the spreadsheet to write to
+    :param write_all_fixture_slots: Write every candidate fixture slot, not only the scheduled
+    :param _team_names: Team names in the league's team order, by default the order the teams
+        first appear in the table
+    """
+    if not write_all_fixture_slots:
+        _slot_table = _slot_table[_slot_table["is_scheduled"] == 1]
+    write_gsheet_output_data(_slot_table, "Match Fixture slots", _file_location)
+
+    if _team_names is None:
+        _team_names = pd.unique(pd.concat([_slot_table["Home Team"], _slot_table["Away Team"]]))
+    _team_positions = pd.Series(range(len(_team_names)), index=_team_names)
+    _by_team = pd.concat(
+        [
+            _slot_table.assign(Team=_slot_table["Home Team"], _is_away=False),
+            _slot_table.assign(Team=_slot_table["Away Team"], _is_away=True),
+        ]
+    )
+    _by_team = (
+        _by_team.assign(_team_position=_by_team["Team"].map(_team_positions))
+        .sort_values(by=["_team_position", "_is_away"], kind="stable")
+        .drop(columns=["_team_position", "_is_away"])
+    )
+    write_gsheet_output_data(_by_team, "Match Fixture slots by team", _file_location)
+
+
+# How a built Schedule can be solved, each called with the schedule, the allowed run time, the
+# solution sinks and the stop rules and returning the status, solution values and objective.
+SOLVE_MODES: Dict[str, Callable] = {
+    "monolithic": Schedule.solve_monolithic,
+    "components": solve_components,
+    "two_phase": solve_two_phase,
+    "week_then_court": solve_week_then_court,
+    "lns": solve_lns,
+    "race": solve_race,
+}
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,207 @@
+"""Solution callbacks that stream improving solutions to sinks and stop the search early."""
+
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from ortools.sat.python import cp_model
+from ortools.sat.python.cp_model import IntVar
+
+logger = logging.getLogger(__name__)
+
+SolutionSnapshot = Dict[str, Any]
+SolutionSink = Callable[[SolutionSnapshot], None]
+
+
+class FileSolutionSink:
+    """Append each solution snapshot to a file as a line of JSON."""
+
+    def __init__(self, _file_location):
+        """Create the sink, truncating any snapshots left from a previous run."""
+        self.file_location = Path(_file_location)
+        self.file_location.write_text("")
+
+    def __call__(self, _snapshot: SolutionSnapshot) -> None:
+        """Write the snapshot to the end of the file."""
+        with self.file_location.open("a") as f:
+            f.write(json.dumps(_snapshot) + "\n")
+
+
+class QueueSolutionSink:
+    """Put each solution snapshot on a queue, e.g. for another thread or process to consume."""
+
+    def __init__(self, _queue):
+        """Create the sink for the given queue.Queue or multiprocessing.Queue."""
+        self.queue = _queue
+
+    def __call__(self, _snapshot: SolutionSnapshot) -> None:
+        """Put the snapshot on the queue without blocking the solver."""
+        self.queue.put_nowait(_snapshot)
+
+
+class StopRule:
+    """A rule deciding when the search can stop before the allowed run time is used up."""
+
+    def start(self, _callback: "StreamingSolutionCallback") -> None:
+        """Prepare the rule before the solve starts."""
+
+    def on_solution(self, _callback: "StreamingSolutionCallback") -> bool:
+        """Return true if the search should stop after the latest solution."""
+        return False
+
+    def finish(self) -> None:
+        """Release anything held by the rule once the solve has finished."""
+
+
+class RelativeGapStop(StopRule):
+    """Stop once the gap between the objective and its bound is a small enough fraction of it."""
+
+    def __init__(self, relative_gap: float):
+        """Create the rule, e.g. relative_gap=0.01 stops within 1% of the best bound."""
+        self.relative_gap = relative_gap
+
+    def on_solution(self, _callback: "StreamingSolutionCallback") -> bool:
+        """Return true if the latest solution is within the relative gap of the bound."""
+        _objective = _callback.ObjectiveValue()
+        _gap = abs(_callback.BestObjectiveBound() - _objective)
+        return _gap <= self.relative_gap * max(1.0, abs(_objective))
+
+    def __repr__(self):
+        """Return the rule description."""
+        return f"RelativeGapStop({self.relative_gap})"
+
+
+class TargetObjectiveStop(StopRule):
+    """Stop once a solution reaches the target objective value."""
+
+    def __init__(self, target_objective: float, maximise: bool = True):
+        """Create the rule for a maximised, or if maximise is False minimised, objective."""
+        self.target_objective = target_objective
+        self.maximise = maximise
+
+    def on_solution(self, _callback: "StreamingSolutionCallback") -> bool:
+        """Return true if the latest solution meets the target objective."""
+        if self.maximise:
+            return _callback.ObjectiveValue() >= self.target_objective
+        return _callback.ObjectiveValue() <= self.target_objective
+
+    def __repr__(self):
+        """Return the rule description."""
+        return f"TargetObjectiveStop({self.target_objective})"
+
+
+class NoImprovementStop(StopRule):
+    """Stop if no improving solution has been found for a number of seconds.
+
+    The solver only calls back when it finds a solution, so a timer thread is restarted on each
+    solution and stops the search if it expires first. The timer is only armed once the first
+    solution has been found.
+    """
+
+    def __init__(self, seconds: float):
+        """Create the rule for the given number of seconds without improvement."""
+        self.seconds = seconds
+        self._timer: Optional[threading.Timer] = None
+
+    def on_solution(self, _callback: "StreamingSolutionCallback") -> bool:
+        """Restart the timer from the latest solution."""
+        self.finish()
+        self._timer = threading.Timer(self.seconds, _callback.stop, args=(repr(self),))
+        self._timer.daemon = True
+        self._timer.start()
+        return False
+
+    def finish(self) -> None:
+        """Cancel the running timer."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def __repr__(self):
+        """Return the rule description."""
+        return f"NoImprovementStop({self.seconds})"
+
+
+class StreamingSolutionCallback(cp_model.CpSolverSolutionCallback):
+    """Solution callback streaming each improving solution to sinks and applying stop rules.
+
+    Each snapshot holds the objective, bound, wall time and the positions of the selected
+    variables in the given variable list, which is kept aligned with the schedule's fixture slots.
+    """
+
+    def __init__(
+        self,
+        variables: List[IntVar],
+        sinks: Optional[List[SolutionSink]] = None,
+        stop_rules: Optional[List[StopRule]] = None,
+    ):
+        """Create the callback.
+
+        :param variables: Boolean model variables in the order positions are reported in
+        :param sinks: Callables each given every solution snapshot
+        :param stop_rules: Rules that can stop the search before the time limit
+        """
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.variable_indices = [v.Index() for v in variables]
+        self.sinks = sinks or []
+        self.stop_rules = stop_rules or []
+        self.solution_count = 0
+        self.first_solution_time: Optional[float] = None
+        self.stop_reason: Optional[str] = None
+        self._lock = threading.Lock()
+        for _rule in self.stop_rules:
+            _rule.start(self)
+
+    def OnSolutionCallback(self):  # noqa: N802
+        """Log the solution, pass a snapshot to each sink and check the stop rules."""
+        self.solution_count += 1
+        if self.first_solution_time is None:
+            self.first_solution_time = self.WallTime()
+        logger.info(
+            "Solution %d: objective %s, bound %s, user time %.2fs",
+            self.solution_count,
+            self.ObjectiveValue(),
+            self.BestObjectiveBound(),
+            self.UserTime(),
+        )
+
+        if self.sinks:
+            _snapshot = self.snapshot()
+            for _sink in self.sinks:
+                _sink(_snapshot)
+
+        for _rule in self.stop_rules:
+            if _rule.on_solution(self):
+                self.stop(repr(_rule))
+                break
+        return True
+
+    def snapshot(self) -> SolutionSnapshot:
+        """Return a compact snapshot of the current solution."""
+        _solution = self.Response().solution
+        return {
+            "solution_number": self.solution_count,
+            "objective": self.ObjectiveValue(),
+            "bound": self.BestObjectiveBound(),
+            "wall_time": self.WallTime(),
+            "selected": [
+                _position
+                for _position, _index in enumerate(self.variable_indices)
+                if _solution[_index]
+            ],
+        }
+
+    def stop(self, _reason: str) -> None:
+        """Stop the search, recording the rule that asked for it."""
+        with self._lock:
+            if self.stop_reason is None:
+                self.stop_reason = _reason
+                print(f"Stopping search: {_reason}")
+                self.StopSearch()
+
+    def finish(self) -> None:
+        """Release the stop rules once the solve has finished."""
+        for _rule in self.stop_rules:
+            _rule.finish()
@@ -0,0 +1,90 @@
+"""Solve serialised CP models in a pool of worker processes.
+
+Models are passed to the workers as serialised CpModelProto bytes, so anything that can build a
+model in the parent process can have it solved in parallel without pickling the league.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from ortools.sat.python import cp_model
+
+SolveResult = Dict[str, Any]
+
+
+def solve_model_proto(
+    model_proto: bytes,
+    allowed_run_time: float,
+    num_search_workers: int = 0,
+    parameters: Optional[Dict[str, Any]] = None,
+    fixed_values: Optional[Dict[int, int]] = None,
+    hint_values: Optional[Dict[int, int]] = None,
+) -> SolveResult:
+    """Solve a serialised model and return the result as plain data.
+
+    :param model_proto: serialised CpModelProto
+    :param allowed_run_time: seconds the solver is allowed
+    :param num_search_workers: solver threads, 0 to let the solver choose
+    :param parameters: further CpSolver parameters set by name
+    :param fixed_values: values to fix variables to, by proto index
+    :param hint_values: values to hint variables with by proto index, replacing any in the model
+    :return: dict of status, objective, best_bound, the solver statistics and solution, the value
+        of every model variable by proto index or None if no solution was found
+    """
+    _model = cp_model.CpModel()
+    _model.Proto().ParseFromString(model_proto)
+    for _index, _value in (fixed_values or {}).items():
+        _model.Proto().variables[_index].domain[:] = [_value, _value]
+    if hint_values is not None:
+        _model.Proto().solution_hint.Clear()
+        _model.Proto().solution_hint.vars.extend(hint_values.keys())
+        _model.Proto().solution_hint.values.extend(hint_values.values())
+    _solver = cp_model.CpSolver()
+    _solver.parameters.max_time_in_seconds = allowed_run_time
+    _solver.parameters.num_search_workers = num_search_workers
+    for _name, _value in (parameters or {}).items():
+        setattr(_solver.parameters, _name, _value)
+    _status_name = _solver.StatusName(_solver.Solve(_model))
+    _has_solution = _status_name in ["FEASIBLE", "OPTIMAL"]
+    return {
+        "status": _status_name,
+        "objective": _solver.ObjectiveValue() if _has_solution else None,
+        "best_bound": _solver.BestObjectiveBound(),
+        "wall_time": _solver.WallTime(),
+        "user_time": _solver.UserTime(),
+        "deterministic_time": _solver.ResponseProto().deterministic_time,
+        "num_conflicts": _solver.NumConflicts(),
+        "num_branches": _solver.NumBranches(),
+        "solution": list(_solver.ResponseProto().solution) if _has_solution else None,
+    }
+
+
+def solve_model_protos(
+    model_protos: List[bytes], allowed_run_time: float, max_workers: Optional[int] = None
+) -> List[SolveResult]:
+    """Solve several serialised models in parallel processes.
+
+    The CPU cores are shared out between the processes as solver threads.
+
+    :param model_protos: serialised CpModelProtos
+    :param allowed_run_time: seconds each solver is allowed
+    :param max_workers: maximum number of processes, defaults to the number of CPU cores
+    :return: results of solve_model_proto in the order of the models
+    """
+    if not model_protos:
+        return []
+    _cpu_count = os.cpu_count() or 1
+    _num_processes = min(len(model_protos), max_workers or _cpu_count)
+    _threads = max(1, _cpu_count // _num_processes)
+    if _num_processes == 1:
+        return [solve_model_proto(p, allowed_run_time, _threads) for p in model_protos]
+    with ProcessPoolExecutor(max_workers=_num_processes) as executor:
+        return list(
+            executor.map(
+                solve_model_proto,
+                model_protos,
+                [allowed_run_time] * len(model_protos),
+                [_threads] * len(model_protos),
+            )
+        )
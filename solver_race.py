@@ -0,0 +1,252 @@
+"""Race differently configured solvers on the same Schedule model.
+
+The solve time of the league model depends a lot on the solver's seed and search parameters, so
+the race solves the serialised model in several processes at once, each with a different
+configuration from RACE_CONFIGURATIONS. The first proven result, optimal or infeasible, wins and
+the other processes are terminated. Otherwise the best solution found by the deadline wins.
+
+The winner of each race is recorded in a JSON history file under the league's content hash, and
+later races of the same league start the configurations that have won most often on it first, so
+when there are more configurations than processes the ones that do well on the league are kept.
+The history file is kept in the schedule's model cache directory unless another is given.
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from decomposition import SolveOutcome
+from model_cache import league_content_hash
+from schedule_report import SolverReport
+from solver_pool import SolveResult, solve_model_proto
+
+if TYPE_CHECKING:
+    from scheduling import Schedule
+
+# CpSolver parameters of each configuration, set by name.
+RACE_CONFIGURATIONS: Dict[str, Dict[str, Any]] = {
+    "default": {},
+    "seed_1": {"random_seed": 1, "randomize_search": True},
+    "seed_2": {"random_seed": 2, "randomize_search": True},
+    "linearization_2": {"linearization_level": 2},
+    "core": {"optimize_with_core": True},
+    "no_linearization": {"linearization_level": 0, "random_seed": 3},
+}
+RACE_HISTORY_FILE = "solver_race_history.json"
+
+# A proven result cannot be improved on by another configuration.
+_FINAL_STATUSES = ["OPTIMAL", "INFEASIBLE", "MODEL_INVALID"]
+
+
+def _read_history_file(history_file: str) -> Dict[str, Dict[str, Dict[str, float]]]:
+    _path = Path(history_file)
+    if not _path.exists():
+        return {}
+    return json.loads(_path.read_text())
+
+
+def read_race_history(history_file: str, league_hash: str) -> Dict[str, Dict[str, float]]:
+    """Return the races and wins of each configuration on a league, empty if there are none.
+
+    :param history_file: JSON file written by record_race_winner
+    :param league_hash: content hash of the league, from league_content_hash
+    :return: dict of races, wins and total winning time in seconds by configuration name
+    """
+    return _read_history_file(history_file).get(league_hash, {})
+
+
+def record_race_winner(
+    _configurations: List[str],
+    _winner: str,
+    _wall_time: float,
+    history_file: str,
+    league_hash: str,
+):
+    """Add a race of a league to the history file, with a race for each configuration raced."""
+    _history = _read_history_file(history_file)
+    _league_history = _history.setdefault(league_hash, {})
+    for _name in _configurations:
+        _entry = _league_history.setdefault(_name, {"races": 0, "wins": 0, "win_time": 0.0})
+        _entry["races"] += 1
+        if _name == _winner:
+            _entry["wins"] += 1
+            _entry["win_time"] += _wall_time
+    Path(history_file).write_text(json.dumps(_history, indent=2))
+
+
+def get_race_order(
+    configurations: Dict[str, Dict[str, Any]], history: Dict[str, Dict[str, float]]
+) -> List[str]:
+    """Return the configuration names, most wins first then in their given order."""
+    _names = list(configurations)
+    return sorted(_names, key=lambda _name: -history.get(_name, {}).get("wins", 0))
+
+
+def _race_worker(
+    _results: multiprocessing.Queue,
+    _name: str,
+    _model_proto: bytes,
+    _allowed_run_time: float,
+    _threads: int,
+    _parameters: Dict[str, Any],
+):
+    """Solve the model with one configuration and put the name and result on the queue."""
+    _results.put((_name, solve_model_proto(_model_proto, _allowed_run_time, _threads, _parameters)))
+
+
+def _is_better(_result: SolveResult, _best: Optional[SolveResult]) -> bool:
+    """Return true if the result has a solution with a higher objective than the best so far."""
+    if _result["solution"] is None:
+        return False
+    return _best is None or _best["solution"] is None or _result["objective"] > _best["objective"]
+
+
+def run_race(
+    model_proto: bytes,
+    allowed_run_time: float,
+    configurations: Dict[str, Dict[str, Any]],
+    num_racers: int,
+    grace_time: float = 5.0,
+) -> Tuple[Optional[str], Optional[SolveResult], List[SolveResult]]:
+    """Solve a serialised model with several configurations at once and keep the winner.
+
+    Each process is allowed allowed_run_time, so one that has not proven its result returns its
+    best solution at the time limit. Processes still running grace_time after that are
+    terminated along with the rest once there is a winner.
+
+    :param model_proto: serialised CpModelProto of a maximisation
+    :param allowed_run_time: seconds each solver is allowed
+    :param configurations: CpSolver parameters by configuration name, raced in the given order
+    :param num_racers: number of configurations raced, each in its own process
+    :return: the winning configuration name and result, None if no process returned, and the
+        results of every process that returned
+    """
+    _names = list(configurations)[:num_racers]
+    _threads = max(1, (os.cpu_count() or 1) // len(_names))
+    _context = multiprocessing.get_context()
+    _queue = _context.Queue()
+    _processes = [
+        _context.Process(
+            target=_race_worker,
+            args=(_queue, _name, model_proto, allowed_run_time, _threads, configurations[_name]),
+            daemon=True,
+        )
+        for _name in _names
+    ]
+    for _process in _processes:
+        _process.start()
+
+    _deadline = time.perf_counter() + allowed_run_time + grace_time
+    _winner, _best, _results = None, None, []
+    try:
+        while len(_results) < len(_processes):
+            try:
+                _name, _result = _queue.get(timeout=max(0.0, _deadline - time.perf_counter()))
+            except queue.Empty:
+                break
+            _results.append(_result)
+            print(f"Race {_name}: {_result['status']} {_result['objective']}")
+            if _result["status"] in _FINAL_STATUSES:
+                _winner, _best = _name, _result
+                break
+            if _best is None or _is_better(_result, _best):
+                _winner, _best = _name, _result
+    finally:
+        for _process in _processes:
+            if _process.is_alive():
+                _process.terminate()
+        for _process in _processes:
+            _process.join()
+    return _winner, _best, _results
+
+
+def solve_race(
+    schedule: "Schedule",
+    allowed_run_time: float,
+    solution_sinks=None,
+    stop_rules=None,
+    num_racers: int = None,
+    configurations: Dict[str, Dict[str, Any]] = None,
+    history_file: Optional[str] = None,
+    grace_time: float = 5.0,
+) -> SolveOutcome:
+    """Solve the schedule by racing solver configurations, see run_race.
+
+    Solution sinks and stop rules are only used by a single model solve, so are not used here.
+
+    :param schedule: built schedule to solve
+    :param allowed_run_time: seconds each solver is allowed
+    :param num_racers: number of configurations raced, defaults to the schedule's max_workers or
+        the number of CPU cores, at least two
+    :param configurations: CpSolver parameters by configuration name, RACE_CONFIGURATIONS if None
+    :param history_file: JSON file of past winners to order and record the race by, defaults to
+        RACE_HISTORY_FILE in the schedule's model cache directory, no history without either
+    :param grace_time: seconds past allowed_run_time to wait for solvers to return
+    :return: status, 0/1 values aligned with fixture_slots or None, and objective value
+    """
+    _configurations = configurations or RACE_CONFIGURATIONS
+    if history_file is None and schedule.model_cache:
+        history_file = str(schedule.model_cache.cache_dir / RACE_HISTORY_FILE)
+    _league_hash = None
+    _history = {}
+    if history_file:
+        # Keyed by the league alone, so a league's history is shared by its parameter variants.
+        _league_hash = league_content_hash(schedule.league, {}, None)
+        _history = read_race_history(history_file, _league_hash)
+    _configurations = {
+        _name: _configurations[_name] for _name in get_race_order(_configurations, _history)
+    }
+    _num_racers = min(
+        len(_configurations),
+        num_racers or schedule.options.max_workers or max(2, os.cpu_count() or 1),
+    )
+
+    _start = time.perf_counter()
+    _winner, _best, _results = schedule._run_stage(
+        "solve",
+        run_race,
+        schedule.model.Proto().SerializeToString(),
+        allowed_run_time,
+        _configurations,
+        _num_racers,
+        grace_time,
+    )
+    _wall_time = time.perf_counter() - _start
+    if _best is None:
+        print("Race: no solver returned by the deadline")
+        return "UNKNOWN", None, None
+    _has_solution = _best["solution"] is not None
+    if _has_solution or _best["status"] in _FINAL_STATUSES:
+        print(f"Race won by {_winner} in {_wall_time:.1f}s")
+        if history_file:
+            record_race_winner(
+                list(_configurations)[:_num_racers],
+                _winner,
+                _wall_time,
+                history_file,
+                _league_hash,
+            )
+    else:
+        print("Race: no configuration found a solution")
+
+    schedule.report.solver = SolverReport(
+        status=_best["status"],
+        wall_time=_wall_time,
+        user_time=sum(r["user_time"] for r in _results),
+        deterministic_time=sum(r["deterministic_time"] for r in _results),
+        num_conflicts=sum(r["num_conflicts"] for r in _results),
+        num_branches=sum(r["num_branches"] for r in _results),
+        num_solutions=sum(r["solution"] is not None for r in _results),
+        objective=_best["objective"],
+        best_bound=_best["best_bound"],
+    )
+    if not _has_solution:
+        return _best["status"], None, None
+    _values = np.asarray(_best["solution"], dtype=int)[schedule.fixture_slot_var_indices]
+    return _best["status"], _values, _best["objective"]
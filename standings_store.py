@@ -0,0 +1,54 @@
+"""Local store of processed match results and each team's running standings.
+
+The store lets league_analysis process only the results added since the last run. It keeps the
+processed results, a row per division and team with the running total, matches played and date
+of the last processed match, and the last processed Match ID.
+"""
+
+import json
+from pathlib import Path
+from typing import Optional, Tuple
+
+import pandas as pd
+
+
+class StandingsStore:
+    """Directory holding the processed match results, the team standings and the last Match ID."""
+
+    def __init__(self, _store_dir="standings"):
+        """Create the store, making the directory if needed."""
+        self.store_dir = Path(_store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    def _results_path(self) -> Path:
+        return self.store_dir / "match_results.parquet"
+
+    def _team_state_path(self) -> Path:
+        return self.store_dir / "team_state.parquet"
+
+    def _meta_path(self) -> Path:
+        return self.store_dir / "meta.json"
+
+    def load(self) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[int]]:
+        """Return the processed results, the team standings and the last processed Match ID.
+
+        :return: all three None if nothing has been stored yet
+        """
+        if not self._meta_path().exists():
+            return None, None, None
+        _meta = json.loads(self._meta_path().read_text())
+        return (
+            pd.read_parquet(self._results_path()),
+            pd.read_parquet(self._team_state_path()),
+            _meta["last_match_id"],
+        )
+
+    def save(self, _results: pd.DataFrame, _team_state: pd.DataFrame, _last_match_id: int):
+        """Store the processed results, the team standings and the last processed Match ID.
+
+        The Match ID is written last so an interrupted save is not mistaken for a complete one.
+        """
+        self._meta_path().unlink(missing_ok=True)
+        _results.to_parquet(self._results_path())
+        _team_state.to_parquet(self._team_state_path())
+        self._meta_path().write_text(json.dumps({"last_match_id": int(_last_match_id)}))
@@ -0,0 +1,146 @@
+"""Generate synthetic leagues without Google Sheets, for benchmarking and experiments.
+
+The generator builds club sheets in the same shape get_club_data downloads them, so synthetic
+leagues go through the same League and Club loading code as real ones.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import pandas as pd
+
+from Class_League import League
+
+LEAGUE_NAMES = ["Mixed", "Open", "Ladies 4"]
+MIXED_GROUP = "Mixed Nights"
+OPEN_LADIES_GROUP = "Open/Ladies Nights"
+
+
+def _get_league_dates(num_dates: int, dates_per_week: int, first_date: datetime) -> pd.DataFrame:
+    """Return the league dates, the first half of each week for Mixed and the rest Open/Ladies."""
+    _dates = []
+    for _number in range(num_dates):
+        _week, _day = divmod(_number, dates_per_week)
+        _date = first_date + timedelta(weeks=_week, days=_day)
+        _dates.append(
+            {
+                "Date": _date.strftime("%d-%b-%Y"),
+                "League Type": "Mixed" if _day < dates_per_week / 2 else "Open/Ladies",
+                "Weekday": _date.strftime("%A"),
+            }
+        )
+    return pd.DataFrame(_dates)
+
+
+def _get_club_data(
+    _club_name: str,
+    _league_dates: pd.DataFrame,
+    teams_per_club: int,
+    max_courts: int,
+    availability_density: float,
+    _random: random.Random,
+) -> Dict[str, pd.DataFrame]:
+    """Return the sheets of one synthetic club entry."""
+    _teams = []
+    for _team_number in range(teams_per_club):
+        _league_name = LEAGUE_NAMES[_team_number % len(LEAGUE_NAMES)]
+        _teams.append(
+            {
+                "League Name": _league_name,
+                "Team Rank": chr(ord("A") + _team_number // len(LEAGUE_NAMES)),
+                "Availability Group": MIXED_GROUP if _league_name == "Mixed" else OPEN_LADIES_GROUP,
+                "Comments": "",
+                "Home Nights Required": "",
+            }
+        )
+
+    _availability = _league_dates.copy()
+    _is_available = [_random.random() < availability_density for _ in range(len(_availability))]
+    _availability["Available"] = [
+        (MIXED_GROUP if _league_type == "Mixed" else OPEN_LADIES_GROUP)
+        if _available
+        else "Unavailable"
+        for _league_type, _available in zip(_availability["League Type"], _is_available)
+    ]
+    _availability["No. Concurrent Matches"] = [
+        str(_random.randint(1, max_courts)) for _ in range(len(_availability))
+    ]
+    return {
+        "Entry URL": None,
+        "0. Club Information": pd.DataFrame({"Club Name": [_club_name]}),
+        "1. Teams Entering": pd.DataFrame(_teams),
+        "2. Availability": _availability,
+    }
+
+
+def _get_previous_league_positions(
+    _club_data: List[Dict[str, pd.DataFrame]], num_divisions: int, _random: random.Random
+) -> pd.DataFrame:
+    """Return the Previous League organisation sheet, splitting each league into divisions."""
+    _rows = []
+    for _data in _club_data:
+        _club_name = _data["0. Club Information"]["Club Name"][0]
+        for _, _team in _data["1. Teams Entering"].iterrows():
+            _rows.append(
+                {
+                    "League": _team["League Name"],
+                    "Club": _club_name,
+                    "Team": _team["Team Rank"],
+                    "Previous League Position": _random.random(),
+                    "Teams Entered": "",
+                }
+            )
+    _positions = pd.DataFrame(_rows)
+    _order = _positions.groupby("League")["Previous League Position"].rank(method="first") - 1
+    _league_size = _positions.groupby("League")["League"].transform("size")
+    _positions["New Division"] = (_order * num_divisions // _league_size).astype(int) + 1
+    return _positions
+
+
+def generate_league(
+    num_clubs: int = 8,
+    teams_per_club: int = 3,
+    num_divisions: int = 1,
+    num_dates: int = 60,
+    dates_per_week: int = 4,
+    max_courts: int = 3,
+    availability_density: float = 0.8,
+    first_date: datetime = datetime(2021, 11, 1),
+    seed: int = 0,
+) -> League:
+    """Generate a synthetic league.
+
+    Teams are spread over the Mixed, Open and Ladies 4 leagues and each league is split into
+    divisions at random. Dates run on consecutive days each week from the first date, the first
+    half of the week for the Mixed league and the rest for the Open and Ladies leagues, so long
+    seasons run past Christmas.
+
+    :param num_clubs: number of clubs entering
+    :param teams_per_club: number of teams each club enters
+    :param num_divisions: number of divisions each league is split into
+    :param num_dates: number of league dates
+    :param dates_per_week: number of league dates in each week
+    :param max_courts: maximum number of concurrent matches a club can host on a date
+    :param availability_density: probability a club is available on a date
+    :param first_date: first league date
+    :param seed: random seed, the same arguments always give the same league
+    :return: the generated League
+    """
+    _random = random.Random(seed)
+    _league_dates = _get_league_dates(num_dates, dates_per_week, first_date)
+    _club_data = [
+        _get_club_data(
+            f"Club {_club_number}",
+            _league_dates,
+            teams_per_club,
+            max_courts,
+            availability_density,
+            _random,
+        )
+        for _club_number in range(num_clubs)
+    ]
+    _previous_league_positions = _get_previous_league_positions(_club_data, num_divisions, _random)
+    _league = League(None, _club_data, _previous_league_positions)
+    _league.name = f"Synthetic {num_clubs} clubs {teams_per_club} teams seed {seed}"
+    return _league
@@ -0,0 +1,430 @@
+"""Solve a Schedule in two stages, first choosing each fixture's week then its date and court.
+
+Stage one is a small model with a variable per fixture, week and week type (correct or incorrect
+for the fixture's league) that the fixture has a slot in. It has the rules that link weeks: one
+fixture a week per team, pair separation and the incorrect week allowance, with the court slot and
+shared players rules relaxed to counts per week. Stage two then places the fixtures of each week
+in that week's slots as independent sub schedules, solved in parallel.
+
+Stage one keeps pairs of fixtures far enough apart for any choice of dates within their weeks, so
+stage two never breaks the pair separation rule across weeks. As the relaxed counts can allow more
+fixtures in a week than fit, the stages are repeated, ruling out the weeks stage two could not
+place a fixture in. Fixtures still unplaced when the rounds run out of time are left to a solve of
+the full model hinted with the placed fixtures.
+"""
+
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, List, Set, Tuple
+
+import numpy as np
+from ortools.sat.python import cp_model
+
+from decomposition import (
+    SolveOutcome,
+    get_combined_status,
+    get_solver_report,
+    solve_sub_schedules,
+)
+from solver_pool import solve_model_proto
+
+if TYPE_CHECKING:
+    from scheduling import Schedule
+
+WeekOption = Tuple[int, int, bool]
+
+
+def get_fixed_fixture_slots(schedule: "Schedule") -> Tuple[Set[int], List[Set[int]]]:
+    """Read the fixture slots the schedule's model fixes from its linear constraints.
+
+    Works from the model proto so it also covers models loaded from the cache.
+
+    :param schedule: built schedule
+    :return: positions in fixture_slots forced to 0, and groups of positions of which exactly one
+        must be scheduled
+    """
+    _positions = {int(i): p for p, i in enumerate(schedule.fixture_slot_var_indices)}
+    _excluded = set()
+    _required = []
+    for _constraint in schedule.model.Proto().constraints:
+        if _constraint.enforcement_literal or _constraint.WhichOneof("constraint") != "linear":
+            continue
+        _linear = _constraint.linear
+        if not all(v in _positions for v in _linear.vars) or min(_linear.coeffs, default=0) <= 0:
+            continue
+        if _linear.domain[-1] <= 0:
+            _excluded.update(_positions[v] for v in _linear.vars)
+        elif list(_linear.domain) == [1, 1] and set(_linear.coeffs) == {1}:
+            _required.append({_positions[v] for v in _linear.vars})
+    return _excluded, _required
+
+
+class WeekModel:
+    """Stage one model, assigning each fixture of a schedule to a week and week type."""
+
+    def __init__(self, schedule: "Schedule"):
+        """Build the week model for a built schedule.
+
+        :param schedule: built schedule whose fixtures are assigned
+        """
+        self.schedule = schedule
+        self.model = cp_model.CpModel()
+        _excluded, self.required_fixture_slots = get_fixed_fixture_slots(schedule)
+
+        # Slot positions of each option, skipping slots the schedule's model forces to 0.
+        self.option_slots: Dict[WeekOption, List[int]] = defaultdict(list)
+        for _position, fs in enumerate(schedule.fixture_slots):
+            if _position not in _excluded:
+                _option = (
+                    int(schedule.fixture_slot_fixture_numbers[_position]),
+                    fs.get_week_number(),
+                    fs.is_correct_week(),
+                )
+                self.option_slots[_option].append(_position)
+
+        self.selected_week: Dict[WeekOption, cp_model.IntVar] = {
+            _option: self.model.NewBoolVar(f"{_option[0]}_{_option[1]}_{_option[2]}")
+            for _option in self.option_slots
+        }
+        self.fixture_options: Dict[int, List[WeekOption]] = defaultdict(list)
+        for _option in self.option_slots:
+            self.fixture_options[_option[0]].append(_option)
+
+        self.create_constraint_one_week_per_fixture()
+        self.create_constraint_one_fixture_per_week_per_team()
+        self.create_constraint_club_week_capacity()
+        self.create_constraint_shared_players_week_capacity()
+        self.create_constraint_fixture_pair_separation(
+            schedule.build_parameters["weeks_separated"]
+        )
+        self.create_constraint_fixture_correct_week(
+            schedule.build_parameters["num_allowed_incorrect_fixture_week"]
+        )
+        self.create_constraint_required_fixture_slots()
+        self.model.Maximize(sum(self.selected_week.values()))
+
+    def _get_fixture(self, _fixture_number: int):
+        return self.schedule.fixtures[_fixture_number]
+
+    def create_constraint_one_week_per_fixture(self):
+        """Each fixture is in at most one week."""
+        for _options in self.fixture_options.values():
+            if len(_options) > 1:
+                self.model.AddAtMostOne(self.selected_week[o] for o in _options)
+
+    def create_constraint_one_fixture_per_week_per_team(self):
+        """Each team plays at most one fixture a week."""
+        _team_week_options = defaultdict(list)
+        for _option in self.option_slots:
+            f = self._get_fixture(_option[0])
+            _team_week_options[(f.home_team, _option[1])].append(_option)
+            _team_week_options[(f.away_team, _option[1])].append(_option)
+        for _options in _team_week_options.values():
+            if len(_options) > 1:
+                self.model.AddAtMostOne(self.selected_week[o] for o in _options)
+
+    def create_constraint_club_week_capacity(self):
+        """Limit a club's fixtures on a week's Mixed or Open/Ladies dates to its slots."""
+        _club_week_options = defaultdict(list)
+        _club_week_court_slots = defaultdict(set)
+        for _option, _positions in self.option_slots.items():
+            _court_slots = [self.schedule.fixture_slots[p].court_slot for p in _positions]
+            _key = (
+                self._get_fixture(_option[0]).home_team.club,
+                _option[1],
+                _court_slots[0].date.league_type,
+            )
+            _club_week_options[_key].append(_option)
+            _club_week_court_slots[_key].update(_court_slots)
+        for _key, _options in _club_week_options.items():
+            if len(_options) > len(_club_week_court_slots[_key]):
+                self.model.Add(
+                    sum(self.selected_week[o] for o in _options)
+                    <= len(_club_week_court_slots[_key])
+                )
+
+    def create_constraint_shared_players_week_capacity(self):
+        """Teams that share players play no more fixtures in a week than the dates they can use."""
+        _team_options = defaultdict(list)
+        for _option in self.option_slots:
+            f = self._get_fixture(_option[0])
+            _team_options[f.home_team].append(_option)
+            _team_options[f.away_team].append(_option)
+
+        for _clique in self.schedule.league.get_team_conflict_graph().get_maximal_cliques():
+            _week_options = defaultdict(set)
+            _week_dates = defaultdict(set)
+            for t in _clique:
+                for _option in _team_options[t]:
+                    _week_options[_option[1]].add(_option)
+                    for _position in self.option_slots[_option]:
+                        _week_dates[_option[1]].add(
+                            self.schedule.fixture_slots[_position].court_slot.date
+                        )
+            for _week, _options in _week_options.items():
+                if len(_options) > len(_week_dates[_week]):
+                    self.model.Add(
+                        sum(self.selected_week[o] for o in _options) <= len(_week_dates[_week])
+                    )
+
+    def create_constraint_fixture_pair_separation(self, weeks_separated: int):
+        """Separate the two fixtures of a pair of teams for any dates chosen in their weeks.
+
+        Mirrors Schedule.create_constraint_fixture_pair_separation, forbidding a pair of options
+        if the closest dates of their slots are too close.
+        """
+        _option_dates = {
+            _option: [self.schedule.fixture_slots[p].court_slot.date.day_offset for p in _positions]
+            for _option, _positions in self.option_slots.items()
+        }
+        _option_ranges = {o: (min(d), max(d)) for o, d in _option_dates.items()}
+
+        _pair_fixtures = defaultdict(list)
+        for _fixture_number in self.fixture_options:
+            f = self._get_fixture(_fixture_number)
+            if (
+                f.home_team.league == f.away_team.league
+                and f.home_team.division == f.away_team.division
+                and f.home_team.club != f.away_team.club
+            ):
+                _pair_fixtures[frozenset((f.home_team, f.away_team))].append(_fixture_number)
+
+        for _fixture_numbers in _pair_fixtures.values():
+            for _i, _first in enumerate(_fixture_numbers):
+                for _second in _fixture_numbers[_i + 1 :]:
+                    for _o1 in self.fixture_options[_first]:
+                        for _o2 in self.fixture_options[_second]:
+                            _start1, _end1 = _option_ranges[_o1]
+                            _start2, _end2 = _option_ranges[_o2]
+                            _gap = max(_start2 - _end1, _start1 - _end2)
+                            if max(_gap, 0) // 7 <= weeks_separated:
+                                self.model.AddBoolOr(
+                                    [self.selected_week[_o1].Not(), self.selected_week[_o2].Not()]
+                                )
+
+    def create_constraint_fixture_correct_week(self, num_allowed_incorrect: int):
+        """At most num_allowed_incorrect fixtures are in a week of the wrong type."""
+        _incorrect = [v for o, v in self.selected_week.items() if not o[2]]
+        if len(_incorrect) > num_allowed_incorrect:
+            self.model.Add(sum(_incorrect) <= num_allowed_incorrect)
+
+    def create_constraint_required_fixture_slots(self):
+        """Fixtures with a predefined slot are in the week of that slot."""
+        for _positions in self.required_fixture_slots:
+            _options = [
+                o for o, _slots in self.option_slots.items() if not _positions.isdisjoint(_slots)
+            ]
+            if _options:
+                self.model.Add(sum(self.selected_week[o] for o in _options) == 1)
+
+    def get_selected_options(self, _solution: List[int]) -> List[WeekOption]:
+        """Return the options selected in a solution given by proto index."""
+        return [o for o, v in self.selected_week.items() if _solution[v.Index()]]
+
+    def fix_option(self, _option: WeekOption, _is_selected: bool):
+        """Fix an option selected or not in later solves."""
+        self.model.Add(self.selected_week[_option] == int(_is_selected))
+
+    def add_solution_hints(self, _solution: List[int]):
+        """Hint later solves with a solution given by proto index."""
+        self.model.ClearHints()
+        for v in self.selected_week.values():
+            self.model.AddHint(v, _solution[v.Index()])
+
+
+class WeekThenCourtRounds:
+    """The rounds of solve_week_then_court and the fixtures they have placed."""
+
+    def __init__(self, schedule: "Schedule", rounds_time: float):
+        """Build the week model of a built schedule.
+
+        :param schedule: built schedule to solve
+        :param rounds_time: seconds for all the rounds together, from now
+        """
+        self.schedule = schedule
+        self.start = time.perf_counter()
+        self.rounds_time = rounds_time
+        self.week_model = schedule._run_stage("build_week_model", WeekModel, schedule)
+        self.values = np.zeros(len(schedule.fixture_slots), dtype=int)
+        self.placed_options: Dict[int, WeekOption] = {}
+        self.results = []
+        self.round = 0
+
+    def get_remaining_time(self) -> float:
+        """Return the seconds left for the rounds."""
+        return self.rounds_time - (time.perf_counter() - self.start)
+
+    def is_complete(self) -> bool:
+        """Return true if every fixture has been placed."""
+        return len(self.placed_options) == len(self.schedule.fixtures)
+
+    def run_round(self, week_time_fraction: float, week_search_workers: int) -> bool:
+        """Solve the week model, then stage two for the weeks given fixtures not yet placed.
+
+        :return: false if the round placed nothing new, so no later round would either
+        """
+        self.round += 1
+        _week_result = self.schedule._run_stage(
+            f"solve_week_model_{self.round}",
+            solve_model_proto,
+            self.week_model.model.Proto().SerializeToString(),
+            self.get_remaining_time() * week_time_fraction,
+            week_search_workers,
+        )
+        self.results.append(_week_result)
+        if _week_result["solution"] is None:
+            return False
+        self.week_model.add_solution_hints(_week_result["solution"])
+
+        _week_options = defaultdict(list)
+        for _option in self.week_model.get_selected_options(_week_result["solution"]):
+            _week_options[_option[1]].append(_option)
+        _new_weeks = {
+            o[1]
+            for _options in _week_options.values()
+            for o in _options
+            if o[0] not in self.placed_options
+        }
+        print(
+            f"Round {self.round}: week model {_week_result['status']}, "
+            f"{len(_new_weeks)} new weeks"
+        )
+        if not _new_weeks:
+            return False
+        self.place_weeks(sorted(_new_weeks), _week_options)
+        return True
+
+    def place_weeks(self, _weeks: List[int], _week_options: Dict[int, List[WeekOption]]):
+        """Solve stage two for the weeks and fix the options of the week model it decided."""
+        _sub_schedules = self.schedule._run_stage(
+            f"build_week_court_models_{self.round}",
+            lambda: [
+                _create_week_sub_schedule(self.schedule, _week_options[_week], self.placed_options)
+                for _week in _weeks
+            ],
+        )
+        _results, _week_values = self.schedule._run_stage(
+            f"solve_week_court_models_{self.round}",
+            solve_sub_schedules,
+            self.schedule,
+            _sub_schedules,
+            max(self.get_remaining_time(), 1),
+        )
+        self.results.extend(_results)
+
+        for _sub_schedule in _sub_schedules:
+            _positions = [
+                self.schedule.fixture_slot_positions[fs.identifier]
+                for fs in _sub_schedule.fixture_slots
+            ]
+            self.values[_positions] = _week_values[_positions]
+        _fixture_is_scheduled = np.zeros(len(self.schedule.fixtures), dtype=bool)
+        _fixture_is_scheduled[self.schedule.fixture_slot_fixture_numbers[self.values == 1]] = True
+        for _week in _weeks:
+            for _option in _week_options[_week]:
+                if _option[0] in self.placed_options:
+                    continue
+                self.week_model.fix_option(_option, _fixture_is_scheduled[_option[0]])
+                if _fixture_is_scheduled[_option[0]]:
+                    self.placed_options[_option[0]] = _option
+        print(
+            f"Round {self.round}: fixtures placed "
+            f"{len(self.placed_options)}/{len(self.schedule.fixtures)}"
+        )
+
+    def get_outcome(self) -> SolveOutcome:
+        """Record the rounds in the schedule's report and return the fixtures placed."""
+        _report = get_solver_report(
+            get_combined_status(self.results), self.results, time.perf_counter() - self.start
+        )
+        self.schedule.report.solver = _report
+        if not self.placed_options and (not self.results or self.results[0]["solution"] is None):
+            _report.status = self.results[0]["status"] if self.results else "UNKNOWN"
+            _report.objective = None
+            return _report.status, None, None
+        # The first week model bounds the number of fixtures scheduled, which is the objective
+        # unless rescheduling, where kept published dates are also counted.
+        _report.best_bound = (
+            self.results[0]["best_bound"] if not self.schedule.published_fixture_slots else None
+        )
+        _report.status = "FEASIBLE"
+        _report.objective = self.schedule.get_objective_value(self.values)
+        return "FEASIBLE", self.values, _report.objective
+
+
+def solve_week_then_court(
+    schedule: "Schedule",
+    allowed_run_time: float,
+    solution_sinks=None,
+    stop_rules=None,
+    week_time_fraction: float = 0.5,
+    week_search_workers: int = 8,
+    repair_time_fraction: float = 0.25,
+) -> SolveOutcome:
+    """Solve the schedule by choosing each fixture's week, then each week's dates and courts.
+
+    The stages are repeated while time remains. After each round the weeks of the fixtures stage
+    two placed are fixed in the week model and the weeks it could not place a fixture in are
+    ruled out for that fixture, then the week model is solved again and only the weeks given new
+    fixtures are solved again in stage two, keeping the fixtures already placed in them.
+
+    If the rounds leave fixtures unplaced, the full model is solved hinted with the fixtures
+    placed, in the weeks stage one gave them, and its result is returned if it finds one.
+
+    :param schedule: built schedule to solve
+    :param allowed_run_time: seconds for all the rounds and the repair solve together
+    :param solution_sinks: passed to the repair solve
+    :param stop_rules: passed to the repair solve
+    :param week_time_fraction: share of the remaining time given to each week model solve
+    :param week_search_workers: solver threads for stage one, a portfolio of several workers
+        finds a first week assignment far sooner than a single one even on few cores
+    :param repair_time_fraction: share of allowed_run_time kept for the repair solve
+    :return: status, 0/1 values aligned with fixture_slots or None, and objective value
+    """
+    _rounds = WeekThenCourtRounds(schedule, allowed_run_time * (1 - repair_time_fraction))
+    while not _rounds.is_complete() and _rounds.get_remaining_time() >= 1:
+        if not _rounds.run_round(week_time_fraction, week_search_workers):
+            break
+    _outcome = _rounds.get_outcome()
+    if _outcome[1] is None or _rounds.is_complete():
+        return _outcome
+
+    print(f"Repairing {len(schedule.fixtures) - len(_rounds.placed_options)} unplaced fixtures")
+    _report = schedule.report.solver
+    schedule.model.ClearHints()
+    schedule._add_solution_hints(np.flatnonzero(_rounds.values).tolist())
+    _repair_time = allowed_run_time - (time.perf_counter() - _rounds.start)
+    _repaired = schedule.solve_monolithic(max(_repair_time, 1), solution_sinks, stop_rules)
+    if _repaired[1] is not None:
+        return _repaired
+    # No repaired solution in time, so keep the fixtures the rounds placed.
+    schedule.report.solver = _report
+    return _outcome
+
+
+def _create_week_sub_schedule(
+    schedule: "Schedule", _options: List[WeekOption], _placed_options: Dict[int, WeekOption]
+) -> "Schedule":
+    """Build the stage two sub schedule of a week, keeping fixtures already placed in the week."""
+    _option_set = set(_options)
+    _fixture_correct_week = {schedule.fixtures[o[0]]: o[2] for o in _options}
+    _week = _options[0][1]
+
+    def _in_week(_fixture_slot) -> bool:
+        return (
+            _fixture_slot.get_week_number() == _week
+            and _fixture_slot.is_correct_week() == _fixture_correct_week[_fixture_slot.fixture]
+        )
+
+    _sub_schedule = schedule.create_sub_schedule(list(_fixture_correct_week), _in_week)
+    for _fixture_number, _option in _placed_options.items():
+        if _option in _option_set:
+            _sub_schedule.model.Add(
+                sum(
+                    _sub_schedule._get_model_vars(
+                        schedule.fixtures[_fixture_number].fixture_court_slots
+                    )
+                )
+                == 1
+            )
+    return _sub_schedule